@@ -22,7 +22,7 @@ from typing import Dict
 from typing import List
 from typing import Optional
 
-from database_manager import db_manager, retrieve_user_memory, get_embedding, index_document_chunks
+from database_manager import db_manager, retrieve_user_memory_batch, index_document_chunks
 from error_handler import MemoryErrorHandler
 from human_logging import log_service_status
 
@@ -220,12 +220,9 @@ class ConversationAnalyzer:
     async def _calculate_context_relevance(self, user_id: str, query: str, response: str) -> float:
         """Calculate how relevant the response is to user's context."""
         try:
-            # Get user's recent memory
-            query_embedding = get_embedding(db_manager, query)
-            if query_embedding is None or (hasattr(query_embedding, "size") and query_embedding.size == 0):
-                return 0.5  # Neutral score if can't get embedding
-
-            recent_memories = retrieve_user_memory(db_manager, user_id, query_embedding, n_results=3)
+            # Get user's memory related to both the query and the response in one retrieval
+            query_memories, response_memories = await retrieve_user_memory_batch(user_id, [query, response], n_results=3)
+            recent_memories = query_memories + response_memories
 
             if not recent_memories:
                 return 0.5  # No context available
@@ -237,8 +234,8 @@ class ConversationAnalyzer:
             memory_words = set()
 
             for memory in recent_memories:
-                if isinstance(memory, dict) and "text" in memory:
-                    memory_words.update(memory["text"].lower().split())
+                if isinstance(memory, dict) and memory.get("document"):
+                    memory_words.update(memory["document"].lower().split())
                 elif isinstance(memory, str):
                     memory_words.update(memory.lower().split())
 
@@ -511,7 +508,7 @@ class AdaptiveLearningSystem:
             doc_id = f"learning_{expansion_type}_{user_id}_{int(time.time())}"
 
             # Use the more efficient batch indexing function
-            success = index_document_chunks(
+            success = await index_document_chunks(
                 db_manager=db_manager,
                 user_id=user_id,
                 doc_id=doc_id,
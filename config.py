@@ -25,6 +25,8 @@ OPENAI_API_TIMEOUT = int(os.getenv("OPENAI_API_TIMEOUT", "180"))
 
 # LLM timeout settings
 LLM_TIMEOUT = int(os.getenv("LLM_TIMEOUT", "30"))  # Reduced from 180 to 30 seconds
+# Identical concurrent prompts share one generation (see utilities/single_flight.py)
+LLM_SINGLE_FLIGHT_ENABLED = os.getenv("LLM_SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
 
 # Performance timeout configurations (Added to fix high latency)
 API_TIMEOUT = int(os.getenv("API_TIMEOUT", "30"))  # API request timeout
@@ -36,6 +38,10 @@ WRITE_TIMEOUT = int(os.getenv("WRITE_TIMEOUT", "5"))  # Write timeout
 # Database configuration
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))  # Connection pool size per client
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))  # Max wait for a free pooled connection
+REDIS_COMMAND_TIMEOUT = float(os.getenv("REDIS_COMMAND_TIMEOUT", "2"))  # Per-command socket timeout
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "2"))  # Connection setup timeout
 CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
 CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8002"))  # Fixed: ChromaDB runs on port 8002 in docker-compose
 USE_HTTP_CHROMA = os.getenv("USE_HTTP_CHROMA", "true").lower() == "true"
@@ -46,16 +52,103 @@ EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "huggingface")  # Options:
 SENTENCE_TRANSFORMERS_HOME = os.getenv("SENTENCE_TRANSFORMERS_HOME", "./storage/models")
 AUTO_PULL_MODELS = os.getenv("AUTO_PULL_MODELS", "true").lower() == "true"  # Automatically pull missing models
 
+# Embedding micro-batching
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))  # Max texts per encode call
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))  # Max wait to fill a batch
+
+# Embedding cache
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))  # Vectors kept in-process
+EMBEDDING_CACHE_REDIS = os.getenv("EMBEDDING_CACHE_REDIS", "true").lower() == "true"  # Share vectors via Redis
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", "86400"))  # 24 hours default
+
+# Document ingestion pipeline
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", "64"))  # Chunks per embed/upsert batch
+INGESTION_EMBED_WORKERS = int(os.getenv("INGESTION_EMBED_WORKERS", "2"))  # Parallel embedding workers
+INGESTION_QUEUE_SIZE = int(os.getenv("INGESTION_QUEUE_SIZE", "4"))  # Batches buffered between stages
+INGESTION_JOB_TTL = int(os.getenv("INGESTION_JOB_TTL", "3600"))  # Keep finished job status for 1 hour
+
+# Dedicated executors for blocking work (see utilities/executors.py)
+EXECUTOR_EMBEDDING_WORKERS = int(os.getenv("EXECUTOR_EMBEDDING_WORKERS", "2"))  # CPU-bound model encodes
+EXECUTOR_CHROMA_WORKERS = int(os.getenv("EXECUTOR_CHROMA_WORKERS", "8"))  # Blocking ChromaDB client calls
+EXECUTOR_TOOL_WORKERS = int(os.getenv("EXECUTOR_TOOL_WORKERS", "8"))  # Blocking tool lookups (weather, news, ...)
+
+# Tool routing (see utilities/tool_router.py)
+TOOL_ROUTER_MIN_CONFIDENCE = float(os.getenv("TOOL_ROUTER_MIN_CONFIDENCE", "0.5"))  # Below this the LLM answers
+
+# Async tool runtime (see services/tool_runtime.py)
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "8"))  # Seconds per tool call, including waiting for a slot
+TOOL_TIMEOUTS = os.getenv("TOOL_TIMEOUTS", "time=5,exchange_rate=5,python_code_execution=5")  # Per-tool overrides
+TOOL_CACHE_TTLS = os.getenv(  # Seconds a tool answer is reused; tools not listed (time, python) are never cached
+    "TOOL_CACHE_TTLS", "weather=600,exchange_rate=3600,wikipedia=86400,web_search=900,news=300"
+)
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "1000"))  # Cached tool answers kept in memory
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))  # Concurrent calls per tool (upstream rate limits)
+TOOL_MAX_PARALLEL = int(os.getenv("TOOL_MAX_PARALLEL", "3"))  # Tools run in parallel for one message
+
+# Write-behind queue for post-response writes (see services/write_behind.py)
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "true").lower() == "true"  # false = write inline
+WRITE_BEHIND_STREAM = os.getenv("WRITE_BEHIND_STREAM", "write_behind")  # Redis stream key
+WRITE_BEHIND_WORKERS = int(os.getenv("WRITE_BEHIND_WORKERS", "2"))  # Concurrent batch workers
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "32"))  # Jobs taken per batch
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5"))  # Before dead-lettering
+WRITE_BEHIND_RETRY_DELAY = float(os.getenv("WRITE_BEHIND_RETRY_DELAY", "0.5"))  # Base backoff in seconds
+WRITE_BEHIND_RECLAIM_IDLE = float(os.getenv("WRITE_BEHIND_RECLAIM_IDLE", "60"))  # Reclaim jobs unacked this long
+WRITE_BEHIND_MAXLEN = int(os.getenv("WRITE_BEHIND_MAXLEN", "100000"))  # Approximate stream length cap
+WRITE_BEHIND_DEDUPE_TTL = int(os.getenv("WRITE_BEHIND_DEDUPE_TTL", "86400"))  # Applied chat turns stay marked this long (redelivery dedupe)
+
+# In-process vector index (hot tier in front of ChromaDB)
+VECTOR_INDEX_ENABLED = os.getenv("VECTOR_INDEX_ENABLED", "true").lower() == "true"
+VECTOR_INDEX_MAX_USERS = int(os.getenv("VECTOR_INDEX_MAX_USERS", "1000"))  # Active users kept in memory
+VECTOR_INDEX_MAX_VECTORS = int(os.getenv("VECTOR_INDEX_MAX_VECTORS", "200000"))  # Vectors kept in memory overall
+VECTOR_INDEX_HNSW_THRESHOLD = int(os.getenv("VECTOR_INDEX_HNSW_THRESHOLD", "20000"))  # Per-user size for HNSW
+
 # Cache configuration
 CACHE_TTL = int(os.getenv("CACHE_TTL", "600"))  # 10 minutes default
 MODEL_CACHE_TTL = int(os.getenv("MODEL_CACHE_TTL", "300"))  # 5 minutes default
 
+# Chat response cache
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))  # Responses kept in-process
+RESPONSE_CACHE_REDIS = os.getenv("RESPONSE_CACHE_REDIS", "true").lower() == "true"  # Share responses via Redis
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(CACHE_TTL)))  # Defaults to CACHE_TTL
+RESPONSE_CACHE_NEGATIVE_TTL = int(os.getenv("RESPONSE_CACHE_NEGATIVE_TTL", "30"))  # Cached tool errors
+
+# Semantic (embedding-similarity) response cache
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))  # Min cosine similarity for a hit
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", str(CACHE_TTL)))  # Defaults to CACHE_TTL
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500"))  # Answers kept per user
+SEMANTIC_CACHE_MAX_USERS = int(os.getenv("SEMANTIC_CACHE_MAX_USERS", "1000"))  # Users kept in memory
+SEMANTIC_CACHE_SCOPE = os.getenv("SEMANTIC_CACHE_SCOPE", "user")  # "user" or "global" (share impersonal answers)
+
+# Chat history (capped Redis list per chat, see utilities/chat_history.py)
+CHAT_HISTORY_MAX_TURNS = int(os.getenv("CHAT_HISTORY_MAX_TURNS", "20"))  # Turns kept per chat (LTRIM on write)
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "5"))  # Turns read back as conversation context
+CHAT_HISTORY_TTL = int(os.getenv("CHAT_HISTORY_TTL", str(30 * 86400)))  # Idle chats expire (0 = never)
+CHAT_HISTORY_SUMMARY_ENABLED = os.getenv("CHAT_HISTORY_SUMMARY_ENABLED", "false").lower() == "true"  # Roll trimmed turns into a summary
+CHAT_HISTORY_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_HISTORY_SUMMARY_MAX_CHARS", "2000"))  # Summary size cap
+
+# Prompt context packing (see utilities/context_builder.py)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4096"))  # Context window for models not listed below
+CONTEXT_MODEL_BUDGETS = os.getenv("CONTEXT_MODEL_BUDGETS", "")  # Per-model windows: "llama3.2:3b=8192,mistral=4096"
+CONTEXT_RESPONSE_RESERVE = int(os.getenv("CONTEXT_RESPONSE_RESERVE", "1024"))  # Tokens kept free for the answer
+CONTEXT_MEMORY_SHARE = float(os.getenv("CONTEXT_MEMORY_SHARE", "0.4"))  # Max share of free space for memories
+
+# Streaming responses (see utilities/sse_encoder.py)
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "15"))  # Tokens within this window share one event; 0 = off
+SSE_COALESCE_MAX_CHARS = int(os.getenv("SSE_COALESCE_MAX_CHARS", "256"))  # Flush early once this much is buffered
+STREAM_SESSION_TTL = float(os.getenv("STREAM_SESSION_TTL", "900"))  # Sessions idle this long are stopped and reaped
+STREAM_REAPER_TICK = float(os.getenv("STREAM_REAPER_TICK", "1"))  # Timer wheel resolution in seconds
+STREAM_STOP_CHANNEL = os.getenv("STREAM_STOP_CHANNEL", "stream_stop")  # Redis channel for cross-worker stops
+
 # Session management
 SESSION_CLEANUP_INTERVAL = int(os.getenv("SESSION_CLEANUP_INTERVAL", "3600"))  # 1 hour default
 
 # Connection pool settings
 CONNECTION_POOL_SIZE = int(os.getenv("CONNECTION_POOL_SIZE", "10"))
 MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("MAX_KEEPALIVE_CONNECTIONS", "5"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # Seconds idle connections stay open
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"  # Requires the 'h2' package
+HTTP_WARMUP_CONNECTIONS = int(os.getenv("HTTP_WARMUP_CONNECTIONS", "2"))  # Connections opened at startup
 
 
 def get_app_start_time():
@@ -6,7 +6,6 @@ Handles Redis, chromadb, and embedding model management with enhanced logging.
 from typing import Optional, Union, Any, Dict, List, TypedDict, cast, Sequence, Protocol
 import os
 import time
-import json
 import asyncio
 import logging
 from datetime import datetime
@@ -14,6 +13,7 @@ from datetime import datetime
 import chromadb
 from chromadb.config import Settings
 import redis
+import redis.asyncio as aioredis
 from sentence_transformers import SentenceTransformer
 from numpy.typing import NDArray
 import numpy as np
@@ -24,7 +24,25 @@ from utilities.validation import DatabaseConfig, ChatMessage, validate_query_par
 from utilities.memory_pool import MemoryPool
 from utilities.memory_monitor import MemoryPressureMonitor
 from utilities.cache_manager import CacheManager
+from utilities.chat_history import (
+    APPEND_ONCE_SCRIPT,
+    applied_key,
+    applied_sequence_key,
+    decode_window,
+    encode_turn,
+    history_key,
+    roll_up,
+    summary_key,
+    turn_from_entry,
+)
 from utilities.ai_tools import chunk_text
+from utilities.embedding_batcher import EmbeddingBatcher
+from utilities.embedding_cache import EmbeddingCache
+from utilities.redis_access import create_redis_client
+from utilities.response_cache import ResponseCache
+from utilities.semantic_cache import SemanticCache
+from utilities.vector_index import VectorIndex
+from utilities.executors import InstrumentedExecutor, executors, run_in_executor
 
 # Alert manager integration
 try:
@@ -118,6 +136,47 @@ class ChromaCollectionProtocol(Protocol):
         """
         ...
         
+    def upsert(
+        self, embeddings: List[List[float]], documents: List[str], metadatas: List[Dict[str, Any]], ids: List[str]
+    ) -> None: 
+        """Add documents to the collection, replacing any with the same ids.
+        
+        Args:
+            embeddings: List of embedding vectors for the documents
+            documents: List of document texts to be stored
+            metadatas: List of metadata dictionaries for each document
+            ids: List of unique identifiers for each document
+        
+        Returns:
+            None
+        """
+        ...
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, List[Any]]: 
+        """Get documents by id or metadata filter.
+        
+        Args:
+            ids: Optional list of document ids to fetch
+            where: Optional metadata filter
+            **kwargs: Additional parameters (e.g., include)
+        
+        Returns:
+            Dictionary with key 'ids' and any included fields
+        """
+        ...
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None: 
+        """Delete documents by id or metadata filter.
+        
+        Args:
+            ids: Optional list of document ids to delete
+            where: Optional metadata filter
+        
+        Returns:
+            None
+        """
+        ...
+        
     def query(self, query_embeddings: List[List[float]], n_results: int, **kwargs: Any) -> Dict[str, List[Any]]: 
         """Query the collection for the most similar documents to the query embeddings.
         
@@ -196,7 +255,8 @@ class DatabaseManager:
     def __init__(self):
         """Initialize database manager."""
         # Database clients
-        self.redis_client: Optional[redis.Redis] = None
+        self.redis_client: Optional[aioredis.Redis] = None
+        self._embedding_redis: Optional[aioredis.Redis] = None  # Binary-safe client of the embedding cache
         self.chroma_client: Optional[ChromaClientProtocol] = None
         self.chroma_collection: Optional[ChromaCollectionProtocol] = None
         self.embedding_model: Optional[SentenceTransformer] = None
@@ -206,6 +266,43 @@ class DatabaseManager:
         self.memory_monitor = MemoryPressureMonitor(warning_threshold=75.0, critical_threshold=90.0)
         self.cache_manager = CacheManager[Any](max_size=10000)
 
+        # Embedding micro-batching (HuggingFace provider)
+        from config import EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_MAX_WAIT_MS, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL
+
+        self.embedding_batcher = EmbeddingBatcher(
+            self._encode_batch, max_batch_size=EMBEDDING_BATCH_SIZE, max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS
+        )
+
+        # Content-addressed embedding cache (Redis tier attached once Redis is up)
+        self.embedding_cache = EmbeddingCache(max_size=EMBEDDING_CACHE_SIZE, redis_ttl=EMBEDDING_CACHE_TTL)
+
+        # Chat response cache (Redis tier attached once Redis is up)
+        from config import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_NEGATIVE_TTL
+
+        self.response_cache = ResponseCache(
+            max_size=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL, negative_ttl=RESPONSE_CACHE_NEGATIVE_TTL
+        )
+
+        # Semantic response cache (answers to near-identical questions)
+        from config import SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_MAX_USERS
+
+        self.semantic_cache = SemanticCache(
+            threshold=SEMANTIC_CACHE_THRESHOLD,
+            ttl=SEMANTIC_CACHE_TTL,
+            max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+            max_scopes=SEMANTIC_CACHE_MAX_USERS,
+        )
+
+        # Per-user in-process vector index (ChromaDB attached once it is up)
+        from config import VECTOR_INDEX_ENABLED, VECTOR_INDEX_MAX_USERS, VECTOR_INDEX_MAX_VECTORS, VECTOR_INDEX_HNSW_THRESHOLD
+
+        self.vector_index = VectorIndex(
+            max_users=VECTOR_INDEX_MAX_USERS,
+            max_vectors=VECTOR_INDEX_MAX_VECTORS,
+            hnsw_threshold=VECTOR_INDEX_HNSW_THRESHOLD,
+            enabled=VECTOR_INDEX_ENABLED,
+        )
+
         # Locks for thread-safe operations
         self._redis_lock = asyncio.Lock()
         self._chroma_lock = asyncio.Lock()
@@ -258,11 +355,39 @@ class DatabaseManager:
             redis_port = int(os.getenv("REDIS_PORT", "6379"))
             redis_db = int(os.getenv("REDIS_DB", "0"))
 
+            # The lock only serializes (re)initialization; commands run concurrently on the pool
             async with self._redis_lock:
-                self.redis_client = redis.Redis(host=redis_host, port=redis_port, db=redis_db, decode_responses=True)
+                from config import EMBEDDING_CACHE_REDIS, RESPONSE_CACHE_REDIS
+                from services.streaming_service import streaming_service
+                from services.write_behind import write_behind_queue
+
+                previous = (self.redis_client, self._embedding_redis)
+                self.redis_client = create_redis_client(host=redis_host, port=redis_port, db=redis_db, decode_responses=True)
+
+                if RESPONSE_CACHE_REDIS:
+                    self.response_cache.attach_redis(self.redis_client)
+
+                # Embedding vectors are stored as raw float32 bytes, so they need a binary-safe client
+                if EMBEDDING_CACHE_REDIS:
+                    self._embedding_redis = create_redis_client(
+                        host=redis_host, port=redis_port, db=redis_db, decode_responses=False
+                    )
+                    self.embedding_cache.attach_redis(self._embedding_redis)
+
+                # Services started on the previous client move to the new one before it is closed
+                write_behind_queue.attach_redis(self.redis_client)
+                streaming_service.attach_redis(self.redis_client)
+
+                # The clients own their pools, which aclose() alone would leave open
+                for client in previous:
+                    if client is not None:
+                        try:
+                            await client.aclose(close_connection_pool=True)
+                        except Exception as e:
+                            log_service_status("redis", "warning", f"Failed to close previous Redis client: {e}")
 
                 # Test connection
-                self.redis_client.ping()
+                await self.redis_client.ping()
                 log_service_status("redis", "info", "Redis initialized successfully")
         except redis.ConnectionError as e:
             log_service_status("redis", "error", f"Redis initialization failed: {str(e)}")
@@ -308,6 +433,7 @@ class DatabaseManager:
                     self.chroma_collection = self.chroma_client.get_or_create_collection(
                         name=collection_name, metadata={"description": "Default vector store for embeddings"}
                     )
+                    self.vector_index.attach(self.chroma_collection)
 
                     log_service_status(
                         "chromadb", "info", f"ChromaDB initialized successfully on {chroma_host}:{chroma_port}"
@@ -523,6 +649,7 @@ class DatabaseManager:
 
         collection_name = os.getenv("CHROMA_COLLECTION", "user_memory")
         self.chroma_collection = self.chroma_client.get_or_create_collection(collection_name)
+        self.vector_index.attach(self.chroma_collection)
         log_service_status(
             "chromadb",
             "ready",
@@ -554,14 +681,14 @@ class DatabaseManager:
                 if self.redis_client is None:
                     return None
 
-            self.redis_client.ping()
+            await self.redis_client.ping()
             return self.redis_client
         except redis.RedisError as e:
             log_service_status("REDIS", "reconnecting", f"Connection issue: {e}. Attempting to re-initialize.")
             await self._initialize_redis()
             if self.redis_client:
                 try:
-                    self.redis_client.ping()
+                    await self.redis_client.ping()
                     return self.redis_client
                 except redis.RedisError:
                     log_service_status("REDIS", "failed", "Failed to get a Redis client after re-initialization.")
@@ -577,7 +704,7 @@ class DatabaseManager:
         try:
             if self.chroma_client is None or self.chroma_collection is None:
                 return False
-            self.chroma_client.heartbeat()
+            await run_in_executor("chroma", self.chroma_client.heartbeat)
             return True
         except Exception:
             return False
@@ -607,27 +734,51 @@ class DatabaseManager:
             },
         }
 
-    async def execute_redis_operation(self, operation: Any, operation_name: str) -> Any:
-        """Execute a Redis operation with proper error handling."""
+    async def execute_redis_operation(
+        self, operation: Any, operation_name: str, timeout: Optional[float] = None
+    ) -> Any:
+        """Execute an async Redis operation with a deadline and proper error handling.
+
+        Args:
+            operation: Coroutine function taking the Redis client
+            operation_name: Name used in log messages
+            timeout: Overall deadline in seconds (defaults to REDIS_COMMAND_TIMEOUT)
+
+        Only a dropped connection triggers a re-initialization and one retry; a timed-out
+        operation fails fast instead of being repeated against a slow server.
+        """
+        from config import REDIS_COMMAND_TIMEOUT
+
         if not self.redis_client:
             log_service_status("redis", "error", f"Redis not available for operation: {operation_name}")
             return None
 
+        deadline = timeout if timeout is not None else REDIS_COMMAND_TIMEOUT
         try:
-            async with self._redis_lock:
-                result = operation(self.redis_client)
-                return result
-        except redis.RedisError as e:
+            return await asyncio.wait_for(operation(self.redis_client), deadline)
+        except (asyncio.TimeoutError, redis.TimeoutError):
+            log_service_status("redis", "error", f"Redis operation '{operation_name}' timed out after {deadline}s")
+            return None
+        except redis.ConnectionError as e:
             log_service_status("redis", "error", f"Redis operation '{operation_name}' failed: {str(e)}")
             try:
                 await self._initialize_redis()
                 if self.redis_client:
-                    async with self._redis_lock:
-                        result = operation(self.redis_client)
-                        return result
-            except redis.RedisError as e2:
+                    return await asyncio.wait_for(operation(self.redis_client), deadline)
+            except (asyncio.TimeoutError, redis.RedisError) as e2:
                 log_service_status("redis", "error", f"Retry failed for '{operation_name}': {str(e2)}")
             return None
+        except redis.RedisError as e:
+            log_service_status("redis", "error", f"Redis operation '{operation_name}' failed: {str(e)}")
+            return None
+
+    def get_redis_pool_stats(self) -> Dict[str, Any]:
+        """Get connection pool statistics for the Redis client."""
+        from utilities.redis_access import get_pool_stats
+
+        if not self.redis_client:
+            return {}
+        return get_pool_stats(self.redis_client)
 
     async def _handle_memory_pressure(self):
         """Handle high memory pressure situations."""
@@ -636,8 +787,13 @@ class DatabaseManager:
             if self.redis_client:
                 await self.redis_client.flushdb()
 
-            # Clear cache manager
+            # Clear cache manager and local response cache tier
             self.cache_manager.clear()
+            self.response_cache.clear()
+            self.semantic_cache.clear()
+
+            # Drop in-process vectors; they reload from ChromaDB on demand
+            self.vector_index.invalidate()
 
         except Exception as e:
             log_service_status("database_manager", "error", f"Error handling memory pressure: {str(e)}")
@@ -646,11 +802,9 @@ class DatabaseManager:
         """Clean up database connections."""
         try:
             if self.redis_client:
-                await self._redis_lock.acquire()
-                try:
-                    self.redis_client.close()
-                finally:
-                    self._redis_lock.release()
+                async with self._redis_lock:
+                    await self.redis_client.aclose()
+                    self.redis_client = None
 
             if self.chroma_client:
                 await self._chroma_lock.acquire()
@@ -661,6 +815,8 @@ class DatabaseManager:
                 finally:
                     self._chroma_lock.release()
 
+            await self.embedding_batcher.stop()
+
             if self.embedding_model:
                 await self._embedding_lock.acquire()
                 try:
@@ -675,6 +831,95 @@ class DatabaseManager:
             log_service_status("database_manager", "error", f"Error during cleanup: {str(e)}")
             raise
 
+    def _encode_batch(self, texts: List[str]) -> NDArray[np.float32]:
+        """Encode a batch of texts with the SentenceTransformers model (blocking, run in a thread)."""
+        if self.embedding_model is None:
+            raise RuntimeError("Embedding model not available")
+        return self.embedding_model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+
+    def _encode_raw(self, texts: List[str]) -> NDArray[np.float32]:
+        """Encode texts without prefix or normalization (blocking, run in a thread)."""
+        if self.embedding_model is None:
+            raise RuntimeError("Embedding model not available")
+        # Set show_progress_bar to False for cleaner logs
+        return self.embedding_model.encode(texts, show_progress_bar=False)
+
+    async def encode_chunks(
+        self, chunks: List[str], executor: Optional[InstrumentedExecutor] = None
+    ) -> List[List[float]]:
+        """Embed document chunks, encoding only those not already in the embedding cache.
+
+        Chunks are encoded without prefix or normalization, matching what has always been
+        stored in the collection, so they share the legacy "raw" cache namespace. Cache
+        lookups and writes are batched; misses are encoded on ``executor`` (default: the
+        "embedding" pool).
+        """
+        if self.embedding_model is None:
+            raise RuntimeError("Embedding model not available")
+
+        from config import EMBEDDING_MODEL
+
+        cache_keys = [self.embedding_cache.make_key(EMBEDDING_MODEL, "raw", chunk) for chunk in chunks]
+        embeddings = await self.embedding_cache.aget_many(cache_keys)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+        if missing:
+            pool = executor or executors.get("embedding")
+            encoded = await pool.run(self._encode_raw, [chunks[i] for i in missing])
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+            await self.embedding_cache.aset_many([cache_keys[i] for i in missing], list(encoded))
+
+        log_service_status(
+            "embeddings", "info", f"Encoded {len(missing)}/{len(chunks)} chunks ({len(chunks) - len(missing)} cached)"
+        )
+        return [embedding.tolist() for embedding in embeddings]
+
+    async def embed_queries(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed several retrieval queries in one forward pass.
+
+        Queries are encoded like stored chunks (see ``encode_chunks``) so their distances
+        are comparable with the collection. Providers without a local model fall back to
+        one request per text.
+        """
+        if not self.embedding_model:
+            log_service_status("embeddings", "error", "Embedding model not available")
+            return [None] * len(texts)
+
+        if hasattr(self.embedding_model, "encode"):
+            try:
+                return await self.encode_chunks(texts)
+            except Exception as e:
+                log_service_status("embeddings", "error", f"Error generating query embeddings: {str(e)}")
+                return [None] * len(texts)
+
+        return list(await asyncio.gather(*(self.get_embedding(text) for text in texts)))
+
+    def get_embedding_stats(self) -> Dict[str, Any]:
+        """Get embedding batcher statistics."""
+        return self.embedding_batcher.get_stats()
+
+    def memory_changed(self, user_id: Optional[str]) -> None:
+        """Drop cached answers that may depend on a user's memories after they change."""
+        if user_id:
+            self.semantic_cache.invalidate(user_id)
+
+    def get_semantic_cache_stats(self) -> Dict[str, Any]:
+        """Get semantic response cache statistics."""
+        return self.semantic_cache.get_stats()
+
+    def get_response_cache_stats(self) -> Dict[str, Any]:
+        """Get chat response cache statistics."""
+        return self.response_cache.get_stats()
+
+    def get_embedding_cache_stats(self) -> Dict[str, Any]:
+        """Get embedding cache statistics."""
+        return self.embedding_cache.get_stats()
+
+    def get_vector_index_stats(self) -> Dict[str, Any]:
+        """Get in-process vector index statistics."""
+        return self.vector_index.get_stats()
+
     async def get_embedding(self, text: str) -> Optional[List[float]]:
         """Get embedding for text using the configured provider (HuggingFace or Ollama)."""
         if not self.embedding_model:
@@ -682,7 +927,7 @@ class DatabaseManager:
             return None
 
         try:
-            from config import EMBEDDING_PROVIDER
+            from config import EMBEDDING_MODEL, EMBEDDING_PROVIDER
 
             provider = EMBEDDING_PROVIDER.lower()
 
@@ -692,14 +937,22 @@ class DatabaseManager:
                     # Add the query prefix for e5 models
                     if "e5-" in str(self.embedding_model).lower():
                         prefixed_text = f"query: {text}"
+                        prefix_mode = "query"
                     else:
                         prefixed_text = text
-
-                    # Run embedding generation in a thread to avoid blocking
-                    embedding = await asyncio.to_thread(
-                        self.embedding_model.encode, [prefixed_text], normalize_embeddings=True
-                    )
-                    return embedding[0].tolist() if len(embedding) > 0 else None
+                        prefix_mode = "plain"
+
+                    cache_key = self.embedding_cache.make_key(EMBEDDING_MODEL, prefix_mode, text)
+                    cached = await self.embedding_cache.aget(cache_key)
+                    if cached is not None:
+                        return cached.tolist()
+
+                    # Queue for the micro-batcher so concurrent requests share one forward pass
+                    embedding = await self.embedding_batcher.encode(prefixed_text)
+                    if embedding is None:
+                        return None
+                    await self.embedding_cache.aset(cache_key, embedding)
+                    return embedding.tolist()
                 else:
                     log_service_status("embeddings", "error", "HuggingFace model does not have encode method")
                     return None
@@ -708,7 +961,14 @@ class DatabaseManager:
                 # Use Ollama via LLM service
                 from services.llm_service import llm_service
 
+                cache_key = self.embedding_cache.make_key(str(self.embedding_model), "plain", text)
+                cached = await self.embedding_cache.aget(cache_key)
+                if cached is not None:
+                    return cached.tolist()
+
                 embedding = await llm_service.get_embeddings(text, self.embedding_model)
+                if embedding:
+                    await self.embedding_cache.aset(cache_key, embedding)
                 return embedding
             else:
                 log_service_status("embeddings", "error", f"Unknown provider '{provider}'")
@@ -718,37 +978,24 @@ class DatabaseManager:
             log_service_status("embeddings", "error", f"Error generating embedding: {str(e)}")
             return None
 
-    async def get_chat_history(self, chat_id: str, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get chat history from Redis."""
+    async def get_chat_history(self, chat_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Get the most recent turns of a chat from Redis, oldest first.
 
-        def get_operation(redis_client: redis.Redis) -> List[Dict[str, Any]]:
-            """TODO: Add proper docstring for get_operation."""
-            chat_key = f"chat:{chat_id}"
-            try:
-                # lrange returns a list of bytes or str
-                entries = redis_client.lrange(chat_key, 0, limit - 1)
-                if not isinstance(entries, list):
-                    log_service_status("redis", "warning", f"Cache miss - no history found for chat_id: {chat_id}")
-                    return []
-
-                if len(entries) == 0:
-                    log_service_status("redis", "info", f"Cache miss - empty history for chat_id: {chat_id}")
-                else:
-                    log_service_status(
-                        "redis", "info", f"Cache hit - retrieved {len(entries)} messages for chat_id: {chat_id}"
-                    )
+        Only the requested window is read (default CHAT_HISTORY_WINDOW). When older turns
+        have been rolled up, the result starts with a ``{"summary": ...}`` entry.
+        """
+        from config import CHAT_HISTORY_SUMMARY_ENABLED, CHAT_HISTORY_WINDOW
 
-                history = []
-                for entry in entries:
-                    try:
-                        if isinstance(entry, bytes):
-                            entry_str = entry.decode("utf-8")
-                        else:
-                            entry_str = entry
-                        history.append(json.loads(entry_str))
-                    except (json.JSONDecodeError, UnicodeDecodeError):
-                        continue
-                return history
+        window = max(1, limit or CHAT_HISTORY_WINDOW)
+
+        async def get_operation(redis_client: aioredis.Redis) -> List[Dict[str, Any]]:
+            """Read the window (and summary) in one round trip and decode it."""
+            try:
+                pipe = redis_client.pipeline(transaction=False)
+                pipe.lrange(history_key(chat_id), 0, window - 1)
+                if CHAT_HISTORY_SUMMARY_ENABLED:
+                    pipe.get(summary_key(chat_id))
+                results = await pipe.execute()
             except redis.RedisError as e:
                 log_service_status(
                     "redis",
@@ -757,24 +1004,126 @@ class DatabaseManager:
                 )
                 return []
 
+            history = decode_window(results[0])
+            if len(history) == 0:
+                log_service_status("redis", "info", f"Cache miss - empty history for chat_id: {chat_id}")
+            else:
+                log_service_status(
+                    "redis", "info", f"Cache hit - retrieved {len(history)} turns for chat_id: {chat_id}"
+                )
+
+            summary = results[1] if len(results) > 1 else None
+            if summary:
+                history.insert(0, {"summary": summary})
+            return history
+
         result = await self.execute_redis_operation(get_operation, "get_chat_history")
         return result if result is not None else []
 
-    async def store_chat_entry(self, chat_id: str, chat_entry: Dict[str, Any]) -> bool:
-        """Store a chat entry in Redis."""
+    async def append_chat_turn(
+        self,
+        chat_id: str,
+        user_message: str,
+        assistant_response: str,
+        timestamp: Optional[float] = None,
+        job_id: Optional[str] = None,
+        partial: bool = False,
+        sequence: Optional[int] = None,
+        ordered: bool = True,
+    ) -> bool:
+        """Append one exchange to a chat's history, trimming it to CHAT_HISTORY_MAX_TURNS.
+
+        Push, trim and expiry go out as one MULTI/EXEC. With CHAT_HISTORY_SUMMARY_ENABLED the
+        trimmed turns are read in the same transaction and folded into the chat's summary.
+        With a ``job_id`` (a write-behind stream entry id) the push is skipped when that job
+        was already applied, so redelivered jobs are idempotent. A ``sequence`` number (the
+        turn's place among the chat's queued turns) makes it wait, returning False, until the
+        earlier turns were appended, unless ``ordered`` is False. ``partial`` marks an answer
+        that was cut short (a stopped stream).
+        """
+        from config import (
+            CHAT_HISTORY_MAX_TURNS,
+            CHAT_HISTORY_SUMMARY_ENABLED,
+            CHAT_HISTORY_TTL,
+            WRITE_BEHIND_DEDUPE_TTL,
+        )
 
-        def store_operation(redis_client: redis.Redis) -> bool:
-            """TODO: Add proper docstring for store_operation."""
-            chat_key = f"chat:{chat_id}"
-            redis_client.lpush(chat_key, json.dumps(chat_entry))
-            log_service_status(
-                "redis",
-                "info",
-                f"Cache write - stored message for chat_id: {chat_id}, role: {chat_entry.get('role', 'unknown')}",
-            )
+        max_turns = max(1, CHAT_HISTORY_MAX_TURNS)
+        entry = encode_turn(user_message, assistant_response, timestamp, partial)
+
+        async def append_operation(redis_client: aioredis.Redis) -> bool:
+            """Push the turn and cap the list."""
+            key = history_key(chat_id)
+            if job_id is not None:
+                result = await redis_client.eval(
+                    APPEND_ONCE_SCRIPT,
+                    3,
+                    key,
+                    applied_key(chat_id, job_id),
+                    applied_sequence_key(chat_id),
+                    entry,
+                    max_turns,
+                    CHAT_HISTORY_TTL,
+                    WRITE_BEHIND_DEDUPE_TTL,
+                    "1" if CHAT_HISTORY_SUMMARY_ENABLED else "0",
+                    sequence or 0,
+                    "1" if ordered else "0",
+                )
+                status = int(result[0])
+                if status == 0:
+                    log_service_status("redis", "info", f"Skipped turn {job_id} already appended to chat_id: {chat_id}")
+                    return True
+                if status == 2:
+                    log_service_status("redis", "info", f"Turn {job_id} waits for earlier turns of chat_id: {chat_id}")
+                    return False
+                trimmed = result[1:]
+            else:
+                pipe = redis_client.pipeline(transaction=True)
+                pipe.lpush(key, entry)
+                if CHAT_HISTORY_SUMMARY_ENABLED:
+                    pipe.lrange(key, max_turns, -1)
+                pipe.ltrim(key, 0, max_turns - 1)
+                if CHAT_HISTORY_TTL > 0:
+                    pipe.expire(key, CHAT_HISTORY_TTL)
+                results = await pipe.execute()
+                trimmed = results[1] if CHAT_HISTORY_SUMMARY_ENABLED else []
+
+            if trimmed:
+                await self._roll_up_chat_history(redis_client, chat_id, trimmed)
+            log_service_status("redis", "info", f"Cache write - appended turn for chat_id: {chat_id}")
             return True
 
-        return await self.execute_redis_operation(store_operation, "store_chat") or False
+        return await self.execute_redis_operation(append_operation, "append_chat_turn") or False
+
+    async def _roll_up_chat_history(self, redis_client: aioredis.Redis, chat_id: str, trimmed: List[Any]) -> None:
+        """Fold turns trimmed from a chat's list into its summary.
+
+        The summary is read under WATCH and rewritten in MULTI/EXEC, so when two appends to
+        the chat roll up at once the later one retries on the updated summary instead of
+        overwriting it.
+        """
+        from config import CHAT_HISTORY_SUMMARY_MAX_CHARS, CHAT_HISTORY_TTL
+
+        key = summary_key(chat_id)
+        dropped = decode_window(trimmed)
+
+        async def fold(pipe: Any) -> None:
+            summary = roll_up(await pipe.get(key), dropped, CHAT_HISTORY_SUMMARY_MAX_CHARS)
+            pipe.multi()
+            pipe.set(key, summary, ex=CHAT_HISTORY_TTL if CHAT_HISTORY_TTL > 0 else None)
+
+        await redis_client.transaction(fold, key)
+
+    async def store_chat_entry(self, chat_id: str, chat_entry: Dict[str, Any]) -> bool:
+        """Store a chat entry (any historical entry shape) as a turn in Redis."""
+        turn = turn_from_entry(chat_entry)
+        return await self.append_chat_turn(
+            chat_id,
+            turn["user_message"],
+            turn["assistant_response"],
+            turn["timestamp"],
+            partial=turn.get("partial", False),
+        )
 
     async def query_chroma(self, query_text: str, n_results: int = 5) -> Optional[Dict[str, Any]]:
         """Query the chromadb collection."""
@@ -791,8 +1140,12 @@ class DatabaseManager:
                 return None
 
             # Query collection
-            results = self.chroma_collection.query(
-                query_embeddings=[query_embedding], n_results=n_results, include=["documents", "metadatas", "distances"]
+            results = await run_in_executor(
+                "chroma",
+                self.chroma_collection.query,
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                include=["documents", "metadatas", "distances"],
             )
 
             query_time = time.time() - start_time
@@ -889,7 +1242,7 @@ class DatabaseManager:
         try:
             if not self.redis_client:
                 return False
-            await asyncio.to_thread(self.redis_client.ping)
+            await self.redis_client.ping()
             return True
         except Exception:
             return False
@@ -900,7 +1253,7 @@ class DatabaseManager:
             if not self.chroma_client:
                 return False
             # Try to list collections as a health check
-            await asyncio.to_thread(self.chroma_client.list_collections)
+            await run_in_executor("chroma", self.chroma_client.list_collections)
             return True
         except Exception:
             return False
@@ -910,9 +1263,8 @@ class DatabaseManager:
         try:
             if not self.embedding_model:
                 return False
-            # Try a simple encoding as a health check
-            await asyncio.to_thread(self.embedding_model.encode, ["test"])
-            return True
+            # Probe through the cached path so repeated checks don't re-encode the same string
+            return await self.get_embedding("test") is not None
         except Exception:
             return False
 
@@ -1037,8 +1389,8 @@ async def get_database_health() -> Dict[str, Any]:
     return health_status
 
 
-async def get_chat_history(chat_id: str, limit: int = 100) -> List[Dict[str, Any]]:
-    """Get chat history from Redis."""
+async def get_chat_history(chat_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Get the most recent turns of a chat from Redis, oldest first."""
     global db_manager
     if not db_manager:
         db_manager = await initialize_database()
@@ -1051,6 +1403,31 @@ async def get_chat_history(chat_id: str, limit: int = 100) -> List[Dict[str, Any
     return await db_manager.get_chat_history(chat_id, limit)
 
 
+async def append_chat_turn(
+    chat_id: str,
+    user_message: str,
+    assistant_response: str,
+    timestamp: Optional[float] = None,
+    job_id: Optional[str] = None,
+    partial: bool = False,
+    sequence: Optional[int] = None,
+    ordered: bool = True,
+) -> bool:
+    """Append one exchange to a chat's capped history in Redis (once per ``job_id`` when given)."""
+    global db_manager
+    if not db_manager:
+        db_manager = await initialize_database()
+        if not db_manager:
+            log_service_status("redis", "error", "Cannot store chat turn: Database manager not available")
+            return False
+
+    # Ensure initialization is complete
+    await db_manager.ensure_initialized()
+    return await db_manager.append_chat_turn(
+        chat_id, user_message, assistant_response, timestamp, job_id, partial, sequence, ordered
+    )
+
+
 async def store_chat_entry(chat_id: str, chat_entry: Dict[str, Any]) -> bool:
     """Store a chat entry in Redis."""
     global db_manager
@@ -1091,7 +1468,7 @@ async def store_vector_data(text: str, metadata: Dict[str, Any]) -> bool:
             return False
 
         doc_id = str(time.time())
-        collection.add(embeddings=[embedding], documents=[text], metadatas=[metadata], ids=[doc_id])
+        await run_in_executor("chroma", collection.add, embeddings=[embedding], documents=[text], metadatas=[metadata], ids=[doc_id])
         log_service_status(
             "memory",
             "info",
@@ -1144,6 +1521,11 @@ def get_cache() -> CacheManager[Any]:
     return db_manager.get_cache()
 
 
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get the global chat response cache, or None if the database manager is unavailable."""
+    return db_manager.response_cache if db_manager else None
+
+
 def set_cache(key: str, value: Any, ttl: Optional[int] = None) -> bool:
     """Set a value in the global cache manager (synchronous)."""
     try:
@@ -1180,7 +1562,7 @@ async def set_cache_async(key: str, value: Any, ttl: Optional[int] = None) -> bo
 
 
 async def store_chat_history(chat_id: str, messages: List[Dict[str, Any]]) -> bool:
-    """Store complete chat history in Redis."""
+    """Replace a chat's history in Redis (oldest entry first); use ``append_chat_turn`` to add one exchange."""
     global db_manager
     if not db_manager:
         db_manager = await initialize_database()
@@ -1191,14 +1573,25 @@ async def store_chat_history(chat_id: str, messages: List[Dict[str, Any]]) -> bo
     # Ensure initialization is complete
     await db_manager.ensure_initialized()
 
-    def store_operation(redis_client: redis.Redis) -> bool:
-        """TODO: Add proper docstring for store_operation."""
-        chat_key = f"chat:{chat_id}"
-        # Clear existing history
-        redis_client.delete(chat_key)
-        # Store new history
-        for message in messages:
-            redis_client.lpush(chat_key, json.dumps(message))
+    from config import CHAT_HISTORY_MAX_TURNS
+
+    # Only the newest CHAT_HISTORY_MAX_TURNS entries would survive the cap anyway
+    turns = [turn_from_entry(message) for message in messages[-max(1, CHAT_HISTORY_MAX_TURNS):]]
+
+    async def store_operation(redis_client: aioredis.Redis) -> bool:
+        """Replace the history in one MULTI/EXEC round trip (delete plus a single multi-value LPUSH)."""
+        chat_key = history_key(chat_id)
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.delete(chat_key, summary_key(chat_id))
+        if turns:
+            pipe.lpush(
+                chat_key,
+                *[
+                    encode_turn(turn["user_message"], turn["assistant_response"], turn["timestamp"], "partial" in turn)
+                    for turn in turns
+                ],
+            )
+        await pipe.execute()
         log_service_status("redis", "info", f"Cache write - stored {len(messages)} messages for chat_id: {chat_id}")
         return True
 
@@ -1243,7 +1636,9 @@ async def retrieve_user_memory(user_id: str, query: str, n_results: int = 5) ->
         if not query_embedding:
             return []
 
-        results = db_manager.chroma_collection.query(
+        results = await run_in_executor(
+            "chroma",
+            db_manager.chroma_collection.query,
             query_embeddings=[query_embedding],
             n_results=n_results,
             where={"user_id": user_id},
@@ -1285,6 +1680,79 @@ async def retrieve_user_memory(user_id: str, query: str, n_results: int = 5) ->
         return []
 
 
+async def retrieve_user_memory_batch(
+    user_id: str,
+    queries: List[str],
+    n_results: int = 5,
+    query_embeddings: Optional[List[Optional[List[float]]]] = None,
+) -> List[List[Dict[str, Any]]]:
+    """Retrieve user-specific memory for several queries at once.
+
+    All queries are embedded in one forward pass and searched with a single vector
+    query, instead of one embedding and one ChromaDB round trip per query.
+
+    Args:
+        user_id: The ID of the user whose memory to search
+        queries: Query texts to search for
+        n_results: Number of results to return per query (default: 5)
+        query_embeddings: Embeddings already computed for ``queries`` (skips the embedding pass)
+
+    Returns:
+        One list of memories (document, metadata, distance, similarity) per query, in
+        order; a query that could not be embedded gets an empty list
+    """
+    global db_manager
+    memories: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    if not queries:
+        return memories
+    if not db_manager:
+        await initialize_database()
+        if not db_manager:
+            return memories
+
+    try:
+        start_time = time.time()
+
+        if not db_manager.chroma_collection or not db_manager.embedding_model:
+            return memories
+
+        embeddings = query_embeddings if query_embeddings is not None else await db_manager.embed_queries(queries)
+        positions = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+        if not positions:
+            return memories
+        query_embeddings = [embeddings[i] for i in positions]
+
+        # Hot tier first; otherwise one ChromaDB query carrying every query embedding
+        results = await db_manager.vector_index.asearch(user_id, query_embeddings, n_results)
+        if results is None:
+            results = await run_in_executor(
+                "chroma",
+                db_manager.chroma_collection.query,
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where={"user_id": user_id},
+                include=["documents", "metadatas", "distances"],
+            )
+
+        for row, i in enumerate(positions):
+            for doc, meta, dist in zip(
+                results.get("documents", [])[row], results.get("metadatas", [])[row], results.get("distances", [])[row]
+            ):
+                memories[i].append({"document": doc, "metadata": meta, "distance": dist, "similarity": 1 - dist})
+
+        query_time = time.time() - start_time
+        log_service_status(
+            "memory",
+            "info",
+            f"Memory batch - {sum(len(m) for m in memories)} memories for {len(queries)} queries, user: {user_id} "
+            f"(query_time: {query_time:.3f}s)",
+        )
+        return memories
+    except Exception as e:
+        log_service_status("chromadb", "error", f"Error retrieving user memory batch: {str(e)}")
+        return [[] for _ in queries]
+
+
 async def index_document_chunks(user_id: str, doc_id: str, name: str, chunks: List[str]) -> bool:
     """Index pre-chunked document content in the vector database."""
     global db_manager
@@ -1323,7 +1791,7 @@ async def index_document_chunks(user_id: str, doc_id: str, name: str, chunks: Li
         if not collection:
             return False
 
-        collection.add(embeddings=embeddings, documents=chunks, metadatas=metadatas, ids=chunk_ids)
+        await run_in_executor("chroma", collection.add, embeddings=embeddings, documents=chunks, metadatas=metadatas, ids=chunk_ids)
         log_service_status(
             "memory", "info", f"Successfully indexed {len(chunks)} chunks for doc_id={doc_id}, user_id={user_id}"
         )
@@ -1334,9 +1802,12 @@ async def index_document_chunks(user_id: str, doc_id: str, name: str, chunks: Li
         return False
 
 
-def index_document_chunks(db_manager, user_id, doc_id, name, chunks, request_id=""):
+async def index_document_chunks(db_manager, user_id, doc_id, name, chunks, request_id=""):
     """Embed and index a list of pre-chunked text documents for a user in chromadb.
     
+    Encoding runs on the "embedding" executor and the ChromaDB write on the
+    "chroma" executor, so the calling event loop is never blocked.
+    
     Args:
         db_manager: The database manager instance
         user_id: The ID of the user who owns the document
@@ -1348,7 +1819,7 @@ def index_document_chunks(db_manager, user_id, doc_id, name, chunks, request_id=
     Returns:
         True if indexing was successful, False otherwise
     """
-    def _index_op():
+    async def _index_op():
         """Index document chunks in ChromaDB.
         
         Embeds and stores document chunks in ChromaDB for the specified user,
@@ -1357,7 +1828,7 @@ def index_document_chunks(db_manager, user_id, doc_id, name, chunks, request_id=
         Returns:
             True if indexing was successful, False otherwise
         """
-        if not db_manager.is_chromadb_available():
+        if not await db_manager.is_chromadb_available():
             logging.warning("[CHROMADB] chromadb not available, skipping document indexing")
             return False
 
@@ -1366,8 +1837,7 @@ def index_document_chunks(db_manager, user_id, doc_id, name, chunks, request_id=
             return False
 
         try:
-            # Set show_progress_bar to False for cleaner logs
-            embeddings = db_manager.embedding_model.encode(chunks, show_progress_bar=False).tolist()
+            embeddings = await db_manager.encode_chunks(chunks)
             logging.info(f"Generated embeddings for {len(chunks)} chunks for doc_id={doc_id}")
         except Exception as e:
             logging.error(f"Failed to generate embeddings for doc_id={doc_id}: {e}")
@@ -1379,23 +1849,31 @@ def index_document_chunks(db_manager, user_id, doc_id, name, chunks, request_id=
         ]
 
         try:
-            db_manager.chroma_collection.add(
-                embeddings=embeddings, ids=chunk_ids, metadatas=metadatas, documents=chunks
+            await run_in_executor(
+                "chroma",
+                db_manager.chroma_collection.add,
+                embeddings=embeddings,
+                ids=chunk_ids,
+                metadatas=metadatas,
+                documents=chunks,
             )
+            await run_in_executor("chroma", db_manager.vector_index.upsert, chunk_ids, embeddings, chunks, metadatas)
+            db_manager.memory_changed(user_id)
             logging.info(f"Successfully indexed {len(chunks)} chunks for doc_id={doc_id}, user_id={user_id}")
             return True
         except Exception as e:
             logging.error(f"Failed to store chunks in chromadb for doc_id={doc_id}: {e}")
             raise e
 
-    return safe_execute(
-        _index_op,
-        fallback_value=False,
-        error_handler=lambda e: MemoryErrorHandler.handle_memory_error(e, "index_chunks", user_id, request_id),
-    )
+    try:
+        return await _index_op()
+    except Exception as e:
+        log_service_status("ERROR_HANDLER", "error", f"Error indexing chunks for doc_id={doc_id}: {e}")
+        MemoryErrorHandler.handle_memory_error(e, "index_chunks", user_id, request_id)
+        return False
 
 
-def index_user_document(db_manager, user_id, doc_id, name, text, chunk_size=1000, chunk_overlap=200, request_id=""):
+async def index_user_document(db_manager, user_id, doc_id, name, text, chunk_size=1000, chunk_overlap=200, request_id=""):
     """Chunk, embed, and index a document for a specific user in chromadb.
     
     Args:
@@ -1419,12 +1897,14 @@ def index_user_document(db_manager, user_id, doc_id, name, text, chunk_size=1000
         logging.warning(f"No chunks created for doc_id={doc_id}, user_id={user_id}")
         return False
 
-    return index_document_chunks(db_manager, user_id, doc_id, name, chunks, request_id)
+    return await index_document_chunks(db_manager, user_id, doc_id, name, chunks, request_id)
 
 
-def retrieve_user_memory(db_manager, user_id, query_embedding, n_results=5, request_id=""):
+async def retrieve_user_memory(db_manager, user_id, query_embedding, n_results=5, request_id=""):
     """Retrieve relevant memory chunks for a user from chromadb.
     
+    The lookup runs on the "chroma" executor so the calling event loop is never blocked.
+    
     Args:
         db_manager: The database manager instance
         user_id: The ID of the user whose memory to search
@@ -1479,12 +1959,14 @@ def retrieve_user_memory(db_manager, user_id, query_embedding, n_results=5, requ
 
         logging.debug(f"[MEMORY] 📐 Query embedding dimension: {len(embedding_list)}")
 
-        results = db_manager.chroma_collection.query(
-            query_embeddings=[embedding_list],
-            n_results=n_results,
-            where={"user_id": user_id},
-            include=["documents", "metadatas", "distances"],
-        )
+        results = db_manager.vector_index.search(user_id, [embedding_list], n_results)
+        if results is None:
+            results = db_manager.chroma_collection.query(
+                query_embeddings=[embedding_list],
+                n_results=n_results,
+                where={"user_id": user_id},
+                include=["documents", "metadatas", "distances"],
+            )
 
         logging.info(f"[MEMORY] 📊 chromadb query results: {results}")
 
@@ -1536,16 +2018,20 @@ def retrieve_user_memory(db_manager, user_id, query_embedding, n_results=5, requ
         logging.info(f"[MEMORY] 📋 Returning {len(formatted_results)} formatted results")
         return formatted_results
 
-    return safe_execute(
+    return await run_in_executor(
+        "chroma",
+        safe_execute,
         _retrieve_memory,
         fallback_value=[],
         error_handler=lambda e: MemoryErrorHandler.handle_memory_error(e, "retrieve", user_id, request_id),
     )
 
 
-def get_embedding(db_manager, text, request_id=""):
+async def get_embedding(db_manager, text, request_id=""):
     """Get embedding vector for text using the embedding model.
     
+    Encoding runs on the "embedding" executor so the calling event loop is never blocked.
+    
     Args:
         db_manager: The database manager instance
         text: The text to generate an embedding for
@@ -1556,6 +2042,19 @@ def get_embedding(db_manager, text, request_id=""):
     """
     logging.critical(f"🔍 [DATABASE] get_embedding called with text: '{text[:50]}...'")
 
+    if not db_manager.is_embeddings_available():
+        logging.warning("[EMBEDDINGS] Embedding model not available")
+        logging.critical(f"❌ [DATABASE] Embedding model not available")
+        return None
+
+    from config import EMBEDDING_MODEL
+
+    # Legacy path encodes without prefix or normalization, so it gets its own cache namespace
+    cache_key = db_manager.embedding_cache.make_key(EMBEDDING_MODEL, "raw", text)
+    cached = await db_manager.embedding_cache.aget(cache_key)
+    if cached is not None:
+        return cached
+
     def _get_embedding():
         """Generate an embedding vector for the given text using the embedding model.
         
@@ -1565,11 +2064,6 @@ def get_embedding(db_manager, text, request_id=""):
         Returns:
             A numerical embedding vector if successful, None otherwise
         """
-        if not db_manager.is_embeddings_available():
-            logging.warning("[EMBEDDINGS] Embedding model not available")
-            logging.critical(f"❌ [DATABASE] Embedding model not available")
-            return None
-
         logging.critical(f"🔍 [DATABASE] Generating embedding using model: {type(db_manager.embedding_model)}")
         # Get the embedding and return the first element (single text input)
         embedding = db_manager.embedding_model.encode([text])
@@ -1584,8 +2078,10 @@ def get_embedding(db_manager, text, request_id=""):
         logging.critical(f"❌ [DATABASE] Embedding invalid or empty")
         return None
 
-    # Execute synchronously in the current thread
-    return _get_embedding()
+    result = await run_in_executor("embedding", _get_embedding)
+    if result is not None:
+        await db_manager.embedding_cache.aset(cache_key, result)
+    return result
 
 
 # Initialize the global database manager instance at module import time
@@ -130,6 +130,16 @@ class ChatErrorHandler:
 class ToolErrorHandler:
     """Specialized error handler for tool operations."""
 
+    TOOL_FALLBACKS = {
+        "web_search": "I couldn't perform the web search right now.",
+        "calculator": "I couldn't perform the calculation. Please check your input.",
+    }
+
+    @staticmethod
+    def fallback_message(tool_name: str) -> str:
+        """Get the user-facing message returned when a tool fails."""
+        return ToolErrorHandler.TOOL_FALLBACKS.get(tool_name, f"The {tool_name} tool encountered an issue.")
+
     @staticmethod
     def handle_tool_error(
         error: Exception,
@@ -149,11 +159,7 @@ class ToolErrorHandler:
 
         log_error(error, context, user_id, request_id)
 
-        tool_fallbacks = {
-            "web_search": "I couldn't perform the web search right now.",
-            "calculator": "I couldn't perform the calculation. Please check your input.",
-        }
-        return tool_fallbacks.get(tool_name, f"The {tool_name} tool encountered an issue.")
+        return ToolErrorHandler.fallback_message(tool_name)
 
 
 class CacheErrorHandler:
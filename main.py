@@ -2,12 +2,10 @@
 Main FastAPI application with modular structure.
 """
 
-import json
 import time
 import uuid
 from contextlib import asynccontextmanager
-from datetime import datetime
-from typing import Dict
+from typing import Any, Dict, List
 
 from fastapi import FastAPI, Request, Body, Depends, HTTPException
 from fastapi.responses import StreamingResponse, JSONResponse
@@ -21,13 +19,20 @@ from utilities.cpu_enforcer import enforce_cpu_only_mode
 enforce_cpu_only_mode()
 
 # Import modules
-from config import DEFAULT_MODEL, OLLAMA_BASE_URL, DEFAULT_SYSTEM_PROMPT
+from config import DEFAULT_MODEL, OLLAMA_BASE_URL, OPENAI_API_BASE_URL, USE_OLLAMA, DEFAULT_SYSTEM_PROMPT
 from handlers import create_exception_handlers
 from human_logging import log_api_request, log_service_status
 from models import ChatRequest, ChatResponse, OpenAIMessage, OpenAIChatRequest, ModelListResponse, ErrorResponse
 from routes import health_router, chat_router, models_router, upload_router, debug_router, memory_router
 from services.llm_service import call_llm, call_llm_stream
-from services.streaming_service import streaming_service, STREAM_SESSION_STOP, STREAM_SESSION_METADATA
+from services.streaming_service import streaming_service
+from services.ingestion_service import ingestion_service
+from services.write_behind import write_behind_queue
+from utilities.executors import executors
+from utilities.context_builder import context_builder, history_to_messages
+from utilities.http_client_pool import http_client_pool
+from utilities.redis_access import track_request as track_redis_request
+from utilities.sse_encoder import SSE_DONE, coalesce_tokens, openai_chunk_template, sse_event
 from startup import startup_event
 
 # Import existing routers
@@ -35,7 +40,7 @@ from model_manager import router as model_manager_router, initialize_model_cache
 
 # Import database and other dependencies
 from database_manager import db_manager, get_embedding, index_user_document, retrieve_user_memory
-from database_manager import get_cache, set_cache, get_chat_history, store_chat_history, get_database_health
+from database_manager import get_cache, set_cache, get_chat_history, get_database_health
 from error_handler import CacheErrorHandler, safe_execute, log_error
 
 
@@ -49,6 +54,18 @@ async def lifespan(app: FastAPI):
         await startup_event(app)
         # Initialize model cache
         await initialize_model_cache()
+        # Start draining post-response writes (chat turns, memories)
+        await write_behind_queue.start(db_manager.redis_client if db_manager else None)
+        # Reap expired streaming sessions and receive stop requests from other workers
+        await streaming_service.start(db_manager.redis_client if db_manager else None)
+        # Open keep-alive connections to the LLM upstream before the first request
+        try:
+            if USE_OLLAMA:
+                await http_client_pool.warm_up(OLLAMA_BASE_URL, "/api/version")
+            else:
+                await http_client_pool.warm_up(OPENAI_API_BASE_URL)
+        except Exception as e:
+            log_service_status("HTTP", "warning", f"LLM connection warm-up failed: {e}")
         log_service_status("APP", "ready", "Application startup completed successfully")
     except Exception as e:
         log_service_status("APP", "error", f"Error during application startup: {e}")
@@ -58,6 +75,11 @@ async def lifespan(app: FastAPI):
 
     # Shutdown
     log_service_status("APP", "info", "Application shutting down")
+    await ingestion_service.shutdown()
+    await streaming_service.shutdown()
+    await write_behind_queue.shutdown()
+    await http_client_pool.aclose()
+    executors.shutdown()
 
 
 # Import security configuration
@@ -116,6 +138,35 @@ app.include_router(model_manager_router)
 
 
 # OpenAI-compatible chat completions endpoint
+def build_completion_messages(
+    messages: List[Dict[str, Any]], history: List[Dict[str, Any]], user_message: str, model: str
+) -> List[Dict[str, Any]]:
+    """Pack an OpenAI-style request into the model's token budget.
+
+    Prior turns come from the request when the client sends the conversation (as
+    OpenWebUI does), otherwise from the stored history window.
+    """
+    system_prompt = "\n\n".join(str(m["content"]) for m in messages if m.get("role") == "system")
+    conversation = [m for m in messages if m.get("role") != "system"]
+    prior = [
+        {"role": m["role"], "content": m["content"]}
+        for m in conversation[:-1]
+        if m.get("role") in ("user", "assistant") and isinstance(m.get("content"), str)
+    ]
+    summary = None
+    if not prior:
+        prior, summary = history_to_messages(history or [])
+
+    context = context_builder.build(
+        model, system_prompt or DEFAULT_SYSTEM_PROMPT, user_message, history=prior, summary=summary
+    )
+    packed = context.messages
+    # Keep image parts of a multimodal final message
+    if conversation and conversation[-1].get("role") == "user" and not isinstance(conversation[-1]["content"], str):
+        packed[-1] = conversation[-1]
+    return packed
+
+
 @app.post("/v1/chat/completions")
 async def openai_chat_completions(request: Request, body: dict = Body(...)):
     """
@@ -197,8 +248,11 @@ async def openai_chat_completions(request: Request, body: dict = Body(...)):
 
     # Streaming support
     if stream:
-        session_id = f"{user_id}:{body.get('model', DEFAULT_MODEL)}:{int(time.time())}"
-        streaming_service.create_session(session_id, user_id, body.get("model", DEFAULT_MODEL))
+        model = body.get("model", DEFAULT_MODEL)
+        created = int(time.time())
+        session = await streaming_service.create_session(user_id, model)
+        session_id = session.session_id
+        stop_event = session.stop_event
 
         async def event_stream():
             """Enhanced event stream with proper error handling and cleanup."""
@@ -207,89 +261,54 @@ async def openai_chat_completions(request: Request, body: dict = Body(...)):
 
                 # --- Retrieve chat history and memory for streaming ---
                 try:
-                    history = await get_chat_history(f"user:{user_id}", limit=10)
+                    history = await get_chat_history(f"user:{user_id}")
                 except Exception as e:
                     CacheErrorHandler.handle_cache_error(
                         e, "get_history", f"history:{user_id}", user_id, getattr(request.state, "request_id", "unknown")
                     )
                     history = []
 
-                # Build enhanced message format with chat history for streaming
-                stream_messages = []
-
-                # Add system message first (if any)
-                system_messages = [m for m in messages if m.get("role") == "system"]
-                if system_messages:
-                    stream_messages.extend(system_messages)
-                else:
-                    # Add default persona system message if none provided
-                    stream_messages.append({"role": "system", "content": DEFAULT_SYSTEM_PROMPT})
-
-                # Add historical chat messages (maintain conversation context)
-                if history:
-                    # Convert history to proper chat format
-                    for entry in history[-5:]:  # Last 5 conversations for context
-                        if isinstance(entry, dict):
-                            user_msg = entry.get("user_message", "")
-                            assistant_msg = entry.get("assistant_response", "")
-                            if user_msg:
-                                stream_messages.append({"role": "user", "content": str(user_msg)})
-                            if assistant_msg:
-                                stream_messages.append({"role": "assistant", "content": str(assistant_msg)})
-
-                # Add current conversation messages (excluding system messages already added)
-                current_messages = [m for m in messages if m.get("role") != "system"]
-                stream_messages.extend(current_messages)
-
-                token_count = 0
-                full_response = ""  # Collect the full response for storage
-
-                async for token in call_llm_stream(
-                    stream_messages, model=body.get("model", DEFAULT_MODEL), session_id=session_id
-                ):
-                    if not token:
+                # Pack system prompt, prior turns and the current message into the model's budget
+                stream_messages = build_completion_messages(messages, history, user_message, model)
+
+                # Event bytes are pre-serialized once per stream; only the token text is spliced in
+                chunk_template = openai_chunk_template(f"chatcmpl-{session_id}", model, created)
+                chunk_count = 0
+                parts = []  # Collect the full response for storage
+
+                tokens = call_llm_stream(stream_messages, model=model, stop_event=stop_event, session_id=session_id)
+                async for text in coalesce_tokens(tokens):
+                    if not text:
                         continue
 
-                    # Check if stream was stopped
-                    if STREAM_SESSION_STOP.get(session_id, False):
+                    # Check if stream was stopped (the session's own event, no registry lookup)
+                    if stop_event.is_set():
                         log_service_status("STREAM", "info", f"Stream {session_id} stopped by client")
                         break
 
-                    token_count += 1
-                    full_response += token  # Accumulate the full response
-                    data = {
-                        "id": f"chatcmpl-{session_id}",
-                        "object": "chat.completion.chunk",
-                        "created": int(time.time()),
-                        "model": body.get("model", DEFAULT_MODEL),
-                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
-                    }
+                    chunk_count += 1
+                    parts.append(text)  # Accumulate the full response
+                    await streaming_service.touch(session)
+                    yield chunk_template.encode(text)
 
-                    try:
-                        yield f"data: {json.dumps(data)}\n\n"
-                    except Exception as e:
-                        log_service_status("STREAM", "error", f"Error yielding token: {e}")
-                        break
+                full_response = "".join(parts)
+                # The tokens also end early when the stop arrives between chunks
+                partial = stop_event.is_set()
 
-                # Store the complete streaming response in chat history
+                # Store the streaming response in chat history (marked partial when stopped)
                 if full_response:
 
                     async def store_streaming_chat():
                         try:
-                            await store_chat_history(
-                                f"user:{user_id}",
-                                [
-                                    {
-                                        "role": "user",
-                                        "content": user_message,
-                                        "timestamp": datetime.fromtimestamp(start_time).isoformat(),
-                                    },
-                                    {
-                                        "role": "assistant",
-                                        "content": str(full_response),
-                                        "timestamp": datetime.utcnow().isoformat(),
-                                    },
-                                ],
+                            await write_behind_queue.enqueue(
+                                "chat_turn",
+                                {
+                                    "chat_id": f"user:{user_id}",
+                                    "user_message": user_message,
+                                    "assistant_response": str(full_response),
+                                    "timestamp": start_time,
+                                    "partial": partial,
+                                },
                             )
                         except Exception as e:
                             CacheErrorHandler.handle_cache_error(
@@ -305,14 +324,13 @@ async def openai_chat_completions(request: Request, body: dict = Body(...)):
                 final_data = {
                     "id": f"chatcmpl-{session_id}",
                     "object": "chat.completion.chunk",
-                    "created": int(time.time()),
-                    "model": body.get("model", DEFAULT_MODEL),
+                    "created": created,
+                    "model": model,
                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
                 }
-                yield f"data: {json.dumps(final_data)}\n\n"
-                yield "data: [DONE]\n\n"
+                yield sse_event(final_data) + SSE_DONE
 
-                log_service_status("STREAM", "info", f"Stream {session_id} completed with {token_count} tokens")
+                log_service_status("STREAM", "info", f"Stream {session_id} completed with {chunk_count} chunks")
 
             except Exception as e:
                 log_service_status("STREAM", "error", f"Stream {session_id} failed: {e}")
@@ -320,15 +338,14 @@ async def openai_chat_completions(request: Request, body: dict = Body(...)):
                 error_data = {
                     "id": f"chatcmpl-{session_id}",
                     "object": "chat.completion.chunk",
-                    "created": int(time.time()),
-                    "model": body.get("model", DEFAULT_MODEL),
+                    "created": created,
+                    "model": model,
                     "choices": [{"index": 0, "delta": {"content": f"Error: {str(e)}"}, "finish_reason": "stop"}],
                 }
-                yield f"data: {json.dumps(error_data)}\n\n"
-                yield "data: [DONE]\n\n"
+                yield sse_event(error_data) + SSE_DONE
             finally:
                 # Cleanup
-                STREAM_SESSION_STOP.pop(session_id, None)
+                streaming_service.close_session(session)
                 log_service_status("STREAM", "info", f"Cleaned up session {session_id}")
 
         return StreamingResponse(
@@ -342,39 +359,15 @@ async def openai_chat_completions(request: Request, body: dict = Body(...)):
         try:
             # --- Retrieve chat history and memory for OpenWebUI integration ---
             try:
-                history = await get_chat_history(f"user:{user_id}", limit=10)
+                history = await get_chat_history(f"user:{user_id}")
             except Exception as e:
                 CacheErrorHandler.handle_cache_error(
                     e, "get_history", f"history:{user_id}", user_id, getattr(request.state, "request_id", "unknown")
                 )
                 history = []
 
-            # Build enhanced message format with chat history
-            llm_messages = []
-
-            # Add system message first (if any)
-            system_messages = [m for m in messages if m.get("role") == "system"]
-            if system_messages:
-                llm_messages.extend(system_messages)
-            else:
-                # Add default persona system message if none provided
-                llm_messages.append({"role": "system", "content": DEFAULT_SYSTEM_PROMPT})
-
-            # Add historical chat messages (maintain conversation context)
-            if history:
-                # Convert history to proper chat format
-                for entry in history[-5:]:  # Last 5 conversations for context
-                    if isinstance(entry, dict):
-                        user_msg = entry.get("message", "")
-                        assistant_msg = entry.get("response", "")
-                        if user_msg:
-                            llm_messages.append({"role": "user", "content": str(user_msg)})
-                        if assistant_msg:
-                            llm_messages.append({"role": "assistant", "content": str(assistant_msg)})
-
-            # Add current conversation messages (excluding system messages already added)
-            current_messages = [m for m in messages if m.get("role") != "system"]
-            llm_messages.extend(current_messages)
+            # Pack system prompt, prior turns and the current message into the model's budget
+            llm_messages = build_completion_messages(messages, history, user_message, body.get("model", DEFAULT_MODEL))
 
             # Call LLM directly with the specified model
             llm_response = await call_llm(llm_messages, model=body.get("model", DEFAULT_MODEL))
@@ -384,20 +377,14 @@ async def openai_chat_completions(request: Request, body: dict = Body(...)):
 
                 async def store_chat():
                     try:
-                        await store_chat_history(
-                            f"user:{user_id}",
-                            [
-                                {
-                                    "role": "user",
-                                    "content": user_message,
-                                    "timestamp": datetime.fromtimestamp(start_time).isoformat(),
-                                },
-                                {
-                                    "role": "assistant",
-                                    "content": str(llm_response),
-                                    "timestamp": datetime.utcnow().isoformat(),
-                                },
-                            ],
+                        await write_behind_queue.enqueue(
+                            "chat_turn",
+                            {
+                                "chat_id": f"user:{user_id}",
+                                "user_message": user_message,
+                                "assistant_response": str(llm_response),
+                                "timestamp": start_time,
+                            },
                         )
                     except Exception as e:
                         CacheErrorHandler.handle_cache_error(
@@ -430,6 +417,18 @@ async def openai_chat_completions(request: Request, body: dict = Body(...)):
             raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
 
+@app.post("/v1/chat/completions/{session_id}/stop")
+async def stop_chat_completion(session_id: str):
+    """
+    Stop a running stream by the id from its X-Session-ID header (on whichever worker runs it).
+    """
+    result = await streaming_service.stop_streaming_session(session_id)
+    if result == "not_found":
+        raise HTTPException(status_code=404, detail=f"Streaming session not found: {session_id}")
+    log_service_status("STREAM", "info", f"Stop requested for session {session_id} ({result})")
+    return {"session_id": session_id, "status": result}
+
+
 # Middleware for request tracking
 @app.middleware("http")
 async def request_middleware(request: Request, call_next):
@@ -445,8 +444,12 @@ async def request_middleware(request: Request, call_next):
     log_service_status("REQUEST", "info", f"[{request_id}] {request.method} {request.url.path} - Started")
 
     try:
-        # Process request
-        response = await call_next(request)
+        # Process request, attributing Redis round trips to it
+        with track_redis_request(request.url.path) as redis_round_trips:
+            response = await call_next(request)
+            route = request.scope.get("route")
+            if route is not None:
+                redis_round_trips.route = getattr(route, "path", redis_round_trips.route)
 
         # Calculate timing
         end_time = time.time()
@@ -463,6 +466,7 @@ async def request_middleware(request: Request, call_next):
         # Add timing headers
         response.headers["X-Request-ID"] = request_id
         response.headers["X-Process-Time"] = f"{response_time_ms:.2f}ms"
+        response.headers["X-Redis-Round-Trips"] = str(redis_round_trips.count)
 
         # Log API request for monitoring
         log_api_request(request.method, request.url.path, response.status_code, response_time_ms)
@@ -50,6 +50,19 @@ app.add_middleware(
 )
 # Global connections
 redis_client = None
+read_and_touch_memories = None
+# HGETALL every key and increment access_count on the ones that exist, atomically
+READ_AND_TOUCH_SCRIPT = """
+local rows = {}
+for i, key in ipairs(KEYS) do
+    local fields = redis.call('HGETALL', key)
+    if #fields > 0 then
+        redis.call('HINCRBY', key, 'access_count', 1)
+    end
+    rows[i] = fields
+end
+return rows
+"""
 chroma_client = None
 memory_collection = None
 class MemoryRetrieveRequest(BaseModel):
@@ -81,7 +94,7 @@ class ForgetMemoryRequest(BaseModel):
     source: Optional[str] = "forget_command"
 async def initialize_databases():
     """Initialize Redis and ChromaDB connections."""
-    global redis_client, chroma_client, memory_collection
+    global redis_client, chroma_client, memory_collection, read_and_touch_memories
     try:
         # Initialize Redis for short-term memory
         redis_client = redis.Redis(
@@ -93,6 +106,7 @@ async def initialize_databases():
         )
         # Test Redis connection
         redis_client.ping()
+        read_and_touch_memories = redis_client.register_script(READ_AND_TOUCH_SCRIPT)
         print(f"✅ Redis connected at {REDIS_HOST}:{REDIS_PORT}")
     except Exception as e:
         print(f"❌ Redis connection failed: {e}")
@@ -293,9 +307,13 @@ async def retrieve_from_redis(user_id: str, query: str) -> List[Dict[str, Any]]:
         # Get all memory keys for this user
         pattern = f"memory:{user_id}:*"
         keys = redis_client.keys(pattern)
+        if not keys:
+            return []
+        # Read every memory and bump its access count in one atomic script call
+        rows = read_and_touch_memories(keys=keys)
         memories = []
-        for key in keys:
-            memory_data = redis_client.hgetall(key)
+        for fields in rows:
+            memory_data = dict(zip(fields[::2], fields[1::2]))
             if memory_data:
                 memories.append({
                     "content": memory_data.get("content", ""),
@@ -306,8 +324,6 @@ async def retrieve_from_redis(user_id: str, query: str) -> List[Dict[str, Any]]:
                         "conversation_id": memory_data.get("conversation_id", "")
                     }
                 })
-                # Increment access count
-                redis_client.hincrby(key, "access_count", 1)
                 # Check if this memory should be promoted to long-term storage
                 access_count = int(memory_data.get("access_count", 0)) + 1
                 if access_count >= LONG_TERM_THRESHOLD:
@@ -358,8 +374,11 @@ async def store_to_redis(user_id: str, content: str, interaction: Dict[str, Any]
             "access_count": 0,
             "source": interaction["source"]
         }
-        redis_client.hset(key, mapping=memory_data)
-        redis_client.expire(key, SHORT_TERM_TTL)
+        # Write and set the TTL in one MULTI/EXEC round trip
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.hset(key, mapping=memory_data)
+        pipe.expire(key, SHORT_TERM_TTL)
+        pipe.execute()
         return True
     except Exception as e:
         print(f"❌ Redis storage error: {e}")
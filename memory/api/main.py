@@ -21,6 +21,9 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import httpx
 import uvicorn
+
+from utilities.context_builder import context_builder
+
 # Database imports
 try:
     import redis
@@ -40,6 +43,12 @@ CHROMA_HOST = os.getenv("CHROMA_HOST", "chroma")
 CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
 # Memory lifecycle settings
 SHORT_TERM_TTL = 24 * 60 * 60  # 24 hours for Redis
+# Redis key layout for short-term memories:
+#   memory:{user_id}:{memory_id}  -> JSON memory, expires after SHORT_TERM_TTL
+#   memory_index:{user_id}        -> sorted set of memory ids scored by expiry time
+#   memory_users                  -> set of user ids that have an index
+MEMORY_INDEX_MIGRATED_KEY = "memory_index:migrated"
+MEMORY_USERS_KEY = "memory_users"
 LONG_TERM_THRESHOLD = 3  # After 3 accesses, move to long-term storage
 app = FastAPI(title="Enhanced Memory API", version="2.0.0")
 # Enable CORS for function access
@@ -123,6 +132,7 @@ async def initialize_databases():
         # Test Redis connection
         redis_client.ping()
         print(f"✅ Redis connected at {REDIS_HOST}:{REDIS_PORT}")
+        migrate_redis_memory_index()
     except Exception as e:
         print(f"❌ Redis connection failed: {e}")
         print("⚠️ Falling back to in-memory short-term storage")
@@ -451,28 +461,111 @@ async def clear_memories(request: MemoryClearRequest = Body(...)):
 # Helper Functions for Memory Operations
 # =====================================
 
+def memory_key(user_id: str, memory_id: str) -> str:
+    """Redis key holding one short-term memory."""
+    return f"memory:{user_id}:{memory_id}"
+
+def memory_index_key(user_id: str) -> str:
+    """Redis sorted set indexing a user's short-term memory ids by expiry time."""
+    return f"memory_index:{user_id}"
+
+def get_user_redis_memories(user_id: str) -> List[tuple]:
+    """Get (memory_id, raw JSON) for a user's live short-term memories.
+
+    Expired ids are pruned from the index by score, live ids are read from it and
+    the values are fetched with a single MGET, so the cost is proportional to
+    this user's memories rather than the whole keyspace.
+    """
+    index_key = memory_index_key(user_id)
+    now = time.time()
+    pipe = redis_client.pipeline()
+    pipe.zremrangebyscore(index_key, "-inf", now)
+    pipe.zrangebyscore(index_key, f"({now}", "+inf")
+    _, memory_ids = pipe.execute()
+    if not memory_ids:
+        return []
+    values = redis_client.mget([memory_key(user_id, memory_id) for memory_id in memory_ids])
+    missing = [memory_id for memory_id, value in zip(memory_ids, values) if value is None]
+    if missing:
+        # Deleted outside this API; drop the dangling index entries
+        redis_client.zrem(index_key, *missing)
+    return [(memory_id, value) for memory_id, value in zip(memory_ids, values) if value is not None]
+
+def count_user_redis_memories(user_ids: List[str]) -> Dict[str, int]:
+    """Count live short-term memories per user (expired ids pruned, then ZCARD)."""
+    if not user_ids:
+        return {}
+    now = time.time()
+    pipe = redis_client.pipeline()
+    for user_id in user_ids:
+        pipe.zremrangebyscore(memory_index_key(user_id), "-inf", now)
+        pipe.zcard(memory_index_key(user_id))
+    results = pipe.execute()
+    return {user_id: results[2 * i + 1] for i, user_id in enumerate(user_ids)}
+
+def migrate_redis_memory_index():
+    """Index short-term memories written before per-user indexes existed (runs once).
+
+    Uses an incremental SCAN rather than KEYS, so Redis is never blocked.
+    """
+    if not redis_client or redis_client.exists(MEMORY_INDEX_MIGRATED_KEY):
+        return
+    try:
+        indexed = 0
+        batch = []
+        for key in redis_client.scan_iter(match="memory:*", count=1000):
+            # Memory ids are uuids (no ":"), so the last ":" ends the user id, which may contain ":"
+            user_id, sep, memory_id = key[len("memory:"):].rpartition(":")
+            if sep and user_id and memory_id:
+                batch.append(["memory", user_id, memory_id])
+            if len(batch) >= 500:
+                indexed += _index_existing_memories(batch)
+                batch = []
+        if batch:
+            indexed += _index_existing_memories(batch)
+        redis_client.set(MEMORY_INDEX_MIGRATED_KEY, int(time.time()))
+        print(f"✅ Indexed {indexed} existing short-term memories")
+    except Exception as e:
+        print(f"❌ Redis memory index migration error: {e}")
+
+def _index_existing_memories(keys: List[List[str]]) -> int:
+    """Add already-stored memories to their users' indexes using their remaining TTL."""
+    pipe = redis_client.pipeline()
+    for _, user_id, memory_id in keys:
+        pipe.ttl(memory_key(user_id, memory_id))
+    ttls = pipe.execute()
+    now = time.time()
+    pipe = redis_client.pipeline()
+    indexed = 0
+    for (_, user_id, memory_id), ttl in zip(keys, ttls):
+        if ttl is None or ttl == -2:
+            continue
+        expires_at = now + (ttl if ttl > 0 else SHORT_TERM_TTL)
+        pipe.zadd(memory_index_key(user_id), {memory_id: expires_at})
+        pipe.expire(memory_index_key(user_id), SHORT_TERM_TTL)
+        pipe.sadd(MEMORY_USERS_KEY, user_id)
+        indexed += 1
+    pipe.execute()
+    return indexed
+
 async def retrieve_from_redis(user_id: str, query: str) -> List[Dict[str, Any]]:
     """Retrieve memories from Redis short-term storage."""
     if not redis_client:
         return []
     try:
-        # Get all memory keys for this user
-        pattern = f"memory:{user_id}:*"
-        keys = redis_client.keys(pattern)
+        # Live ids come from the user's index; all values are fetched with one MGET
         memories = []
-        for key in keys:
+        for memory_id, memory_data in get_user_redis_memories(user_id):
             try:
-                memory_data = redis_client.get(key)
-                if memory_data:
-                    memory = json.loads(memory_data)
-                    memories.append({
-                        "content": memory.get("content", ""),
-                        "metadata": memory.get("metadata", {}),
-                        "timestamp": memory.get("timestamp", 0),
-                        "source": "redis"
-                    })
+                memory = json.loads(memory_data)
+                memories.append({
+                    "content": memory.get("content", ""),
+                    "metadata": memory.get("metadata", {}),
+                    "timestamp": memory.get("timestamp", 0),
+                    "source": "redis"
+                })
             except Exception as e:
-                print(f"❌ Error retrieving Redis memory {key}: {e}")
+                print(f"❌ Error retrieving Redis memory {memory_id}: {e}")
         return memories
     except Exception as e:
         print(f"❌ Redis retrieval error: {e}")
@@ -511,7 +604,7 @@ async def store_to_redis(user_id: str, content: str, interaction: Dict[str, Any]
         return False
     try:
         memory_id = str(uuid.uuid4())
-        key = f"memory:{user_id}:{memory_id}"
+        key = memory_key(user_id, memory_id)
         
         memory_data = {
             "content": content,
@@ -521,8 +614,14 @@ async def store_to_redis(user_id: str, content: str, interaction: Dict[str, Any]
             "source": "redis"
         }
         
-        # Store with TTL (24 hours)
-        redis_client.setex(key, SHORT_TERM_TTL, json.dumps(memory_data))
+        # Store with TTL (24 hours) and index it under the user in the same round trip
+        expires_at = time.time() + SHORT_TERM_TTL
+        pipe = redis_client.pipeline()
+        pipe.setex(key, SHORT_TERM_TTL, json.dumps(memory_data))
+        pipe.zadd(memory_index_key(user_id), {memory_id: expires_at})
+        pipe.expire(memory_index_key(user_id), SHORT_TERM_TTL)
+        pipe.sadd(MEMORY_USERS_KEY, user_id)
+        pipe.execute()
         return True
     except Exception as e:
         print(f"❌ Redis storage error: {e}")
@@ -559,31 +658,33 @@ async def delete_from_redis(user_id: str, query: str, exact_match: bool = False)
     if not redis_client:
         return 0
     try:
-        pattern = f"memory:{user_id}:*"
-        keys = redis_client.keys(pattern)
-        deleted_count = 0
+        ids_to_delete = []
+        query_lower = query.lower()
         
-        for key in keys:
+        for memory_id, memory_data in get_user_redis_memories(user_id):
             try:
-                memory_data = redis_client.get(key)
-                if memory_data:
-                    memory = json.loads(memory_data)
-                    content = memory.get("content", "").lower()
-                    query_lower = query.lower()
-                    
-                    should_delete = False
-                    if exact_match:
-                        should_delete = content == query_lower
-                    else:
-                        should_delete = query_lower in content
-                    
-                    if should_delete:
-                        redis_client.delete(key)
-                        deleted_count += 1
-                        print(f"🗑️ Deleted Redis memory: {memory.get('content', '')[:50]}...")
+                memory = json.loads(memory_data)
+                content = memory.get("content", "").lower()
+                
+                should_delete = False
+                if exact_match:
+                    should_delete = content == query_lower
+                else:
+                    should_delete = query_lower in content
+                
+                if should_delete:
+                    ids_to_delete.append(memory_id)
+                    print(f"🗑️ Deleting Redis memory: {memory.get('content', '')[:50]}...")
             except Exception as e:
-                print(f"❌ Error deleting Redis memory {key}: {e}")
+                print(f"❌ Error deleting Redis memory {memory_id}: {e}")
         
+        if not ids_to_delete:
+            return 0
+        # Values and index entries go in one pipeline
+        pipe = redis_client.pipeline()
+        pipe.delete(*[memory_key(user_id, memory_id) for memory_id in ids_to_delete])
+        pipe.zrem(memory_index_key(user_id), *ids_to_delete)
+        deleted_count, _ = pipe.execute()
         return deleted_count
     except Exception as e:
         print(f"❌ Redis deletion error: {e}")
@@ -631,13 +732,17 @@ async def clear_user_redis_memories(user_id: str) -> int:
     if not redis_client:
         return 0
     try:
-        pattern = f"memory:{user_id}:*"
-        keys = redis_client.keys(pattern)
-        if keys:
-            deleted_count = redis_client.delete(*keys)
+        memory_ids = redis_client.zrange(memory_index_key(user_id), 0, -1)
+        pipe = redis_client.pipeline()
+        if memory_ids:
+            pipe.delete(*[memory_key(user_id, memory_id) for memory_id in memory_ids])
+        pipe.delete(memory_index_key(user_id))
+        pipe.srem(MEMORY_USERS_KEY, user_id)
+        results = pipe.execute()
+        deleted_count = results[0] if memory_ids else 0
+        if deleted_count:
             print(f"🗑️ Cleared {deleted_count} Redis memories for user {user_id}")
-            return deleted_count
-        return 0
+        return deleted_count
     except Exception as e:
         print(f"❌ Redis clear error: {e}")
         return 0
@@ -665,9 +770,7 @@ async def get_redis_memory_count(user_id: str) -> int:
     if not redis_client:
         return 0
     try:
-        pattern = f"memory:{user_id}:*"
-        keys = redis_client.keys(pattern)
-        return len(keys)
+        return count_user_redis_memories([user_id])[user_id]
     except Exception as e:
         print(f"❌ Redis count error: {e}")
         return 0
@@ -901,16 +1004,13 @@ async def debug_stats():
     if redis_client:
         try:
             stats["redis"]["status"] = "connected"
-            all_keys = redis_client.keys("memory:*")
-            stats["redis"]["total_keys"] = len(all_keys)
-            # Count by user
-            user_counts = {}
-            for key in all_keys:
-                parts = key.split(":")
-                if len(parts) >= 2:
-                    user_id = parts[1]
-                    user_counts[user_id] = user_counts.get(user_id, 0) + 1
-            stats["redis"]["users"] = user_counts
+            # Count by user from the per-user indexes
+            user_counts = count_user_redis_memories(list(redis_client.smembers(MEMORY_USERS_KEY)))
+            stale_users = [user_id for user_id, count in user_counts.items() if not count]
+            if stale_users:
+                redis_client.srem(MEMORY_USERS_KEY, *stale_users)
+            stats["redis"]["users"] = {user_id: count for user_id, count in user_counts.items() if count}
+            stats["redis"]["total_keys"] = sum(stats["redis"]["users"].values())
         except Exception as e:
             stats["redis"]["error"] = str(e)
     # ChromaDB stats
@@ -988,37 +1088,20 @@ async def chat_completions(request: ChatCompletionRequest):
             memory_response = await retrieve_memory(memory_request)
             memories = memory_response.get("memories", [])
             
-            # Inject memories into the conversation
-            if memories:
-                memory_context = "Previous conversation context:\n"
-                for memory in memories:
-                    content = memory.get("content", "")
-                    memory_context += f"- {content}\n"
-                memory_context += "\nCurrent conversation:\n"
-                
-                # Find or create system message
-                messages = [msg.dict() for msg in request.messages]
-                system_message_index = -1
-                for i, msg in enumerate(messages):
-                    if msg["role"] == "system":
-                        system_message_index = i
-                        break
-                
-                if system_message_index >= 0:
-                    # Update existing system message
-                    current_system = messages[system_message_index]["content"]
-                    messages[system_message_index]["content"] = f"{current_system}\n\n{memory_context}"
-                else:
-                    # Add new system message
-                    system_message = {
-                        "role": "system",
-                        "content": f"You are a helpful assistant with access to previous conversation context.\n\n{memory_context}"
-                    }
-                    messages.insert(0, system_message)
-                
-                print(f"💡 Injected {len(memories)} memories into conversation")
-            else:
-                messages = [msg.dict() for msg in request.messages]
+            # Pack system prompt, memories, prior turns and the latest message into the model's budget
+            messages = [msg.dict() for msg in request.messages]
+            system_prompt = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+            conversation = [m for m in messages if m["role"] != "system"]
+            context = context_builder.build(
+                request.model,
+                system_prompt or "You are a helpful assistant with access to previous conversation context.",
+                latest_user_message,
+                memories=[memory.get("content", "") for memory in memories],
+                history=conversation[:-1] if conversation and conversation[-1]["role"] == "user" else conversation,
+                response_reserve=request.max_tokens,
+            )
+            messages = context.messages
+            print(f"💡 Packed {context.memories_used} memories, {context.history_used} prior messages ({context.tokens}/{context.budget} tokens)")
         else:
             messages = [msg.dict() for msg in request.messages]
         
@@ -13,6 +13,8 @@ class ChatRequest(BaseModel):
 
     user_id: str
     message: str
+    stream: bool = False  # Answer as server-sent events, token by token
+    model: Optional[str] = None  # Model to answer with (DEFAULT_MODEL when omitted)
 
 
 class ChatResponse(BaseModel):
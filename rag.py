@@ -3,17 +3,18 @@ RAG (Retrieval-Augmented Generation) implementation for document processing and
 Handles document ingestion, chunking, embedding, and retrieval for enhanced LLM responses.
 """
 
-import hashlib
+import asyncio
 import logging
 from typing import Any, Dict, List, Optional
 
 from fastapi import HTTPException, UploadFile
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 from database_manager import db_manager
 from database_manager import get_embedding, index_document_chunks, retrieve_user_memory
 from error_handler import MemoryErrorHandler, safe_execute, log_error
 from human_logging import log_service_status
+from services.ingestion_service import ingestion_service
+from utilities.text_chunker import detach_upload, get_text_splitter, hash_file, iter_file_chunks
 
 
 # RAG configuration constants
@@ -38,18 +39,19 @@ class RAGProcessor:
         
         The text splitter uses recursive character splitting with a chunk size of 1000
         characters and an overlap of 200 characters to ensure context is preserved
-        across chunks.
+        across chunks. Uploaded documents are chunked incrementally with the same
+        settings (see ``utilities.text_chunker``).
         """
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=DEFAULT_CHUNK_SIZE,
-            chunk_overlap=DEFAULT_CHUNK_OVERLAP,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""],
-        )
+        self.text_splitter = get_text_splitter(DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP)
 
     async def process_document(self, file: UploadFile, user_id: str) -> Dict[str, Any]:
         """
-        Process uploaded document and store in vector database.
+        Process uploaded document and queue it for indexing in the vector database.
+
+        The upload is never read into memory as a whole: it is hashed and then
+        chunked in fixed-size blocks by the background ingestion pipeline, which
+        embeds and stores chunks as they are produced. The returned ``job_id``
+        can be polled at ``/upload/jobs/{job_id}``.
         
         Args:
             file (UploadFile): The uploaded file to process
@@ -78,21 +80,24 @@ class RAGProcessor:
             file_ext = '.' + file.filename.split('.')[-1].lower() if '.' in file.filename else ''
             if file_ext and file_ext not in supported_extensions:
                 logging.warning(f"[RAG] Potentially unsupported file type: {file_ext}")
-            
-            # Helper function for file reading with error handling
-            async def read_file_content():
-                """Read and decode file content"""
-                content = await file.read()
-                return content.decode("utf-8")
-                
-            # Read file content with error handling
-            text = await safe_execute(
-                read_file_content,
+
+            # Take over the spooled upload so the background job can keep reading it
+            raw = detach_upload(file)
+
+            # Hash in blocks off the event loop; an empty hash input means an empty document
+            async def hash_file_content():
+                """Hash file content and check that it is not empty"""
+                content_hash = await asyncio.to_thread(hash_file, raw)
+                return content_hash if raw.seek(0, 2) else ""
+
+            content_hash = await safe_execute(
+                hash_file_content,
                 fallback_value=None,
                 error_handler=lambda e: log_error(e, f"Failed to read file {file.filename}")
             )
             
-            if text is None:
+            if not content_hash:
+                raw.close()
                 log_service_status("RAG", "error", f"Failed to read content from {file.filename}")
                 return {
                     "document_id": None,
@@ -100,63 +105,29 @@ class RAGProcessor:
                     "chunks_processed": 0,
                     "total_chunks": 0,
                     "status": "failed",
-                    "error": "Failed to read document content",
-                }
-
-            # Split into chunks with error handling
-            chunks = await safe_execute(
-                lambda: self.text_splitter.split_text(text),
-                fallback_value=[],
-                error_handler=lambda e: log_error(e, f"Failed to split text from {file.filename}")
-            )
-
-            if not chunks:
-                log_service_status("RAG", "error", f"No chunks created from {file.filename}")
-                return {
-                    "document_id": None,
-                    "filename": file.filename,
-                    "chunks_processed": 0,
-                    "total_chunks": 0,
-                    "status": "failed",
-                    "error": "No chunks created from document",
+                    "error": "Failed to read document content" if content_hash is None else "No chunks created from document",
                 }
+            raw.seek(0)
 
-            # Store chunks with embeddings in a single batch operation
-            # Use a more consistent ID generation method than hash()
-            content_hash = hashlib.md5(text.encode('utf-8')).hexdigest()[:10]
-            document_id = f"{user_id}_{file.filename}_{content_hash}"
+            # Stable per user and filename so a re-upload re-indexes the same document incrementally
+            document_id = ingestion_service.document_id(user_id, file.filename)
 
-            async def index_document():
-                """Helper function to index document chunks using safe execution"""
-                return index_document_chunks(
-                    db_manager=db_manager,
-                    user_id=user_id,
-                    doc_id=document_id,
-                    name=file.filename,
-                    chunks=chunks,
-                )
-            
-            # Use safe_execute for the indexing operation
-            success = await safe_execute(
-                index_document,
-                fallback_value=False,
-                error_handler=lambda e: log_error(e, f"Failed to index chunks for {file.filename}")
-            )
-
-            success_count = len(chunks) if success else 0
+            # Chunks are produced while the pipeline embeds and upserts earlier ones
+            chunks = iter_file_chunks(raw, DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_OVERLAP)
+            job = ingestion_service.submit(user_id, document_id, file.filename, chunks)
 
             log_service_status(
-                "RAG",
-                "ready" if success else "error",
-                f"Processed {file.filename}: {success_count}/{len(chunks)} chunks stored",
+                "RAG", "info", f"Accepted {file.filename} ({content_hash[:10]}): streaming chunks as job {job.job_id}"
             )
 
             return {
                 "document_id": document_id,
+                "content_hash": content_hash,
+                "job_id": job.job_id,
                 "filename": file.filename,
-                "chunks_processed": success_count,
-                "total_chunks": len(chunks),
-                "status": "success" if success else "failed",
+                "chunks_processed": 0,
+                "total_chunks": None,  # Known once chunking finishes; see the job's progress
+                "status": "processing",
             }
 
         except Exception as e:
@@ -205,53 +176,53 @@ class RAGProcessor:
                 
             logging.info(f"[RAG] semantic_search called with query='{query}', user_id='{user_id}', limit={limit}")
         
-        async def get_query_embedding():
-            """Helper function to get query embedding using safe execution"""
-            return get_embedding(db_manager, query)
+            async def get_query_embedding():
+                """Helper function to get query embedding using safe execution"""
+                return await get_embedding(db_manager, query)
             
-        async def retrieve_similar_documents(embedding):
-            """Helper function to retrieve similar documents using safe execution"""
-            return retrieve_user_memory(db_manager, user_id, embedding, limit)
+            async def retrieve_similar_documents(embedding):
+                """Helper function to retrieve similar documents using safe execution"""
+                return await retrieve_user_memory(db_manager, user_id, embedding, limit)
             
-        # Get query embedding with error handling
-        query_embedding = await safe_execute(
-            get_query_embedding,
-            fallback_value=None,
-            error_handler=lambda e: log_error(e, f"Failed to get embedding for query: {query[:50]}...")
-        )
+            # Get query embedding with error handling
+            query_embedding = await safe_execute(
+                get_query_embedding,
+                fallback_value=None,
+                error_handler=lambda e: log_error(e, f"Failed to get embedding for query: {query[:50]}...")
+            )
         
-        # Check if embedding is valid - avoid NumPy array truth value errors
-        embedding_valid = False
+            # Check if embedding is valid - avoid NumPy array truth value errors
+            embedding_valid = False
         
-        if query_embedding is not None:
-            if hasattr(query_embedding, "size"):
-                # For NumPy arrays, check size safely
-                try:
-                    embedding_valid = query_embedding.size > 0
-                except ValueError:
-                    embedding_valid = False
-            elif hasattr(query_embedding, "__len__"):
-                embedding_valid = len(query_embedding) > 0
+            if query_embedding is not None:
+                if hasattr(query_embedding, "size"):
+                    # For NumPy arrays, check size safely
+                    try:
+                        embedding_valid = query_embedding.size > 0
+                    except ValueError:
+                        embedding_valid = False
+                elif hasattr(query_embedding, "__len__"):
+                    embedding_valid = len(query_embedding) > 0
         
-        if not embedding_valid:
-            log_service_status("RAG", "warning", "Could not generate embedding for search query")
-            logging.warning("[RAG] Embedding is None or empty")
-            return []
+            if not embedding_valid:
+                log_service_status("RAG", "warning", "Could not generate embedding for search query")
+                logging.warning("[RAG] Embedding is None or empty")
+                return []
         
-        # Retrieve similar documents with error handling
-        results = await safe_execute(
-            lambda: retrieve_similar_documents(query_embedding),
-            fallback_value=[],
-            error_handler=lambda e: log_error(e, f"Failed to retrieve documents for user: {user_id}")
-        )
+            # Retrieve similar documents with error handling
+            results = await safe_execute(
+                lambda: retrieve_similar_documents(query_embedding),
+                fallback_value=[],
+                error_handler=lambda e: log_error(e, f"Failed to retrieve documents for user: {user_id}")
+            )
         
-        # Log success status
-        log_service_status(
-            "RAG", 
-            "ready", 
-            f"Found {len(results)} relevant documents for query: {query[:50]}..."
-        )
-        return results
+            # Log success status
+            log_service_status(
+                "RAG", 
+                "ready", 
+                f"Found {len(results)} relevant documents for query: {query[:50]}..."
+            )
+            return results
             
         except Exception as e:
             error_context = f"Semantic search for query '{query[:30]}...'"
@@ -2,51 +2,58 @@
 Chat endpoints and logic.
 """
 
+import asyncio
 import logging
-import re
 import time
 import uuid
-import hashlib
 from datetime import datetime
+from typing import AsyncIterator, List, Optional
 
 from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
 
-from config import DEFAULT_SYSTEM_PROMPT
+from config import DEFAULT_MODEL, DEFAULT_SYSTEM_PROMPT, SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_SCOPE
 from database_manager import (
     db_manager, 
-    get_embedding, 
-    get_cache, 
-    set_cache,
-    store_chat_history,
-    retrieve_user_memory,
-    index_user_document,
+    get_response_cache,
+    retrieve_user_memory_batch,
     get_chat_history
 )
-from error_handler import CacheErrorHandler, ChatErrorHandler, MemoryErrorHandler, safe_execute
+from error_handler import CacheErrorHandler, ChatErrorHandler, MemoryErrorHandler
 from human_logging import log_service_status
 from models import ChatRequest, ChatResponse
-from services.llm_service import call_llm
+from services.llm_service import call_llm, call_llm_stream
+from services.streaming_service import streaming_service
 from services.tool_service import tool_service
+from services.write_behind import write_behind_queue
 from user_profiles import user_profile_manager
+from utilities.context_builder import context_builder, history_to_messages
+from utilities.response_cache import ResponseCache
+from utilities.semantic_cache import GLOBAL_SCOPE, SemanticCache
+from utilities.sse_encoder import SSE_DONE, TOKEN, SSETemplate, coalesce_tokens, sse_event
+from utilities.stage_timings import StageTimer, chat_pipeline_stats
 from web_search_tool import should_trigger_web_search, search_web, format_web_results_for_chat
 
 chat_router = APIRouter()
 
+GREETINGS = ("hello", "hi", "hey", "good morning", "good afternoon", "good evening")
+UNCERTAIN_PHRASES = ("i don't know", "i'm not sure", "i don't have")
+LLM_FAILURE_MESSAGE = "I apologize, but I'm having trouble processing your request right now. Please try again."
+TOKEN_EVENT = SSETemplate({"type": "token", "content": TOKEN})
 
-# Stub functions
-def get_cache_manager():
-    """Get cache manager from database_manager."""
-    try:
-        return get_cache()
-    except Exception:
-        return None
+
+def build_system_prompt(user_id: str) -> str:
+    """Build the system prompt for a user (persona plus stored profile information)."""
+    system_prompt = DEFAULT_SYSTEM_PROMPT
+    user_context = user_profile_manager.build_context_for_llm(user_id)
+    if user_context:
+        system_prompt += f" User Profile Information: {user_context}"
+    return system_prompt
 
 
-def generate_cache_key(user_id: str, message: str) -> str:
-    """Generate a cache key for chat requests."""
-    # Use hash of message to keep key consistent but not too long
-    message_hash = hashlib.md5(message.encode()).hexdigest()[:8]
-    return f"chat:{user_id}:{message_hash}"
+def generate_cache_key(user_id: str, message: str, system_prompt: str, model: str = DEFAULT_MODEL) -> str:
+    """Generate a cache key for chat requests (full hash over user, model, system prompt and message)."""
+    return ResponseCache.make_key(user_id, model, system_prompt, message)
 
 
 def should_store_as_memory(message: str, response: str) -> bool:
@@ -100,17 +107,74 @@ def should_store_as_memory(message: str, response: str) -> bool:
     return False
 
 
+def personalized_greeting(user_id: str, message: str) -> Optional[str]:
+    """Greeting for a returning user who opens with a greeting (None when there is nothing to add)."""
+    if not any(greeting in message.lower() for greeting in GREETINGS):
+        return None
+    greeting = user_profile_manager.get_user_greeting(user_id)
+    return greeting if greeting != "Hello! I'm here to help you." else None
+
+
+def is_uncertain(response: str) -> bool:
+    """Whether the model admitted it does not know (web results then replace its answer)."""
+    response_lower = response.lower()
+    return any(phrase in response_lower for phrase in UNCERTAIN_PHRASES)
+
+
+async def web_search_results(user_id: str, user_message: str, response: str, debug_info: List[str]) -> Optional[str]:
+    """Web results formatted for chat when the answer needs them, else None."""
+    if not should_trigger_web_search(user_message, response):
+        return None
+
+    logging.info(f"[WEB_SEARCH] Triggering web search for user {user_id} - query: {user_message[:100]}...")
+    try:
+        search_results = await search_web(user_message, max_results=3)
+        if search_results.get("results"):
+            debug_info.append(f"[WEB_SEARCH] Enhanced response with {len(search_results['results'])} web results")
+            logging.info(f"[WEB_SEARCH] Successfully enhanced response for user {user_id}")
+            return format_web_results_for_chat(search_results)
+        debug_info.append("[WEB_SEARCH] No web results found")
+        logging.warning(f"[WEB_SEARCH] No results found for query: {user_message[:100]}...")
+    except Exception as search_error:
+        logging.error(f"[WEB_SEARCH] Failed for user {user_id}: {search_error}")
+        debug_info.append(f"[WEB_SEARCH] Search failed: {str(search_error)[:50]}...")
+    return None
+
+
+def sse_response(events: AsyncIterator[bytes], session_id: Optional[str] = None) -> StreamingResponse:
+    """Stream events to the client as they are produced (a session id lets the client stop the stream)."""
+    headers = {"Cache-Control": "no-cache", "Connection": "keep-alive"}
+    if session_id:
+        headers["X-Session-ID"] = session_id
+    return StreamingResponse(events, media_type="text/event-stream", headers=headers)
+
+
+async def answer_events(response: str, source: str) -> AsyncIterator[bytes]:
+    """Events of an answer that is complete up front."""
+    yield TOKEN_EVENT.encode(response)
+    yield sse_event({"type": "done", "response": response, "source": source})
+    yield SSE_DONE
+
+
 @chat_router.post("/chat/completions", response_model=ChatResponse)
 async def chat_endpoint(chat: ChatRequest, request: Request):
     # Use request ID from middleware
     request_id = getattr(request.state, "request_id", str(uuid.uuid4()))
     start_time = time.time()
+    timer = StageTimer()
     print(f"[CONSOLE DEBUG] Chat endpoint called for user {chat.user_id}, message: {chat.message[:50]}...")
     logging.info(f"[DEBUG] Chat endpoint called for user {chat.user_id}")
 
+    def respond(text: str, source: str):
+        """Answer that is complete up front (cache hit, tool result, error), as JSON or as a one-shot stream."""
+        if chat.stream:
+            return sse_response(answer_events(text, source))
+        return ChatResponse(response=text)
+
     try:
         user_message = chat.message
         user_id = chat.user_id
+        model = chat.model or DEFAULT_MODEL
         user_response = None
 
         # Validate input
@@ -118,299 +182,368 @@ async def chat_endpoint(chat: ChatRequest, request: Request):
             raise HTTPException(status_code=400, detail="Message cannot be empty")
 
         # Extract and save user information from message
-        user_info = user_profile_manager.extract_user_info(user_message)
-        if user_info:
-            user_profile_manager.save_user_info(user_id, user_info)
-            log_service_status("memory", "info", f"Saved user info for {user_id}: {user_info}")
-
-        # Check cache first - unified cache implementation
-        cache_key = generate_cache_key(user_id, user_message)
-
-        # Bypass cache for time queries to ensure real-time lookup
-        is_time_query = False
-        timeanddate_pattern = re.compile(r"time(?:\\s*(?:in|for|at))?\\s+([a-zA-Z ]+)", re.IGNORECASE)
-        if (
-            "timeanddate.com" in user_message.lower()
-            or (
-                timeanddate_pattern.search(user_message)
-                and not any(
-                    x in user_message.lower()
-                    for x in [
-                        "weather",
-                        "convert",
-                        "calculate",
-                        "exchange rate",
-                        "system info",
-                        "news",
-                        "search",
-                    ]
-                )
-            )
-            or "time" in user_message.lower()
-        ):
-            is_time_query = True
+        with timer.stage("profile"):
+            user_info = user_profile_manager.extract_user_info(user_message)
+            if user_info:
+                user_profile_manager.save_user_info(user_id, user_info)
+                log_service_status("memory", "info", f"Saved user info for {user_id}: {user_info}")
+
+            # Check cache first - the key covers the system prompt, so profile updates above miss the cache
+            system_prompt = build_system_prompt(user_id)
+        # Keyed on the model that answers, so answers of different models never share an entry
+        cache_key = generate_cache_key(user_id, user_message, system_prompt, model)
+
+        # Route once (precompiled single-pass router); time queries bypass the cache for a real-time lookup
+        tool_routes = tool_service.route(user_message)
+        is_time_query = any(route.tool == "time" for route in tool_routes)
 
         if not is_time_query:
             try:
-                cache_manager = get_cache()
-                cached_response = cache_manager.get(cache_key) if cache_manager else None
-                if cached_response and isinstance(cached_response, dict):
-                    log_service_status("cache", "info", f"Cache hit for key: {cache_key}")
-                    # Update request_id and return cached response
-                    cached_data = cached_response.copy()
-                    cached_data["request_id"] = request_id
+                response_cache = get_response_cache()
+                cached_entry = await timer.run("response_cache", response_cache.get(cache_key)) if response_cache else None
+                if cached_entry and str(cached_entry.get("response", "")).strip():
+                    kind = "cached tool error" if cached_entry.get("negative") else "cached"
+                    log_service_status("cache", "info", f"Cache hit ({kind}) for key: {cache_key}")
                     duration = (time.time() - start_time) * 1000
                     log_service_status(
                         "api",
                         "info",
-                        f"[REQUEST] 📝 Info - [{request_id}] POST /chat - Completed 200 in {duration:.2f}ms (cached)",
+                        f"[REQUEST] 📝 Info - [{request_id}] POST /chat - Completed 200 in {duration:.2f}ms ({kind})",
                     )
-                    return ChatResponse(**cached_data)
-                elif cached_response and str(cached_response).strip():
-                    # Handle old string-based cache entries
-                    log_service_status("cache", "info", f"Cache hit (legacy format) for key: {cache_key}")
-                    duration = (time.time() - start_time) * 1000
-                    log_service_status(
-                        "api",
-                        "info",
-                        f"[REQUEST] 📝 Info - [{request_id}] POST /chat - Completed 200 in {duration:.2f}ms (cached)",
-                    )
-                    return ChatResponse(response=str(cached_response))
+                    return respond(cached_entry["response"], "cache")
             except Exception as cache_error:
-                log_service_status("cache", "warning", f"Cache check failed: {str(cache_error)}")
+                CacheErrorHandler.handle_cache_error(cache_error, "get", cache_key, user_id, request_id)
 
         log_service_status("cache", "info", f"Cache miss for key: {cache_key}")
-        logging.debug(f"[REQUEST {request_id}] Chat request from user {user_id}: {user_message[:100]}...")
 
-        # --- Retrieve chat history and memory ---
-        async def get_history():
-            return await get_chat_history(f"user:{user_id}", limit=10)
+        # --- Concurrent fan-out of the turn's independent I/O ---
+        #   history ─────────────────────────────────────────────┐
+        #   embedding ─ semantic lookup ─ memory retrieval ───────┼─ context ─ LLM
+        #   tools (async runtime, several in parallel) ──────────┘
+        # A semantic hit answers before history and tools are needed; a tool answer drops retrieval.
+        # Tools with a cost or side effects (web searches, code execution) only start after a semantic miss.
+        fingerprint = SemanticCache.fingerprint(model, system_prompt)
+        semantic_scopes = [user_id, GLOBAL_SCOPE] if SEMANTIC_CACHE_SCOPE == "global" else [user_id]
+        use_semantic_cache = SEMANTIC_CACHE_ENABLED and not is_time_query and db_manager is not None
+
+        async def fetch_history():
+            try:
+                return await get_chat_history(f"user:{user_id}")
+            except Exception as e:
+                logging.warning(f"[CHAT_HISTORY] Failed to retrieve history for user {user_id}: {e}")
+                return []
+
+        async def embed_and_lookup():
+            """Embed the query once (reused for retrieval and the semantic store) and check the semantic cache."""
+            embedding, hit = None, None
+            if db_manager is None:
+                return embedding, hit
+            try:
+                embedding = (await timer.run("embedding", db_manager.embed_queries([user_message])))[0]
+                if use_semantic_cache and embedding is not None:
+                    with timer.stage("semantic_lookup"):
+                        hit = db_manager.semantic_cache.lookup(semantic_scopes, embedding, fingerprint)
+            except Exception as cache_error:
+                CacheErrorHandler.handle_cache_error(cache_error, "semantic_get", cache_key, user_id, request_id)
+            return embedding, hit
 
-        try:
-            history = await get_history()
-        except Exception as e:
-            history = []
-            logging.warning(f"[CHAT_HISTORY] Failed to retrieve history for user {user_id}: {e}")
+        async def retrieve_memories(embedding):
+            try:
+                return (
+                    await retrieve_user_memory_batch(
+                        user_id,
+                        [user_message],
+                        n_results=3,
+                        query_embeddings=[embedding] if embedding is not None else None,
+                    )
+                )[0] or []
+            except Exception as e:
+                MemoryErrorHandler.handle_memory_error(e, "retrieve", user_id, request_id)
+                return []
 
-        logging.debug(f"[CHAT_HISTORY] Retrieved {len(history or [])} history entries for user {user_id}")
+        def start_tools():
+            return asyncio.create_task(
+                timer.run("tools", tool_service.detect_and_execute_tool(user_message, user_id, request_id, tool_routes))
+            )
 
-        # --- Tool detection and execution ---
-        tool_used, tool_response, tool_name, debug_info = tool_service.detect_and_execute_tool(
-            user_message, user_id, request_id
+        fan_out_start = time.perf_counter()
+        history_task = asyncio.create_task(timer.run("history", fetch_history()))
+        pending = [history_task]
+        speculative = not use_semantic_cache or tool_service.is_speculative(tool_routes)
+        tool_task = start_tools() if speculative else None
+        if tool_task is not None:
+            pending.append(tool_task)
+        try:
+            query_embedding, hit = await embed_and_lookup()
+            if hit:
+                for task in pending:
+                    task.cancel()
+                duration = (time.time() - start_time) * 1000
+                log_service_status(
+                    "cache", "info", f"Semantic cache hit (similarity {hit['similarity']:.3f}, scope {hit['scope']})"
+                )
+                log_service_status(
+                    "api",
+                    "info",
+                    f"[REQUEST] 📝 Info - [{request_id}] POST /chat - Completed 200 in {duration:.2f}ms (semantic cache)",
+                )
+                return respond(hit["response"], "semantic_cache")
+
+            if tool_task is None:
+                tool_task = start_tools()
+                pending.append(tool_task)
+            retrieval_task = asyncio.create_task(timer.run("memory_retrieval", retrieve_memories(query_embedding)))
+            pending.append(retrieval_task)
+
+            tool_used, tool_response, tool_name, debug_info, tool_failed = await tool_task
+            if tool_used:
+                retrieval_task.cancel()
+                memory_chunks = []
+            else:
+                memory_chunks = await retrieval_task
+            history = await history_task
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            raise
+
+        chat_pipeline_stats.record(
+            timer,
+            time.perf_counter() - fan_out_start,
+            concurrent=("history", "embedding", "semantic_lookup", "memory_retrieval", "tools"),
         )
+        logging.debug(f"[PIPELINE {request_id}] {timer.summary()}")
+        logging.debug(f"[CHAT_HISTORY] Retrieved {len(history or [])} history entries for user {user_id}")
 
-        # If no tool matched, use LLM with memory/context
         print(f"[CONSOLE DEBUG] About to check tool_used: {tool_used}")
         logging.info(f"[DEBUG] Tool detection complete: tool_used={tool_used}")
 
-        if not tool_used:
-            logging.info(f"[DEBUG] No tool used, proceeding with LLM query for user {user_id}")
+        # Opens the answer, so a stream can send it before the model's first token
+        greeting = None if tool_used else personalized_greeting(user_id, user_message)
+        memory_used = False
+
+        def build_llm_messages():
+            """Pack persona + profile, memories and the history window into the model's token budget."""
+            nonlocal memory_used
+            logging.info(f"[DEBUG] Retrieved {len(memory_chunks or [])} memory chunks for user {user_id}")
+            history_messages, summary = history_to_messages(history or [])
+            context = context_builder.build(
+                model,
+                system_prompt,
+                user_message,
+                memories=memory_chunks or [],
+                history=history_messages,
+                summary=summary,
+            )
+            memory_used = context.memories_used > 0
+            logging.debug(
+                f"[LLM] Calling LLM with {len(context.messages)} messages for user {user_id}: {context.to_dict()}"
+            )
+            return context.messages
 
-            async def llm_query():
-                print(f"[CONSOLE DEBUG] LLM query function called for user {user_id}")
-                logging.info(f"[DEBUG] LLM query function called for user {user_id}")
-                # Embed user query and retrieve relevant memory
-                query_emb = await get_embedding(user_message)
-                print(f"[CONSOLE DEBUG] Generated embedding for user {user_id}: {query_emb is not None}")
-                logging.info(f"[DEBUG] Generated embedding for user {user_id}: {query_emb is not None}")
+        async def finish_turn(user_response, llm_failed: bool, partial: bool = False) -> None:
+            """Queue persistence and the cache write of the final answer (after the last byte of a stream).
 
-                memory_chunks = (
-                    retrieve_user_memory(db_manager, user_id, query_emb, n_results=3) if query_emb is not None else []
-                )
-                logging.info(
-                    f"[DEBUG] Retrieved {len(memory_chunks) if memory_chunks else 0} memory chunks for user {user_id}"
+            A ``partial`` answer (a stream the client stopped) is kept in the history, marked as
+            partial, but is neither cached nor stored as a memory.
+            """
+            # --- Persistence runs after the response (write-behind queue) ---
+            try:
+                await write_behind_queue.enqueue(
+                    "chat_turn",
+                    {
+                        "chat_id": f"user:{user_id}",
+                        "user_message": user_message,
+                        "assistant_response": str(user_response),
+                        "timestamp": time.time(),
+                        "partial": partial,
+                    },
                 )
+            except Exception as e:
+                logging.warning(f"[REDIS] Failed to queue chat history for user {user_id}: {e}")
 
-                # Compose LLM context with explicit instructions for plain text responses
-                system_prompt = DEFAULT_SYSTEM_PROMPT
-
-                # Add user profile information to system prompt
-                user_context = user_profile_manager.build_context_for_llm(user_id)
-                if user_context:
-                    system_prompt += f" User Profile Information: {user_context}"
-                    logging.info(f"[PROFILE] Added user context for {user_id}: {user_context[:100]}...")
-
-                # Check for system prompt changes (simplified - just log for now)
-                cache_manager = get_cache_manager()
-                if cache_manager:
-                    logging.debug(f"[CACHE] Using cache manager with system prompt")
-
-                # Ensure memory_chunks is a list and handle None values
-                memory_chunks = memory_chunks or []
-
-                # Build conversation context from history
-                conversation_context = ""
-                if history:
-                    # Format chat history as conversation for context
-                    for entry in history[-5:]:  # Last 5 entries
-                        if isinstance(entry, dict):
-                            user_msg = entry.get("message", "")
-                            assistant_msg = entry.get("response", "")
-                            if user_msg:
-                                conversation_context += f"User: {user_msg}\n"
-                            if assistant_msg:
-                                conversation_context += f"Assistant: {assistant_msg}\n"
-
-                # Combine memory and conversation context
-                full_context = ""
-                if memory_chunks:
-                    full_context += "Relevant memories:\n" + "\n".join([str(m) for m in memory_chunks]) + "\n\n"
-                if conversation_context:
-                    full_context += "Previous conversation:\n" + conversation_context + "\n"
-
-                # Build messages for LLM
-                messages = [{"role": "system", "content": system_prompt}]
-
-                # Add context as system message if we have any
-                if full_context:
-                    messages.append({"role": "system", "content": full_context})
-
-                # Add current user message
-                messages.append({"role": "user", "content": user_message})
-
-                # Debug logging
-                logging.debug(f"[LLM] Calling LLM with {len(messages)} messages for user {user_id}")
-                if full_context:
-                    logging.debug(
-                        f"[LLM] Including context: memory_chunks={len(memory_chunks)}, conversation_entries={len(history) if history else 0}"
-                    )
-
-                return await call_llm(messages)
+            # --- Automatic memory storage for important conversations ---
+            print(f"[CONSOLE DEBUG] Checking if conversation should be stored as memory...")
 
-            try:
-                logging.info(f"[DEBUG] Calling LLM query function for user {user_id}")
-                user_response = await llm_query()
-                logging.info(f"[DEBUG] LLM returned response for user {user_id}: {repr(user_response)}")
-                logging.debug(
-                    f"[LLM] Received response for user {user_id}: {len(str(user_response)) if user_response else 0} chars"
-                )
+            if not partial and should_store_as_memory(user_message, str(user_response)):
+                print(f"[CONSOLE DEBUG] Storing conversation as long-term memory for user {user_id}")
 
-                # Check if web search is needed after getting initial LLM response
-                if should_trigger_web_search(user_message, str(user_response)):
-                    logging.info(
-                        f"[WEB_SEARCH] Triggering web search for user {user_id} - query: {user_message[:100]}..."
+                try:
+                    # Create a memory document from the conversation; it is embedded in a batch with others' memories
+                    memory_text = f"User: {user_message}\nAssistant: {str(user_response)}"
+                    doc_id = f"chat_{user_id}_{int(time.time() * 1000)}"
+                    await write_behind_queue.enqueue(
+                        "memory",
+                        {"user_id": user_id, "doc_id": doc_id, "name": "chat_conversation", "text": memory_text},
                     )
-                    try:
-                        # Perform web search
-                        search_results = await search_web(user_message, max_results=3)
-
-                        if search_results.get("results"):
-                            # Format web search results
-                            web_info = format_web_results_for_chat(search_results)
-
-                            # Enhance the response with web search results
-                            if any(
-                                phrase in str(user_response).lower()
-                                for phrase in ["i don't know", "i'm not sure", "i don't have"]
-                            ):
-                                # Replace uncertain response with web search results
-                                user_response = web_info
-                            else:
-                                # Append web search results to existing response
-                                user_response = f"{user_response}\n\n{web_info}"
-
-                            debug_info.append(
-                                f"[WEB_SEARCH] Enhanced response with {len(search_results['results'])} web results"
-                            )
-                            logging.info(f"[WEB_SEARCH] Successfully enhanced response for user {user_id}")
-                        else:
-                            debug_info.append("[WEB_SEARCH] No web results found")
-                            logging.warning(f"[WEB_SEARCH] No results found for query: {user_message[:100]}...")
-
-                    except Exception as search_error:
-                        logging.error(f"[WEB_SEARCH] Failed for user {user_id}: {search_error}")
-                        debug_info.append(f"[WEB_SEARCH] Search failed: {str(search_error)[:50]}...")
-
-                # Add personalized greeting for returning users
-                if any(
-                    greeting in user_message.lower()
-                    for greeting in ["hello", "hi", "hey", "good morning", "good afternoon", "good evening"]
-                ):
-                    personalized_greeting = user_profile_manager.get_user_greeting(user_id)
-                    if personalized_greeting != "Hello! I'm here to help you.":
-                        user_response = f"{personalized_greeting} {user_response}"
-                        logging.info(f"[PROFILE] Added personalized greeting for {user_id}")
+                    logging.info(f"[MEMORY] Queued conversation as memory for user {user_id}")
+                    debug_info.append("[MEMORY] Queued as long-term memory")
+                except Exception as e:
+                    MemoryErrorHandler.handle_memory_error(e, "store_conversation", user_id, request_id)
+            else:
+                print(f"[CONSOLE DEBUG] Conversation not stored as memory (no personal info detected)")
 
-            except Exception as e:
-                logging.error(f"[DEBUG] LLM query failed for user {user_id}: {e}")
-                user_response = (
-                    "I apologize, but I'm having trouble processing your request right now. Please try again."
-                )
+            # --- Cache the response (tool errors are cached briefly as negative entries) ---
+            if not is_time_query and not llm_failed and not partial and user_response and str(user_response).strip():
 
-            debug_info.append("[LLM] Used LLM with memory and conversation context")
-        else:
+                async def cache_response():
+                    try:
+                        response_cache = get_response_cache()
+                        if response_cache:
+                            if tool_used and tool_failed:
+                                await response_cache.set_negative(cache_key, str(user_response))
+                            else:
+                                await response_cache.set(cache_key, str(user_response))
+                                # Tool answers depend on parameters that similar questions do not share
+                                # ("10 km" vs "12 km", "USD to EUR" vs "EUR to USD"): exact-match cache only
+                                if query_embedding is not None and not tool_used:
+                                    # Only impersonal answers (no memories, no profile) are shared in the global scope
+                                    personal = memory_used or system_prompt != DEFAULT_SYSTEM_PROMPT
+                                    shared = GLOBAL_SCOPE in semantic_scopes and not personal
+                                    db_manager.semantic_cache.store(
+                                        GLOBAL_SCOPE if shared else user_id,
+                                        query_embedding,
+                                        fingerprint,
+                                        str(user_response),
+                                    )
+                            log_service_status("cache", "info", f"Cached response for key: {cache_key}")
+                    except Exception as cache_error:
+                        CacheErrorHandler.handle_cache_error(cache_error, "set", cache_key, user_id, request_id)
+
+                await write_behind_queue.defer(cache_response())
+                debug_info.append(f"[CACHE] Response cache write queued (key: {cache_key})")
+            else:
+                if is_time_query:
+                    logging.info("[CACHE] Skipping cache for time-sensitive query")
+                elif llm_failed:
+                    logging.info("[CACHE] Skipping cache for failed LLM call")
+                elif partial:
+                    logging.info("[CACHE] Skipping cache for stopped stream")
+                else:
+                    logging.info("[CACHE] Skipping cache for empty response")
+
+            # Always log debug info, but do not include in user-facing response
+            logging.debug(f"[DEBUG INFO] {' | '.join(debug_info)}")
+            logging.debug(f"[REQUEST {request_id}] Successfully processed chat request for user {user_id}")
+
+        if tool_used:
             user_response = tool_response
             logging.debug(f"[TOOL] Tool '{tool_name}' returned response for user {user_id}")
             debug_info.append(f"[TOOL] Used {tool_name} tool")
+            await finish_turn(user_response, llm_failed=False)
+            return respond(str(user_response) if user_response is not None else "", "tool")
+
+        logging.info(f"[DEBUG] No tool used, proceeding with LLM query for user {user_id}")
+        debug_info.append("[LLM] Used LLM with memory and conversation context")
+
+        if chat.stream:
+            # Registered so the client can stop it (POST /v1/chat/completions/{X-Session-ID}/stop)
+            session = await streaming_service.create_session(user_id, model)
+
+            async def stream_llm_answer():
+                """Relay the model's tokens as they arrive, then post-process and persist the answer."""
+                try:
+                    parts = [f"{greeting} "] if greeting else []
+                    if parts:
+                        yield TOKEN_EVENT.encode(parts[0])
+
+                    async def llm_tokens():
+                        tokens = call_llm_stream(
+                            build_llm_messages(),
+                            model=model,
+                            stop_event=session.stop_event,
+                            session_id=session.session_id,
+                        )
+                        async for token in tokens:
+                            # The streaming clients report failures in-band instead of raising
+                            if token.startswith("Error: "):
+                                raise RuntimeError(token[len("Error: ") :])
+                            yield token
+
+                    llm_failed = False
+                    partial = False
+                    llm_start = time.perf_counter()
+                    first_token_ms = None
+                    try:
+                        # Tokens arriving close together share one event
+                        async for text in coalesce_tokens(llm_tokens()):
+                            if not text:
+                                continue
+                            if first_token_ms is None:
+                                first_token_ms = (time.perf_counter() - llm_start) * 1000
+                                logging.debug(f"[LLM] First token for user {user_id} after {first_token_ms:.1f}ms")
+                            parts.append(text)
+                            await streaming_service.touch(session)
+                            yield TOKEN_EVENT.encode(text)
+
+                        # A stop (client, abandoned single-flight subscription or expiry) ends the tokens early
+                        partial = session.stopped
+                        answer = "".join(parts[1:] if greeting else parts)
+                        web_info = None
+                        if not partial:
+                            web_info = await web_search_results(user_id, user_message, answer, debug_info)
+                        if web_info and is_uncertain(answer):
+                            # Replace the uncertain answer already on the client with the web results
+                            parts = [f"{greeting} {web_info}" if greeting else web_info]
+                            yield sse_event({"type": "replace", "content": parts[0]})
+                        elif web_info:
+                            parts.append(f"\n\n{web_info}")
+                            yield TOKEN_EVENT.encode(parts[-1])
+                    except Exception as e:
+                        logging.error(f"[DEBUG] LLM stream failed for user {user_id}: {e}")
+                        llm_failed = True
+                        partial = False
+                        parts = [LLM_FAILURE_MESSAGE]
+                        yield sse_event({"type": "replace", "content": LLM_FAILURE_MESSAGE})
+
+                    user_response = "".join(parts)
+                    yield sse_event({"type": "done", "response": user_response, "source": "llm", "partial": partial})
+                    yield SSE_DONE
 
-        # --- Store chat in Redis ---
+                    duration = (time.time() - start_time) * 1000
+                    log_service_status(
+                        "STREAM",
+                        "info",
+                        f"[{request_id}] Streamed {len(user_response)} chars in {duration:.2f}ms "
+                        f"(first token {first_token_ms or 0:.2f}ms)",
+                    )
+                    await finish_turn(user_response, llm_failed, partial)
+                finally:
+                    streaming_service.close_session(session)
+
+            return sse_response(stream_llm_answer(), session.session_id)
+
+        llm_failed = False
         try:
-            message_data = {
-                "user_message": user_message,
-                "assistant_response": str(user_response),
-                "timestamp": time.time(),
-            }
-            await store_chat_history(f"user:{user_id}", [message_data])
-        except Exception as e:
-            logging.warning(f"[REDIS] Failed to store chat history for user {user_id}: {e}")
-
-        # --- Automatic memory storage for important conversations ---
-        print(f"[CONSOLE DEBUG] Checking if conversation should be stored as memory...")
-
-        if should_store_as_memory(user_message, str(user_response)):
-            print(f"[CONSOLE DEBUG] Storing conversation as long-term memory for user {user_id}")
-
-            def store_memory():
-                """TODO: Add proper docstring for store_memory."""
-                # Create a memory document from the conversation
-                memory_text = f"User: {user_message}\nAssistant: {str(user_response)}"
-                doc_id = f"chat_{user_id}_{int(time.time())}"
-                chunks_stored = index_user_document(db_manager, user_id, doc_id, "chat_conversation", memory_text)
-                logging.info(f"[MEMORY] Stored conversation as memory ({chunks_stored} chunks) for user {user_id}")
-                debug_info.append(f"[MEMORY] Stored as long-term memory ({chunks_stored} chunks)")
-
-            safe_execute(
-                store_memory,
-                error_handler=lambda e: MemoryErrorHandler.handle_memory_error(
-                    e, "store_conversation", user_id, request_id
-                ),
+            logging.info(f"[DEBUG] Calling LLM query function for user {user_id}")
+            user_response = await timer.run("llm", call_llm(build_llm_messages(), model=model))
+            logging.info(f"[DEBUG] LLM returned response for user {user_id}: {repr(user_response)}")
+            logging.debug(
+                f"[LLM] Received response for user {user_id}: {len(str(user_response)) if user_response else 0} chars"
             )
-        else:
-            print(f"[CONSOLE DEBUG] Conversation not stored as memory (no personal info detected)")
 
-        # --- Cache the response (unified implementation) ---
-        if not is_time_query and user_response and str(user_response).strip():
-            try:
-                cache_manager = get_cache()
-                if cache_manager:
-                    # Create response object to cache
-                    response_data = {"response": str(user_response)}
-                    success = cache_manager.set(cache_key, response_data)
-                    if success:
-                        log_service_status("cache", "info", f"Cached response for key: {cache_key}")
-                        debug_info.append(f"[CACHE] Response cached (key: {cache_key})")
-                    else:
-                        log_service_status("cache", "warning", f"Failed to cache response for user {user_id}")
-            except Exception as cache_error:
-                log_service_status("cache", "warning", f"Cache set failed: {str(cache_error)}")
-        else:
-            if is_time_query:
-                logging.info("[CACHE] Skipping cache for time-sensitive query")
-            else:
-                logging.info("[CACHE] Skipping cache for empty response")
+            # Check if web search is needed after getting initial LLM response
+            web_info = await web_search_results(user_id, user_message, str(user_response), debug_info)
+            if web_info:
+                # Replace an uncertain response with the web results, otherwise append them
+                user_response = web_info if is_uncertain(str(user_response)) else f"{user_response}\n\n{web_info}"
 
-        # Always log debug info, but do not include in user-facing response
-        logging.debug(f"[DEBUG INFO] {' | '.join(debug_info)}")
-        logging.debug(f"[REQUEST {request_id}] Successfully processed chat request for user {user_id}")
+            # Add personalized greeting for returning users
+            if greeting:
+                user_response = f"{greeting} {user_response}"
+                logging.info(f"[PROFILE] Added personalized greeting for {user_id}")
 
-        # Create response
-        response = ChatResponse(response=str(user_response) if user_response is not None else "")
+        except Exception as e:
+            logging.error(f"[DEBUG] LLM query failed for user {user_id}: {e}")
+            llm_failed = True
+            user_response = LLM_FAILURE_MESSAGE
 
-        return response
+        await finish_turn(user_response, llm_failed)
+        return ChatResponse(response=str(user_response) if user_response is not None else "")
 
     except Exception as e:
         # Log error with service status
         log_service_status("CHAT", "error", f"Error in chat endpoint: {e}")
         # Use the specialized chat error handler
         error_response = ChatErrorHandler.handle_chat_error(e, user_id, user_message, request_id)
-        return ChatResponse(response=error_response["response"])
+        return respond(error_response["response"], "error")
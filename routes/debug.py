@@ -18,7 +18,11 @@ async def get_cache_stats() -> Dict[str, Any]:
         from database_manager import db_manager
 
         if hasattr(db_manager, "cache_manager") and db_manager.cache_manager:
-            return db_manager.cache_manager.get_stats()
+            stats = db_manager.cache_manager.get_stats()
+            stats["embedding_cache"] = db_manager.get_embedding_cache_stats()
+            stats["response_cache"] = db_manager.get_response_cache_stats()
+            stats["semantic_cache"] = db_manager.get_semantic_cache_stats()
+            return stats
         else:
             return {
                 "size": 0,
@@ -42,6 +46,9 @@ async def clear_cache() -> Dict[str, Any]:
 
         if hasattr(db_manager, "cache_manager") and db_manager.cache_manager:
             db_manager.cache_manager.clear()
+            db_manager.embedding_cache.clear()
+            db_manager.response_cache.clear()
+            db_manager.semantic_cache.clear()
             return {"status": "success", "message": "Cache cleared"}
         else:
             return {"status": "error", "message": "Cache manager not available"}
@@ -49,6 +56,156 @@ async def clear_cache() -> Dict[str, Any]:
         return {"status": "error", "message": f"Failed to clear cache: {str(e)}"}
 
 
+@debug_router.get("/embeddings")
+async def get_embedding_stats() -> Dict[str, Any]:
+    """Get embedding batcher statistics (queue depth, batch fill)"""
+    try:
+        from database_manager import db_manager
+
+        if db_manager is not None:
+            return db_manager.get_embedding_stats()
+        return {"message": "Database manager not available"}
+    except Exception as e:
+        return {"error": str(e), "message": "Embedding stats not available"}
+
+
+@debug_router.get("/executors")
+async def get_executor_stats() -> Dict[str, Any]:
+    """Get per-executor queue depth and timing for blocking embedding/ChromaDB work"""
+    try:
+        from utilities.executors import executors
+
+        return executors.get_stats()
+    except Exception as e:
+        return {"error": str(e), "message": "Executor stats not available"}
+
+
+@debug_router.get("/context")
+async def get_context_builder_stats() -> Dict[str, Any]:
+    """Get prompt packing statistics (budgets, average prompt tokens, dropped context)"""
+    try:
+        from utilities.context_builder import context_builder
+
+        return context_builder.get_stats()
+    except Exception as e:
+        return {"error": str(e), "message": "Context builder stats not available"}
+
+
+@debug_router.get("/chat-pipeline")
+async def get_chat_pipeline_stats() -> Dict[str, Any]:
+    """Get per-stage timings of the chat turn (concurrent fan-out vs. sequential sum)"""
+    try:
+        from utilities.stage_timings import chat_pipeline_stats
+
+        return chat_pipeline_stats.get_stats()
+    except Exception as e:
+        return {"error": str(e), "message": "Chat pipeline stats not available"}
+
+
+@debug_router.get("/write-behind")
+async def get_write_behind_stats() -> Dict[str, Any]:
+    """Get write-behind queue statistics (backlog, batching, retries, dead letters)"""
+    try:
+        from services.write_behind import write_behind_queue
+
+        return write_behind_queue.get_stats()
+    except Exception as e:
+        return {"error": str(e), "message": "Write-behind stats not available"}
+
+
+@debug_router.get("/tool-router")
+async def get_tool_router_stats() -> Dict[str, Any]:
+    """Get tool routing statistics (routes per tool, unrouted messages, routing time)"""
+    try:
+        from utilities.tool_router import tool_router
+
+        return tool_router.get_stats()
+    except Exception as e:
+        return {"error": str(e), "message": "Tool router stats not available"}
+
+
+@debug_router.get("/tools")
+async def get_tool_runtime_stats() -> Dict[str, Any]:
+    """Get per-tool runtime statistics (calls, cache hits, timeouts, concurrency, latency)"""
+    try:
+        from services.tool_runtime import tool_runtime
+
+        return tool_runtime.get_stats()
+    except Exception as e:
+        return {"error": str(e), "message": "Tool runtime stats not available"}
+
+
+@debug_router.get("/redis")
+async def get_redis_round_trip_stats() -> Dict[str, Any]:
+    """Get Redis round trips per request (overall distribution and per route) and pool usage"""
+    try:
+        from database_manager import db_manager
+        from utilities.redis_access import redis_round_trips
+
+        stats = redis_round_trips.get_stats()
+        stats["pool"] = db_manager.get_redis_pool_stats() if db_manager else {}
+        return stats
+    except Exception as e:
+        return {"error": str(e), "message": "Redis round-trip stats not available"}
+
+
+@debug_router.get("/http-pool")
+async def get_http_pool_stats() -> Dict[str, Any]:
+    """Get shared upstream HTTP client pool statistics (connections, in-flight requests, time to headers)"""
+    try:
+        from utilities.http_client_pool import http_client_pool
+
+        return http_client_pool.get_stats()
+    except Exception as e:
+        return {"error": str(e), "message": "HTTP pool stats not available"}
+
+
+@debug_router.get("/streams")
+async def get_stream_stats() -> Dict[str, Any]:
+    """Get LLM token stream statistics (tokens/sec, time to first token, inter-token latency)"""
+    try:
+        from utilities.stream_decoder import stream_metrics
+
+        return stream_metrics.get_stats()
+    except Exception as e:
+        return {"error": str(e), "message": "Stream stats not available"}
+
+
+@debug_router.get("/stream-sessions")
+async def get_stream_sessions() -> Dict[str, Any]:
+    """Get active streaming sessions and stop/reaping counters"""
+    try:
+        from services.streaming_service import streaming_service
+
+        return streaming_service.get_session_status()
+    except Exception as e:
+        return {"error": str(e), "message": "Stream sessions not available"}
+
+
+@debug_router.get("/single-flight")
+async def get_single_flight_stats() -> Dict[str, Any]:
+    """Get LLM request coalescing statistics (calls and streams shared by identical concurrent prompts)"""
+    try:
+        from utilities.single_flight import llm_single_flight
+
+        return llm_single_flight.get_stats()
+    except Exception as e:
+        return {"error": str(e), "message": "Single-flight stats not available"}
+
+
+@debug_router.get("/vector-index")
+async def get_vector_index_stats() -> Dict[str, Any]:
+    """Get in-process vector index statistics (loaded users, search latency, fallbacks)"""
+    try:
+        from database_manager import db_manager
+
+        if db_manager is not None:
+            return db_manager.get_vector_index_stats()
+        return {"message": "Database manager not available"}
+    except Exception as e:
+        return {"error": str(e), "message": "Vector index stats not available"}
+
+
 @debug_router.get("/memory")
 async def get_memory_usage() -> Dict[str, Any]:
     """Get memory usage statistics"""
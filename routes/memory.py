@@ -12,7 +12,7 @@ from fastapi import APIRouter, HTTPException, Body, Depends
 from pydantic import BaseModel
 
 from adaptive_learning import adaptive_learning_system
-from database_manager import retrieve_user_memory
+from database_manager import retrieve_user_memory_batch
 from human_logging import log_service_status
 from error_handler import log_error
 
@@ -52,12 +52,7 @@ async def retrieve_memory_for_function(request: MemoryRetrieveRequest = Body(...
     try:
         log_service_status("MEMORY_API", "info", f"Memory retrieval requested for user {request.user_id}")
         
-        # Use the existing retrieve_user_memory function
-        memories = await retrieve_user_memory(
-            user_id=request.user_id,
-            query=request.query,
-            limit=request.limit
-        )
+        memories = (await retrieve_user_memory_batch(request.user_id, [request.query], n_results=request.limit))[0]
         
         # Format memories for function consumption
         formatted_memories = []
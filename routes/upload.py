@@ -20,6 +20,7 @@ from error_handler import log_error
 from human_logging import log_api_request
 from human_logging import log_service_status
 from rag import rag_processor
+from services.ingestion_service import ingestion_service
 
 # Create router for upload endpoints
 upload_router = APIRouter(prefix="/upload", tags=["upload"])
@@ -62,21 +63,28 @@ async def upload_document(
         if not is_file_type_allowed(file):
             raise HTTPException(status_code=415, detail=f"File type '{file.content_type}' not supported.")
 
-        # Process document with RAG system
+        # Queue document for indexing with the RAG system
         result = await rag_processor.process_document(file, user_id)
 
+        if result.get("status") == "failed":
+            return JSONResponse(
+                status_code=422,
+                content={"success": False, "message": result.get("error", "Document processing failed"), "data": result},
+            )
+
         log_service_status(
             "API",
             "ready",
-            f"Document uploaded: {file.filename} ({result.get('chunks_processed', 0)} chunks)",
+            f"Document accepted: {file.filename} (job {result.get('job_id')})",
         )
 
         return JSONResponse(
-            status_code=200,
+            status_code=202,
             content={
                 "success": True,
-                "message": "Document uploaded and processed successfully",
+                "message": "Document accepted for processing",
                 "data": result,
+                "progress_url": f"/upload/jobs/{result.get('job_id')}",
             },
         )
 
@@ -89,6 +97,15 @@ async def upload_document(
         raise HTTPException(status_code=500, detail=get_user_friendly_message(e, "upload"))
 
 
+@upload_router.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Get progress of a document ingestion job."""
+    job = ingestion_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job '{job_id}' not found")
+    return job.to_dict()
+
+
 @upload_router.get("/formats")
 async def get_supported_formats():
     """Get list of supported file formats for upload."""
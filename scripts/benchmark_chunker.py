@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Chunker Memory Benchmark
+========================
+
+Compares peak RSS when chunking a large log file:
+1. before - read the whole upload, decode it and split it in one go
+   (what RAGProcessor.process_document used to do)
+2. after  - stream the file through utilities.text_chunker.iter_file_chunks
+
+Each mode runs in its own subprocess so peak RSS is measured independently.
+
+Usage:
+    python scripts/benchmark_chunker.py [--size-mb 100] [--file path/to/file.log]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def generate_log_file(path: Path, size_mb: int) -> None:
+    """Write a synthetic application log of roughly ``size_mb`` megabytes."""
+    rng = random.Random(42)
+    levels = ["INFO", "DEBUG", "WARNING", "ERROR"]
+    services = ["chat", "memory", "rag", "llm", "redis", "chroma"]
+    words = "request user session timeout connection embedding query response cache retry".split()
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            lines = []
+            for _ in range(rng.randint(1, 20)):
+                message = " ".join(rng.choice(words) for _ in range(rng.randint(4, 30)))
+                lines.append(
+                    f"2025-07-02T12:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} "
+                    f"{rng.choice(levels)} [{rng.choice(services)}] {message}"
+                )
+            block = "\n".join(lines) + "\n\n"
+            f.write(block)
+            written += len(block)
+
+
+def run_before(path: str) -> dict:
+    """Whole-document chunking: read, decode and split the full text."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        content = f.read()
+    text = content.decode("utf-8")
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""],
+    )
+    chunks = splitter.split_text(text)
+    return {
+        "chunks": len(chunks),
+        "seconds": round(time.perf_counter() - start, 2),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_after(path: str) -> dict:
+    """Streaming chunking: fixed-size blocks, incremental decode, bounded window."""
+    from utilities.text_chunker import iter_file_chunks
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+
+    async def consume() -> int:
+        count = 0
+        async for _ in iter_file_chunks(open(path, "rb"), CHUNK_SIZE, CHUNK_OVERLAP):
+            count += 1
+        return count
+
+    chunks = asyncio.run(consume())
+    return {
+        "chunks": chunks,
+        "seconds": round(time.perf_counter() - start, 2),
+        "baseline_rss_mb": round(baseline, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_mode(mode: str, path: Path) -> dict:
+    """Run one mode in a fresh interpreter and return its measurements."""
+    result = subprocess.run(
+        [sys.executable, __file__, "--mode", mode, "--file", str(path)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare peak RSS of whole-document vs streaming chunking")
+    parser.add_argument("--size-mb", type=int, default=100, help="Size of the generated log file")
+    parser.add_argument("--file", help="Use an existing file instead of generating one")
+    parser.add_argument("--mode", choices=["before", "after"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_before(args.file) if args.mode == "before" else run_after(args.file)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.file) if args.file else Path(tmp) / "benchmark.log"
+        if not args.file:
+            print(f"Generating {args.size_mb} MB log file...")
+            generate_log_file(path, args.size_mb)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+
+        print(f"File: {path} ({size_mb:.1f} MB)")
+        print(f"{'mode':<8} {'chunks':>9} {'seconds':>9} {'baseline MB':>12} {'peak RSS MB':>12} {'delta MB':>9}")
+        for mode in ("before", "after"):
+            r = run_mode(mode, path)
+            delta = r["peak_rss_mb"] - r["baseline_rss_mb"]
+            print(
+                f"{mode:<8} {r['chunks']:>9} {r['seconds']:>9} {r['baseline_rss_mb']:>12} "
+                f"{r['peak_rss_mb']:>12} {delta:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Redis Chat History Benchmark
+============================
+
+Measures throughput and latency of concurrent chat-history reads (LRANGE):
+1. before - synchronous redis.Redis client, every call serialized by one global
+   asyncio.Lock and run on a thread pool (what DatabaseManager used to do)
+2. after  - pooled redis.asyncio client from utilities.redis_access, no lock,
+   at increasing connection pool sizes
+
+Requires a running Redis server (REDIS_HOST/REDIS_PORT, db 15 by default).
+Only keys under the benchmark prefix are written and they are removed afterwards.
+
+Usage:
+    python scripts/benchmark_redis_history.py [--requests 2000] [--concurrency 64] [--pools 1,2,4,8,16,32]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import redis  # noqa: E402
+
+from config import REDIS_HOST, REDIS_PORT  # noqa: E402
+from utilities.redis_access import create_redis_client  # noqa: E402
+
+KEY_PREFIX = "bench:chat:"
+
+
+def seed(client: redis.Redis, chats: int, messages: int) -> List[str]:
+    """Write ``chats`` histories of ``messages`` entries each and return their keys."""
+    keys = [f"{KEY_PREFIX}{i}" for i in range(chats)]
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.delete(key)
+        pipe.lpush(
+            key,
+            *[json.dumps({"role": "user" if j % 2 else "assistant", "content": f"message {j} " * 20}) for j in range(messages)],
+        )
+    pipe.execute()
+    return keys
+
+
+async def drive(read: Callable[[str], Awaitable[None]], keys: List[str], requests: int, concurrency: int) -> Dict[str, float]:
+    """Issue ``requests`` reads from ``concurrency`` coroutines and report throughput and latency."""
+    latencies: List[float] = []
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for i in counter:
+            start = time.perf_counter()
+            await read(keys[i % len(keys)])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "ops_per_sec": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+async def run_before(args: argparse.Namespace, keys: List[str]) -> Dict[str, float]:
+    """Sync client behind a global lock, calls dispatched to a thread pool."""
+    client = redis.Redis(host=args.host, port=args.port, db=args.db, decode_responses=True)
+    lock = asyncio.Lock()
+    pool = ThreadPoolExecutor(max_workers=8)
+    loop = asyncio.get_running_loop()
+
+    async def read(key: str) -> None:
+        async with lock:
+            entries = await loop.run_in_executor(pool, client.lrange, key, 0, args.limit - 1)
+        [json.loads(entry) for entry in entries]
+
+    try:
+        return await drive(read, keys, args.requests, args.concurrency)
+    finally:
+        pool.shutdown()
+        client.close()
+
+
+async def run_after(args: argparse.Namespace, keys: List[str], pool_size: int) -> Dict[str, float]:
+    """Pooled asyncio client with ``pool_size`` connections and no lock."""
+    client = create_redis_client(
+        max_connections=pool_size, host=args.host, port=args.port, db=args.db, decode_responses=True
+    )
+
+    async def read(key: str) -> None:
+        entries = await client.lrange(key, 0, args.limit - 1)
+        [json.loads(entry) for entry in entries]
+
+    try:
+        # Open the connections up front so the first requests do not pay the handshake
+        await asyncio.gather(*(client.ping() for _ in range(pool_size)))
+        return await drive(read, keys, args.requests, args.concurrency)
+    finally:
+        await client.aclose()
+
+
+async def run(args: argparse.Namespace) -> None:
+    """Seed histories, run every mode and print a table."""
+    admin = redis.Redis(host=args.host, port=args.port, db=args.db)
+    keys = seed(admin, args.chats, args.messages)
+    try:
+        print(
+            f"Redis {args.host}:{args.port}/{args.db} - {args.requests} reads of {args.limit} messages, "
+            f"{args.concurrency} concurrent callers"
+        )
+        print(f"{'mode':<16} {'ops/sec':>10} {'p50 ms':>9} {'p99 ms':>9}")
+        r = await run_before(args, keys)
+        print(f"{'before (lock)':<16} {r['ops_per_sec']:>10} {r['p50_ms']:>9} {r['p99_ms']:>9}")
+        for pool_size in args.pools:
+            r = await run_after(args, keys, pool_size)
+            label = f"after pool={pool_size}"
+            print(f"{label:<16} {r['ops_per_sec']:>10} {r['p50_ms']:>9} {r['p99_ms']:>9}")
+    finally:
+        admin.delete(*keys)
+        admin.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare locked sync vs pooled asyncio Redis history reads")
+    parser.add_argument("--host", default=REDIS_HOST)
+    parser.add_argument("--port", type=int, default=REDIS_PORT)
+    parser.add_argument("--db", type=int, default=15, help="Database to seed (default 15, away from app data)")
+    parser.add_argument("--requests", type=int, default=2000, help="Total history reads per mode")
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent callers")
+    parser.add_argument("--chats", type=int, default=100, help="Number of seeded chat histories")
+    parser.add_argument("--messages", type=int, default=50, help="Messages per seeded history")
+    parser.add_argument("--limit", type=int, default=50, help="Messages read per request")
+    parser.add_argument(
+        "--pools", type=lambda value: [int(size) for size in value.split(",")], default=[1, 2, 4, 8, 16, 32],
+        help="Comma-separated connection pool sizes for the asyncio client",
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+SSE Encoder Benchmark
+=====================
+
+Measures the per-token cost of encoding an OpenAI-compatible streaming chunk:
+1. before - what /v1/chat/completions used to do per token: build the chunk dict
+   (id, int(time.time()), model) and json.dumps it into an f-string
+2. after  - utilities.sse_encoder: the chunk is pre-serialized once per stream and
+   only the token text is escaped and spliced in
+
+Both run on one core, so the printed tokens/sec is the encoding throughput per core.
+It then replays a simulated model stream through coalesce_tokens at a few coalescing
+intervals and reports how many events (socket writes) each one sends.
+
+Usage:
+    python scripts/benchmark_sse_encoder.py [--tokens 200000] [--rate 80] [--stream-tokens 400]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable, List
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from utilities.sse_encoder import coalesce_tokens, openai_chunk_template  # noqa: E402
+
+MODEL = "llama3.2:3b"
+SESSION_ID = "openwebui:llama3.2:3b:1700000000"
+# Typical BPE pieces: mostly short words with a leading space, some punctuation, quotes and non-ASCII
+SAMPLE_TOKENS = [" the", " model", ",", " stream", "ing", " token", ".", "\n", ' "', "é", " 42", " résumé", "’", " 🙂"]
+
+
+def legacy_encode(token: str) -> bytes:
+    """Per-token encoding of the former event_stream (the bytes Starlette then sends)."""
+    data = {
+        "id": f"chatcmpl-{SESSION_ID}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": MODEL,
+        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+    }
+    return f"data: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+def make_tokens(count: int) -> List[str]:
+    rng = random.Random(0)
+    return [rng.choice(SAMPLE_TOKENS) for _ in range(count)]
+
+
+def tokens_per_second(encode: Callable[[str], bytes], tokens: List[str], repeats: int = 5) -> float:
+    """Encoded tokens per second on one core (best of ``repeats`` rounds)."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for token in tokens:
+            encode(token)
+        best = min(best, time.perf_counter() - start)
+    return len(tokens) / best
+
+
+async def simulated_stream(tokens: List[str], rate: float) -> AsyncIterator[str]:
+    """Yield tokens at about ``rate`` tokens/sec, in small bursts like a model behind a proxy."""
+    rng = random.Random(1)
+    for token in tokens:
+        if rng.random() < 0.7:
+            await asyncio.sleep(rng.expovariate(rate) * 1.4)
+        yield token
+
+
+async def count_events(tokens: List[str], rate: float, interval_ms: float) -> tuple:
+    events = 0
+    start = time.perf_counter()
+    first_at = None
+    async for _ in coalesce_tokens(simulated_stream(tokens, rate), interval_ms=interval_ms):
+        events += 1
+        if first_at is None:
+            first_at = time.perf_counter() - start
+    return events, time.perf_counter() - start, first_at
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark SSE chunk encoding and token coalescing")
+    parser.add_argument("--tokens", type=int, default=200_000, help="Tokens encoded per timing round")
+    parser.add_argument("--rate", type=float, default=80.0, help="Simulated model speed in tokens/sec")
+    parser.add_argument("--stream-tokens", type=int, default=400, help="Tokens in the simulated stream")
+    args = parser.parse_args()
+
+    tokens = make_tokens(args.tokens)
+    template = openai_chunk_template(f"chatcmpl-{SESSION_ID}", MODEL, int(time.time()))
+    assert all(template.encode(token) == legacy_encode(token) for token in SAMPLE_TOKENS)
+
+    before = tokens_per_second(legacy_encode, tokens)
+    after = tokens_per_second(template.encode, tokens)
+    print(f"Encoding {len(tokens)} tokens (one core)")
+    print(f"{'mode':<8} {'tokens/sec':>12} {'us/token':>9}")
+    print(f"{'before':<8} {before:>12,.0f} {1_000_000 / before:>9.2f}")
+    print(f"{'after':<8} {after:>12,.0f} {1_000_000 / after:>9.2f}")
+    print(f"speedup: {after / before:.1f}x")
+
+    stream_tokens = make_tokens(args.stream_tokens)
+    print(f"\nCoalescing a {len(stream_tokens)}-token stream at ~{args.rate:.0f} tokens/sec")
+    print(f"{'interval':>9} {'events':>7} {'tokens/event':>13} {'first event':>12} {'duration':>9}")
+    for interval_ms in (0, 10, 25, 50):
+        events, duration, first_at = asyncio.run(count_events(stream_tokens, args.rate, interval_ms))
+        print(
+            f"{interval_ms:>7}ms {events:>7} {len(stream_tokens) / events:>13.2f} "
+            f"{first_at * 1000:>10.1f}ms {duration:>8.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Tool Router Benchmark
+=====================
+
+Compares tool detection on a labeled corpus of chat messages:
+1. before - the if/elif chain ToolService.detect_and_execute_tool used to run
+   (repeated lower() calls, substring checks, time patterns compiled per call)
+2. after  - utilities.tool_router: one precompiled regex pass with a confidence
+
+Prints routing throughput, a per-tool precision/recall report for both and the
+messages each one routes wrongly. Only detection is measured; no tool is run.
+
+The corpus is JSON lines of {"message": ..., "tool": <tool name or null>}, where
+null means the LLM should answer. scripts/tool_router_corpus.jsonl is used by
+default; pass --corpus to evaluate exported production messages instead.
+
+Usage:
+    python scripts/benchmark_tool_router.py [--corpus file.jsonl] [--iterations 200]
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from utilities.tool_router import ToolRouter  # noqa: E402
+
+DEFAULT_CORPUS = REPO_ROOT / "scripts" / "tool_router_corpus.jsonl"
+NO_TOOL = "(llm)"
+
+
+def legacy_route(user_message: str) -> Optional[str]:
+    """Tool selection of the former ToolService if/elif chain (detection only)."""
+
+    def is_time_query(message: str) -> bool:
+        time_patterns = [
+            r"time(?:\s*(?:in|for|at))?\s+([a-zA-Z ]+)",
+            r"current time in ([a-zA-Z ]+)",
+            r"what(?:'s| is) the time in ([a-zA-Z ]+)",
+            r"timeanddate\.com.*([a-zA-Z ]+)",
+        ]
+        for pattern in time_patterns:
+            if re.search(pattern, message, re.IGNORECASE):
+                return True
+        return "timeanddate.com" in message.lower() or "time" in message.lower()
+
+    def is_python_code_query(message: str) -> bool:
+        python_indicators = ["run python", "python code", "```python", "execute python"]
+        return any(indicator in message.lower() for indicator in python_indicators) or message.lower().startswith(
+            "python "
+        )
+
+    if is_time_query(user_message):
+        return "time"
+    elif "weather" in user_message.lower():
+        return "weather"
+    elif "convert" in user_message.lower() and "to" in user_message.lower():
+        return "unit_conversion"
+    elif "news" in user_message.lower():
+        return "news"
+    elif "search" in user_message.lower():
+        return "web_search"
+    elif "exchange rate" in user_message.lower():
+        return "exchange_rate"
+    elif "system info" in user_message.lower():
+        return "system_info"
+    elif is_python_code_query(user_message):
+        return "python_code_execution"
+    elif "wikipedia" in user_message.lower() or "wiki" in user_message.lower():
+        return "wikipedia"
+    return None
+
+
+def load_corpus(path: Path) -> List[Tuple[str, Optional[str]]]:
+    """Read (message, expected tool) pairs."""
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["message"], row.get("tool")) for row in rows]
+
+
+def time_routes(route: Callable[[str], Optional[str]], messages: List[str], iterations: int, repeats: int = 5) -> float:
+    """Microseconds per routed message (best of ``repeats`` rounds, to damp scheduler noise)."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for message in messages:
+                route(message)
+        best = min(best, time.perf_counter() - start)
+    return best / (iterations * len(messages)) * 1_000_000
+
+
+def report(label: str, predictions: List[Optional[str]], corpus: List[Tuple[str, Optional[str]]]) -> None:
+    """Print per-tool precision/recall and the misrouted messages."""
+    true_pos: Counter = Counter()
+    predicted: Counter = Counter()
+    expected: Counter = Counter()
+    mistakes = []
+    for (message, want), got in zip(corpus, predictions):
+        want, got = want or NO_TOOL, got or NO_TOOL
+        predicted[got] += 1
+        expected[want] += 1
+        if want == got:
+            true_pos[got] += 1
+        else:
+            mistakes.append((message, want, got))
+
+    correct = sum(true_pos.values())
+    print(f"\n{label}: accuracy {correct}/{len(corpus)} ({correct / len(corpus):.1%})")
+    print(f"  {'tool':<24} {'precision':>10} {'recall':>8} {'routed':>7} {'labeled':>8}")
+    for tool in sorted(set(predicted) | set(expected)):
+        precision = true_pos[tool] / predicted[tool] if predicted[tool] else 0.0
+        recall = true_pos[tool] / expected[tool] if expected[tool] else 0.0
+        print(f"  {tool:<24} {precision:>10.2f} {recall:>8.2f} {predicted[tool]:>7} {expected[tool]:>8}")
+    if mistakes:
+        print("  misrouted:")
+        for message, want, got in mistakes:
+            print(f"    {got:<22} (want {want:<22}) {message!r}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the legacy tool detection chain with the tool router")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS, help="JSONL corpus of labeled messages")
+    parser.add_argument("--iterations", type=int, default=200, help="Passes over the corpus for timing")
+    parser.add_argument("--min-confidence", type=float, default=None, help="Router threshold (default from config)")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    messages = [message for message, _ in corpus]
+    router = ToolRouter() if args.min_confidence is None else ToolRouter(min_confidence=args.min_confidence)
+
+    def router_route(message: str) -> Optional[str]:
+        route = router.route(message)
+        return route.tool if route else None
+
+    print(f"Corpus: {args.corpus} ({len(corpus)} messages), router threshold {router.min_confidence}")
+    before_us = time_routes(legacy_route, messages, args.iterations)
+    after_us = time_routes(router_route, messages, args.iterations)
+    print(f"{'mode':<8} {'us/message':>11} {'messages/sec':>13}")
+    print(f"{'before':<8} {before_us:>11.2f} {1_000_000 / before_us:>13.0f}")
+    print(f"{'after':<8} {after_us:>11.2f} {1_000_000 / after_us:>13.0f}")
+
+    report("before (if/elif chain)", [legacy_route(message) for message in messages], corpus)
+    report("after (tool router)", [router_route(message) for message in messages], corpus)
+
+
+if __name__ == "__main__":
+    main()
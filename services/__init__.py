@@ -3,7 +3,7 @@ Services module for the FastAPI backend.
 """
 
 from .llm_service import llm_service, call_llm, call_llm_stream
-from .streaming_service import streaming_service, STREAM_SESSION_STOP, STREAM_SESSION_METADATA
+from .streaming_service import streaming_service
 from .tool_service import tool_service
 
 __all__ = [
@@ -11,7 +11,5 @@ __all__ = [
     "call_llm",
     "call_llm_stream",
     "streaming_service",
-    "STREAM_SESSION_STOP",
-    "STREAM_SESSION_METADATA",
     "tool_service",
 ]
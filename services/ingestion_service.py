@@ -0,0 +1,294 @@
+"""
+Ingestion service for pipelined document indexing.
+
+Documents are indexed by a three-stage pipeline running in the background:
+chunks are produced in bounded batches, embedded on a worker pool, and upserted
+into ChromaDB. The stages overlap and are connected by bounded queues, so a large
+document never holds the event loop or buffers all of its embeddings at once.
+
+Re-indexing is incremental: chunk ids are derived from the chunk's content, and the
+ids already stored for a document form its manifest. On re-upload only chunks that
+are not in the manifest are embedded, and manifest entries that no longer occur in
+the document are deleted, as are chunks of the same file stored under the id formats
+used before incremental indexing.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from config import INGESTION_BATCH_SIZE, INGESTION_EMBED_WORKERS, INGESTION_QUEUE_SIZE, INGESTION_JOB_TTL
+from human_logging import log_service_status
+from utilities.executors import executors, run_in_executor
+
+
+@dataclass
+class IngestionJob:
+    """Progress of a single document ingestion."""
+
+    job_id: str
+    user_id: str
+    document_id: str
+    filename: str
+    status: str = "queued"  # "queued", "running", "completed", "failed"
+    total_chunks: int = 0
+    chunks_embedded: int = 0
+    chunks_stored: int = 0
+    chunks_skipped: int = 0  # Already indexed (unchanged) or repeated within the document
+    chunks_deleted: int = 0  # Stale chunks from a previous version of the document
+    chunking_done: bool = False
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize job progress for API responses."""
+        return {
+            "job_id": self.job_id,
+            "user_id": self.user_id,
+            "document_id": self.document_id,
+            "filename": self.filename,
+            "status": self.status,
+            "total_chunks": self.total_chunks if self.chunking_done else None,
+            "chunks_seen": self.total_chunks,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_stored": self.chunks_stored,
+            "chunks_skipped": self.chunks_skipped,
+            "chunks_deleted": self.chunks_deleted,
+            "error": self.error,
+            "created_at": datetime.fromtimestamp(self.created_at).isoformat(),
+            "finished_at": datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+            "elapsed_seconds": round((self.finished_at or time.time()) - self.created_at, 3),
+        }
+
+
+class IngestionService:
+    """Runs document ingestion jobs as overlapping split/embed/upsert stages."""
+
+    def __init__(
+        self,
+        batch_size: int = INGESTION_BATCH_SIZE,
+        embed_workers: int = INGESTION_EMBED_WORKERS,
+        queue_size: int = INGESTION_QUEUE_SIZE,
+        job_ttl: int = INGESTION_JOB_TTL,
+    ):
+        """Initialize the service with pipeline sizing from config.py."""
+        self.batch_size = max(1, batch_size)
+        self.embed_workers = max(1, embed_workers)
+        self.queue_size = max(1, queue_size)
+        self.job_ttl = job_ttl
+        self.jobs: Dict[str, IngestionJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._document_locks: Dict[str, asyncio.Lock] = {}
+        self._document_lock_users: Dict[str, int] = {}
+
+    def submit(self, user_id: str, document_id: str, filename: str, chunks: AsyncIterator[str]) -> IngestionJob:
+        """Start ingesting a document in the background and return its job immediately."""
+        self._cleanup_finished_jobs()
+
+        job = IngestionJob(job_id=uuid.uuid4().hex, user_id=user_id, document_id=document_id, filename=filename)
+        self.jobs[job.job_id] = job
+        task = asyncio.create_task(self._run(job, chunks))
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.job_id, None))
+
+        log_service_status("INGEST", "info", f"Queued ingestion job {job.job_id} for {filename} (user: {user_id})")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        """Look up a job by id."""
+        return self.jobs.get(job_id)
+
+    @staticmethod
+    def document_id(user_id: str, filename: str) -> str:
+        """Build the id of a user's document, stable across re-uploads of the same filename."""
+        # Hashing the pair keeps ids distinct whatever characters the user id and filename contain
+        key = json.dumps([user_id, filename])
+        return f"doc:{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}"
+
+    @staticmethod
+    def chunk_id(document_id: str, text: str) -> str:
+        """Build a content-addressed chunk id, stable across re-uploads of the document."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+        return f"chunk:{document_id}:{digest}"
+
+    async def _run(self, job: IngestionJob, chunks: AsyncIterator[str]) -> None:
+        """Run a job once no other job is re-indexing the same document."""
+        document_id = job.document_id
+        lock = self._document_locks.setdefault(document_id, asyncio.Lock())
+        self._document_lock_users[document_id] = self._document_lock_users.get(document_id, 0) + 1
+        try:
+            async with lock:
+                await self._run_pipeline(job, chunks)
+        finally:
+            # Drop the lock with its last user: a waiter that has not resumed yet still holds a count
+            self._document_lock_users[document_id] -= 1
+            if not self._document_lock_users[document_id]:
+                del self._document_lock_users[document_id]
+                del self._document_locks[document_id]
+
+    async def _run_pipeline(self, job: IngestionJob, chunks: AsyncIterator[str]) -> None:
+        """Drive the three pipeline stages for one job."""
+        from database_manager import db_manager
+
+        job.status = "running"
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        store_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        manifest: Set[str] = set()
+        seen: Set[str] = set()
+
+        async def produce() -> None:
+            """Stage 1: group new chunks into bounded batches (blocks when embedders fall behind)."""
+            batch: List[Tuple[int, str, str]] = []
+            async for chunk in chunks:
+                index = job.total_chunks
+                job.total_chunks += 1
+                chunk_id = self.chunk_id(job.document_id, chunk)
+                if chunk_id in seen or chunk_id in manifest:
+                    seen.add(chunk_id)
+                    job.chunks_skipped += 1
+                    continue
+                seen.add(chunk_id)
+                batch.append((index, chunk_id, chunk))
+                if len(batch) >= self.batch_size:
+                    await embed_queue.put(batch)
+                    batch = []
+            if batch:
+                await embed_queue.put(batch)
+            job.chunking_done = True
+            for _ in range(self.embed_workers):
+                await embed_queue.put(None)
+
+        async def embed() -> None:
+            """Stage 2: embed batches on the worker pool."""
+            while (batch := await embed_queue.get()) is not None:
+                texts = [text for _, _, text in batch]
+                embeddings = await db_manager.encode_chunks(texts, executor=executors.get("ingestion", self.embed_workers))
+                job.chunks_embedded += len(batch)
+                await store_queue.put((batch, embeddings))
+
+        async def store() -> None:
+            """Stage 3: upsert embedded batches into ChromaDB."""
+            while (item := await store_queue.get()) is not None:
+                batch, embeddings = item
+                await self._store_batch(db_manager, job, batch, embeddings)
+                job.chunks_stored += len(batch)
+
+        async def drain() -> None:
+            """Signal the store stage once every batch has been embedded."""
+            await asyncio.gather(producer, *embedders)
+            await store_queue.put(None)
+            await storer
+
+        tasks: List[asyncio.Task] = []
+        try:
+            if db_manager is None or db_manager.chroma_collection is None or not db_manager.is_embeddings_available():
+                raise RuntimeError("ChromaDB or embeddings not available for document indexing")
+
+            manifest, legacy = await self._load_manifest(db_manager, job)
+
+            producer = asyncio.create_task(produce())
+            embedders = [asyncio.create_task(embed()) for _ in range(self.embed_workers)]
+            storer = asyncio.create_task(store())
+            tasks = [producer, *embedders, storer]
+
+            # Awaiting the store stage alongside surfaces its failures while upstream stages are blocked on it
+            await asyncio.gather(drain(), storer)
+
+            # Only prune once the new version is fully stored, so a failed job leaves the old one searchable
+            stale = (manifest - seen) | legacy
+            if stale:
+                await self._delete_chunks(db_manager, job.user_id, sorted(stale))
+                job.chunks_deleted = len(stale)
+
+            job.status = "completed"
+            log_service_status(
+                "INGEST",
+                "ready",
+                f"Job {job.job_id}: stored {job.chunks_stored}/{job.total_chunks} chunks for {job.filename} "
+                f"({job.chunks_skipped} unchanged, {job.chunks_deleted} removed) in {time.time() - job.created_at:.2f}s",
+            )
+        except Exception as e:
+            for task in tasks:
+                task.cancel()
+            job.status = "failed"
+            job.error = str(e)
+            log_service_status("INGEST", "error", f"Job {job.job_id} failed for {job.filename}: {e}")
+        finally:
+            job.finished_at = time.time()
+
+    async def _load_manifest(self, db_manager: Any, job: IngestionJob) -> Tuple[Set[str], Set[str]]:
+        """Get the ids of the chunks stored for a job's file, split into its manifest and legacy chunks.
+
+        Legacy chunks are the file's chunks stored under older document ids (``{user_id}_{filename}``
+        with or without a content hash suffix); they are replaced by this upload.
+        """
+        result = await run_in_executor(
+            "chroma",
+            db_manager.chroma_collection.get,
+            where={"$and": [{"user_id": job.user_id}, {"source": job.filename}]},
+            include=["metadatas"],
+        )
+        legacy_prefix = f"{job.user_id}_{job.filename}"
+        manifest: Set[str] = set()
+        legacy: Set[str] = set()
+        for chunk_id, metadata in zip(result.get("ids") or [], result.get("metadatas") or []):
+            doc_id = str((metadata or {}).get("doc_id", ""))
+            if doc_id == job.document_id:
+                manifest.add(chunk_id)
+            elif doc_id == legacy_prefix or doc_id.startswith(legacy_prefix + "_"):
+                legacy.add(chunk_id)
+        return manifest, legacy
+
+    async def _delete_chunks(self, db_manager: Any, user_id: str, ids: List[str]) -> None:
+        """Delete chunks from the collection in batches, off the event loop."""
+        for start in range(0, len(ids), self.batch_size):
+            batch_ids = ids[start : start + self.batch_size]
+            await run_in_executor("chroma", db_manager.chroma_collection.delete, ids=batch_ids)
+            await run_in_executor("chroma", db_manager.vector_index.delete, batch_ids, user_id)
+        db_manager.memory_changed(user_id)
+
+    async def _store_batch(
+        self, db_manager: Any, job: IngestionJob, batch: List[Tuple[int, str, str]], embeddings: List[List[float]]
+    ) -> None:
+        """Write one embedded batch to the collection off the event loop."""
+        timestamp = datetime.now().isoformat()
+        ids = [chunk_id for _, chunk_id, _ in batch]
+        documents = [text for _, _, text in batch]
+        metadatas = [
+            {
+                "user_id": job.user_id,
+                "doc_id": job.document_id,
+                "source": job.filename,
+                "chunk_index": index,
+                "timestamp": timestamp,
+            }
+            for index, _, _ in batch
+        ]
+        await run_in_executor(
+            "chroma",
+            db_manager.chroma_collection.upsert, embeddings=embeddings, documents=documents, metadatas=metadatas, ids=ids
+        )
+        await run_in_executor("chroma", db_manager.vector_index.upsert, ids, embeddings, documents, metadatas)
+        db_manager.memory_changed(job.user_id)
+
+    def _cleanup_finished_jobs(self) -> None:
+        """Forget finished jobs older than the retention window."""
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]
+        for job_id in expired:
+            self.jobs.pop(job_id, None)
+
+    async def shutdown(self) -> None:
+        """Cancel running jobs (the executors are shut down with the application)."""
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+
+# Global ingestion service instance
+ingestion_service = IngestionService()
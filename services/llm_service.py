@@ -3,7 +3,6 @@ LLM service for calling Ollama and OpenAI APIs.
 """
 
 import asyncio
-import json
 import logging
 import time
 from typing import AsyncGenerator, List, Dict, Any, Optional
@@ -17,14 +16,16 @@ from config import (
     OPENAI_API_KEY,
     OPENAI_API_MAX_TOKENS,
     OPENAI_API_TIMEOUT,
+    LLM_SINGLE_FLIGHT_ENABLED,
     LLM_TIMEOUT,
     CONNECTION_TIMEOUT,
     READ_TIMEOUT,
     WRITE_TIMEOUT,
-    CONNECTION_POOL_SIZE,
-    MAX_KEEPALIVE_CONNECTIONS,
 )
 from human_logging import log_service_status
+from utilities.http_client_pool import http_client_pool
+from utilities.single_flight import llm_single_flight, make_key
+from utilities.stream_decoder import OllamaChatDecoder, OpenAISSEDecoder, stream_metrics
 
 
 class LLMService:
@@ -35,6 +36,7 @@ class LLMService:
         self.default_model = DEFAULT_MODEL
         self.ollama_url = OLLAMA_BASE_URL
         self.use_ollama = USE_OLLAMA
+        self.single_flight = LLM_SINGLE_FLIGHT_ENABLED
 
     async def call_llm(
         self,
@@ -48,11 +50,26 @@ class LLMService:
         """
         model = model or self.default_model
 
+        if self.single_flight:
+            # Identical concurrent prompts (open tabs, client retries) share one generation
+            key = make_key("chat", model, messages, **self._flight_options(api_url, api_key))
+            return await llm_single_flight.do(key, lambda: self._call_backend(messages, model, api_url, api_key))
+        return await self._call_backend(messages, model, api_url, api_key)
+
+    async def _call_backend(
+        self, messages: List[Dict[str, Any]], model: str, api_url: Optional[str], api_key: Optional[str]
+    ) -> str:
         if self.use_ollama:
             return await self.call_ollama_llm(messages, model)
         else:
             return await self.call_openai_llm(messages, model, api_url, api_key)
 
+    def _flight_options(self, api_url: Optional[str], api_key: Optional[str]) -> Dict[str, Any]:
+        """Request settings that make otherwise identical calls different (hashed into the flight key)."""
+        if self.use_ollama:
+            return {"backend": self.ollama_url}
+        return {"backend": api_url or OPENAI_API_BASE_URL, "api_key": api_key or OPENAI_API_KEY}
+
     async def call_ollama_llm(self, messages: List[Dict[str, Any]], model: Optional[str] = None) -> str:
         """
         Asynchronously calls the Ollama API using the chat endpoint for better control.
@@ -74,25 +91,20 @@ class LLMService:
         timeout = LLM_TIMEOUT
 
         try:
-            # Configure optimized timeouts and connection pooling
+            # Configure optimized timeouts; connections come from the shared pool
             timeout = httpx.Timeout(
                 timeout=LLM_TIMEOUT, connect=CONNECTION_TIMEOUT, read=READ_TIMEOUT, write=WRITE_TIMEOUT
             )
 
-            limits = httpx.Limits(
-                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
-                max_connections=CONNECTION_POOL_SIZE,
-                keepalive_expiry=30.0,
-            )
-
-            async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
-                response = await client.post(f"{self.ollama_url}/api/chat", json=payload)
+            client = http_client_pool.get_client(self.ollama_url)
+            with http_client_pool.track(self.ollama_url):
+                response = await client.post(f"{self.ollama_url}/api/chat", json=payload, timeout=timeout)
                 response.raise_for_status()
-                data = response.json()
-                llm_response = data.get("message", {}).get("content", "")
-                logging.debug(f"[DEBUG] Ollama response length: {len(llm_response)} chars")
-                logging.debug(f"[DEBUG] Ollama response content: '{llm_response[:200]}...'")
-                return llm_response
+            data = response.json()
+            llm_response = data.get("message", {}).get("content", "")
+            logging.debug(f"[DEBUG] Ollama response length: {len(llm_response)} chars")
+            logging.debug(f"[DEBUG] Ollama response content: '{llm_response[:200]}...'")
+            return llm_response
         except httpx.RequestError as e:
             log_service_status("OLLAMA", "failed", f"Connection to Ollama at {self.ollama_url} failed: {e}")
             raise Exception(f"Cannot connect to Ollama service at {self.ollama_url}") from e
@@ -132,22 +144,17 @@ class LLMService:
         timeout = OPENAI_API_TIMEOUT
 
         try:
-            # Configure optimized timeouts and connection pooling
+            # Configure optimized timeouts; connections come from the shared pool
             timeout = httpx.Timeout(
                 timeout=OPENAI_API_TIMEOUT, connect=CONNECTION_TIMEOUT, read=READ_TIMEOUT, write=WRITE_TIMEOUT
             )
 
-            limits = httpx.Limits(
-                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
-                max_connections=CONNECTION_POOL_SIZE,
-                keepalive_expiry=30.0,
-            )
-
-            async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
-                resp = await client.post(api_url, headers=headers, json=payload)
+            client = http_client_pool.get_client(api_url)
+            with http_client_pool.track(api_url):
+                resp = await client.post(api_url, headers=headers, json=payload, timeout=timeout)
                 resp.raise_for_status()
-                data = resp.json()
-                return data.get("choices", [{}])[0].get("message", {}).get("content", "")
+            data = resp.json()
+            return data.get("choices", [{}])[0].get("message", {}).get("content", "")
         except httpx.RequestError as e:
             log_service_status("OPENAI", "failed", f"Connection to OpenAI API at {api_url} failed: {e}")
             raise Exception(f"Cannot connect to OpenAI service at {api_url}") from e
@@ -173,12 +180,30 @@ class LLMService:
         """
         model = model or self.default_model
 
-        if self.use_ollama:
-            async for token in self.call_ollama_llm_stream(messages, model, stop_event, session_id):
-                yield token
+        if self.single_flight:
+            # One generation fanned out to every identical concurrent stream; the stop
+            # event only detaches this subscriber, the generation ends with its last one
+            key = make_key("stream", model, messages, **self._flight_options(api_url, api_key))
+            tokens = llm_single_flight.stream(
+                key, lambda: self._stream_backend(messages, model, api_url, api_key, None, session_id), stop_event
+            )
         else:
-            async for token in self.call_openai_llm_stream(messages, model, api_url, api_key, stop_event, session_id):
-                yield token
+            tokens = self._stream_backend(messages, model, api_url, api_key, stop_event, session_id)
+        async for token in tokens:
+            yield token
+
+    def _stream_backend(
+        self,
+        messages: List[Dict[str, Any]],
+        model: str,
+        api_url: Optional[str],
+        api_key: Optional[str],
+        stop_event,
+        session_id: Optional[str],
+    ) -> AsyncGenerator[str, None]:
+        if self.use_ollama:
+            return self.call_ollama_llm_stream(messages, model, stop_event, session_id)
+        return self.call_openai_llm_stream(messages, model, api_url, api_key, stop_event, session_id)
 
     async def call_ollama_llm_stream(
         self,
@@ -190,40 +215,33 @@ class LLMService:
         """
         Asynchronously streams tokens from the Ollama API with proper resource management.
         """
-        from services.streaming_service import STREAM_SESSION_STOP
-
         model = model or self.default_model
         prompt = "\n".join(f"{msg.get('role', 'user').capitalize()}: {msg.get('content', '')}" for msg in messages)
         payload = {"model": model, "messages": messages, "stream": True}
         timeout = LLM_TIMEOUT
 
-        client = None
+        decoder = OllamaChatDecoder(model)
         try:
-            client = httpx.AsyncClient(timeout=timeout)
-            async with client.stream("POST", f"{self.ollama_url}/api/chat", json=payload) as resp:
+            client = http_client_pool.get_client(self.ollama_url)
+            async with http_client_pool.track(self.ollama_url), client.stream(
+                "POST", f"{self.ollama_url}/api/chat", json=payload, timeout=timeout
+            ) as resp:
                 resp.raise_for_status()
-                async for line in resp.aiter_lines():
+                # NDJSON lines ({"message": {"content": ...}, "done": ...}) decoded straight from the byte chunks
+                async for chunk in resp.aiter_bytes():
                     # Check stop conditions
-                    if (stop_event and stop_event.is_set()) or (session_id and STREAM_SESSION_STOP.get(session_id)):
+                    if stop_event is not None and stop_event.is_set():
                         log_service_status("OLLAMA", "info", f"Stream stopped for session {session_id}")
                         break
 
-                    if not line:
-                        continue
-
-                    try:
-                        data = json.loads(line)
-                        if (
-                            (choices := data.get("choices"))
-                            and (delta := choices[0].get("delta"))
-                            and (content := delta.get("content"))
-                        ):
-                            yield content
-                        if data.get("done"):
-                            log_service_status("OLLAMA", "info", "Stream completed successfully")
-                            break
-                    except json.JSONDecodeError:
-                        continue
+                    for token in decoder.feed(chunk):
+                        yield token
+                    if decoder.done:
+                        log_service_status("OLLAMA", "info", "Stream completed successfully")
+                        break
+                else:
+                    for token in decoder.flush():
+                        yield token
 
         except httpx.RequestError as e:
             log_service_status("OLLAMA", "failed", f"Streaming connection to Ollama failed: {e}")
@@ -232,11 +250,8 @@ class LLMService:
             log_service_status("OLLAMA", "failed", f"Ollama streaming failed: {e}")
             yield f"Error: {str(e)}"
         finally:
-            # Ensure proper cleanup
-            if client:
-                await client.aclose()
-            if session_id and session_id in STREAM_SESSION_STOP:
-                STREAM_SESSION_STOP.pop(session_id, None)
+            # The pooled client stays open
+            stream_metrics.record(decoder.stats)
 
     async def call_openai_llm_stream(
         self,
@@ -250,8 +265,6 @@ class LLMService:
         """
         Asynchronously streams tokens from an OpenAI-compatible API with proper resource management.
         """
-        from services.streaming_service import STREAM_SESSION_STOP
-
         model = model or self.default_model
         api_url = api_url or OPENAI_API_BASE_URL
         api_key = api_key or OPENAI_API_KEY
@@ -269,35 +282,27 @@ class LLMService:
         }
         timeout = OPENAI_API_TIMEOUT
 
-        client = None
+        decoder = OpenAISSEDecoder(model)
         try:
-            client = httpx.AsyncClient(timeout=timeout)
-            async with client.stream("POST", api_url, headers=headers, json=payload) as resp:
+            client = http_client_pool.get_client(api_url)
+            async with http_client_pool.track(api_url), client.stream(
+                "POST", api_url, headers=headers, json=payload, timeout=timeout
+            ) as resp:
                 resp.raise_for_status()
-                async for line in resp.aiter_lines():
+                async for chunk in resp.aiter_bytes():
                     # Check stop conditions
-                    if (stop_event and stop_event.is_set()) or (session_id and STREAM_SESSION_STOP.get(session_id)):
+                    if stop_event is not None and stop_event.is_set():
                         log_service_status("OPENAI", "info", f"Stream stopped for session {session_id}")
                         break
 
-                    if not line or not line.startswith("data: "):
-                        continue
-
-                    line_text = line[6:]
-                    if line_text.strip() == "[DONE]":
+                    for token in decoder.feed(chunk):
+                        yield token
+                    if decoder.done:
                         log_service_status("OPENAI", "info", "Stream completed successfully")
                         break
-
-                    try:
-                        data = json.loads(line_text)
-                        if (
-                            (choices := data.get("choices"))
-                            and (delta := choices[0].get("delta"))
-                            and (content := delta.get("content"))
-                        ):
-                            yield content
-                    except json.JSONDecodeError:
-                        continue
+                else:
+                    for token in decoder.flush():
+                        yield token
 
         except httpx.RequestError as e:
             log_service_status("OPENAI", "failed", f"Streaming connection to OpenAI API failed: {e}")
@@ -306,11 +311,8 @@ class LLMService:
             log_service_status("OPENAI", "failed", f"OpenAI streaming failed: {e}")
             yield f"Error: {str(e)}"
         finally:
-            # Ensure proper cleanup
-            if client:
-                await client.aclose()
-            if session_id and session_id in STREAM_SESSION_STOP:
-                STREAM_SESSION_STOP.pop(session_id, None)
+            # The pooled client stays open
+            stream_metrics.record(decoder.stats)
 
     async def get_embeddings(self, text: str, model: Optional[str] = None) -> Optional[List[float]]:
         """
@@ -321,8 +323,11 @@ class LLMService:
         model = model or EMBEDDING_MODEL
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(f"{self.ollama_url}/api/embeddings", json={"model": model, "prompt": text})
+            client = http_client_pool.get_client(self.ollama_url)
+            with http_client_pool.track(self.ollama_url):
+                response = await client.post(
+                    f"{self.ollama_url}/api/embeddings", json={"model": model, "prompt": text}, timeout=30.0
+                )
 
                 if response.status_code == 200:
                     result = response.json()
@@ -1,73 +1,313 @@
 """
 Streaming service for managing streaming sessions and session state.
+
+Every stream is a ``StreamSession`` registered under a unique id (returned to the
+client in the ``X-Session-ID`` header):
+
+- cancellation is a per-session ``asyncio.Event``; the streaming loop holds the
+  event itself, so checking it per token needs no registry lookup;
+- sessions are removed when their stream ends, and a hashed timer wheel reaps
+  (stops and drops) any session idle for ``STREAM_SESSION_TTL``, for instance
+  a stream whose response was never started; streams push their expiry back as
+  tokens arrive (``touch``);
+- with Redis, live sessions are also registered under a key expiring with them, and
+  a stop request for a session owned by another worker is published on a Redis
+  channel that every worker subscribes to, so it reaches the worker running it.
 """
 
+import asyncio
 import time
-import logging
-from typing import Dict
+import uuid
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from config import STREAM_REAPER_TICK, STREAM_SESSION_TTL, STREAM_STOP_CHANNEL
 from human_logging import log_service_status
 
-# Global dict to track streaming sessions with enhanced management
-STREAM_SESSION_STOP: Dict[str, bool] = {}
-STREAM_SESSION_METADATA: Dict[str, dict] = {}
+
+class StreamSession:
+    """One running stream."""
+
+    __slots__ = (
+        "session_id",
+        "user_id",
+        "model",
+        "created_at",
+        "stop_event",
+        "stopped_at",
+        "stopped_by",
+        "touched_at",
+        "registered_at",
+    )
+
+    def __init__(self, session_id: str, user_id: str, model: str):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.model = model
+        self.created_at = time.time()
+        self.stop_event = asyncio.Event()
+        self.stopped_at: Optional[float] = None
+        self.stopped_by: Optional[str] = None
+        # Monotonic times of the last expiry reschedule and Redis registration
+        self.touched_at = time.monotonic()
+        self.registered_at = self.touched_at
+
+    @property
+    def stopped(self) -> bool:
+        return self.stop_event.is_set()
+
+    def stop(self, reason: str) -> None:
+        """Signal the stream to stop (idempotent)."""
+        if not self.stop_event.is_set():
+            self.stopped_at = time.time()
+            self.stopped_by = reason
+            self.stop_event.set()
+
+
+class TimerWheel:
+    """Hashed timer wheel: O(1) scheduling and cancellation, expiry by visiting elapsed slots."""
+
+    def __init__(self, tick: float, slots: int):
+        self.tick = tick
+        self._slots: List[Dict[str, int]] = [{} for _ in range(max(1, slots))]
+        self._slot_of: Dict[str, int] = {}
+        self._current = self._tick_of(time.monotonic())
+
+    def _tick_of(self, when: float) -> int:
+        return int(when / self.tick)
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def schedule(self, key: str, delay: float, now: Optional[float] = None) -> None:
+        """Expire ``key`` after ``delay`` seconds (rescheduling it if already present)."""
+        self.cancel(key)
+        due = max(self._tick_of((now if now is not None else time.monotonic()) + delay), self._current + 1)
+        index = due % len(self._slots)
+        self._slots[index][key] = due
+        self._slot_of[key] = index
+
+    def cancel(self, key: str) -> None:
+        index = self._slot_of.pop(key, None)
+        if index is not None:
+            self._slots[index].pop(key, None)
+
+    def advance(self, now: Optional[float] = None) -> List[str]:
+        """Move the wheel to ``now`` and return the keys that expired."""
+        target = self._tick_of(now if now is not None else time.monotonic())
+        expired: List[str] = []
+        # One turn at most: by then every slot has been visited and overdue keys collected
+        for tick in range(self._current + 1, min(target, self._current + len(self._slots)) + 1):
+            slot = self._slots[tick % len(self._slots)]
+            for key in [key for key, due in slot.items() if due <= target]:
+                del slot[key]
+                del self._slot_of[key]
+                expired.append(key)
+        self._current = max(self._current, target)
+        return expired
 
 
 class StreamingService:
-    """Service for managing streaming sessions."""
+    """Registry of the streaming sessions of this worker."""
 
-    @staticmethod
-    def stop_streaming_session(session_id: str):
-        """Stop a streaming session and cleanup metadata."""
-        STREAM_SESSION_STOP[session_id] = True
-        if session_id in STREAM_SESSION_METADATA:
-            STREAM_SESSION_METADATA[session_id]["stopped_at"] = time.time()
+    def __init__(
+        self, ttl: float = STREAM_SESSION_TTL, tick: float = STREAM_REAPER_TICK, channel: str = STREAM_STOP_CHANNEL
+    ):
+        self.ttl = ttl
+        self.channel = channel
+        self._sessions: Dict[str, StreamSession] = {}
+        self._wheel = TimerWheel(tick, int(ttl / tick) + 1)
+        self._redis: Any = None
+        self._tasks: List[asyncio.Task] = []
+        self._unregistering: Set[asyncio.Task] = set()
+        self._created = 0
+        self._stopped = 0
+        self._reaped = 0
+        self._forwarded = 0
+        self._remote_stops = 0
+
+    async def start(self, redis_client: Any = None) -> None:
+        """Start the reaper and, with Redis, the listener for stop requests from other workers."""
+        if self._tasks:
+            return
+        self._redis = redis_client
+        self._tasks = [asyncio.create_task(self._reaper())]
+        if redis_client is not None:
+            self._tasks.append(asyncio.create_task(self._listen()))
+        mode = f"Redis channel '{self.channel}'" if redis_client is not None else "this worker only"
+        log_service_status("STREAM", "ready", f"Stream session registry started (stop signals: {mode})")
+
+    def attach_redis(self, redis_client: Any) -> None:
+        """Publish on a new client (after a reconnect); the listener resubscribes to its server."""
+        if self._redis is not None and redis_client is not None:
+            self._redis = redis_client
+
+    async def shutdown(self) -> None:
+        """Stop every running stream and the background tasks."""
+        for session in list(self._sessions.values()):
+            session.stop("shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.gather(*self._unregistering, return_exceptions=True)
 
     @staticmethod
-    def cleanup_old_sessions(max_age_seconds: int = 3600):
-        """Clean up old streaming sessions to prevent memory leaks."""
-        current_time = time.time()
-        sessions_to_remove = []
+    def _session_key(session_id: str) -> str:
+        """Redis key present while a session runs on some worker."""
+        return f"stream_session:{session_id}"
 
-        for session_id, metadata in STREAM_SESSION_METADATA.items():
-            if current_time - metadata.get("created_at", 0) > max_age_seconds:
-                sessions_to_remove.append(session_id)
+    async def create_session(self, user_id: str, model: str) -> StreamSession:
+        """Register a new stream under a unique id (in Redis too, so every worker knows it is live)."""
+        session = StreamSession(uuid.uuid4().hex, user_id, model)
+        self._sessions[session.session_id] = session
+        self._wheel.schedule(session.session_id, self.ttl)
+        self._created += 1
+        if self._redis is not None:
+            try:
+                await self._redis.set(self._session_key(session.session_id), "1", ex=max(1, int(self.ttl)))
+            except Exception as e:
+                log_service_status("STREAM", "warning", f"Could not register session {session.session_id}: {e}")
+        return session
 
-        for session_id in sessions_to_remove:
-            STREAM_SESSION_STOP.pop(session_id, None)
-            STREAM_SESSION_METADATA.pop(session_id, None)
+    async def touch(self, session: StreamSession) -> None:
+        """Record activity on a stream, so it expires ``ttl`` after its last token rather than its start.
 
-        if sessions_to_remove:
-            log_service_status(
-                "SESSION_CLEANUP", "info", f"Cleaned up {len(sessions_to_remove)} old streaming sessions"
-            )
+        Throttled to one expiry reschedule per reaper tick and one Redis refresh per half TTL.
+        """
+        now = time.monotonic()
+        if now - session.touched_at < self._wheel.tick:
+            return
+        session.touched_at = now
+        if session.session_id in self._sessions:
+            self._wheel.schedule(session.session_id, self.ttl, now)
+        if self._redis is not None and now - session.registered_at >= self.ttl / 2:
+            session.registered_at = now
+            try:
+                await self._redis.set(self._session_key(session.session_id), "1", ex=max(1, int(self.ttl)))
+            except Exception as e:
+                log_service_status("STREAM", "warning", f"Could not refresh session {session.session_id}: {e}")
 
-    @staticmethod
-    def create_session(session_id: str, user_id: str, model: str):
-        """Create a new streaming session."""
-        STREAM_SESSION_STOP[session_id] = False
-        STREAM_SESSION_METADATA[session_id] = {"created_at": time.time(), "user_id": user_id, "model": model}
+    def get_session(self, session_id: str) -> Optional[StreamSession]:
+        return self._sessions.get(session_id)
 
-    @staticmethod
-    def get_session_status():
+    def close_session(self, session: StreamSession) -> None:
+        """Drop a finished stream's session."""
+        if self._sessions.pop(session.session_id, None) is not None:
+            self._wheel.cancel(session.session_id)
+            if self._redis is not None:
+                # Called from a stream's cleanup, which must not wait on Redis
+                task = asyncio.create_task(self._unregister([session.session_id]))
+                self._unregistering.add(task)
+                task.add_done_callback(self._unregistering.discard)
+
+    async def _unregister(self, session_ids: List[str]) -> None:
+        """Remove ended sessions' Redis keys, so stops for them are answered "not_found"."""
+        try:
+            await self._redis.delete(*[self._session_key(session_id) for session_id in session_ids])
+        except Exception as e:
+            log_service_status("STREAM", "warning", f"Could not unregister {len(session_ids)} session(s): {e}")
+
+    async def stop_streaming_session(self, session_id: str) -> str:
+        """Stop a stream, wherever it runs.
+
+        Returns:
+            "stopped" when it ran on this worker, "forwarded" when the stop was published
+            to the other workers (the session is registered in Redis), "not_found" otherwise.
+        """
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.stop("client")
+            self._stopped += 1
+            return "stopped"
+        if self._redis is not None:
+            try:
+                if not await self._redis.exists(self._session_key(session_id)):
+                    return "not_found"
+                await self._redis.publish(self.channel, session_id)
+                self._forwarded += 1
+                return "forwarded"
+            except Exception as e:
+                log_service_status("STREAM", "warning", f"Could not publish stop for session {session_id}: {e}")
+        return "not_found"
+
+    async def _reaper(self) -> None:
+        """Stop and drop sessions idle for longer than their TTL."""
+        while True:
+            await asyncio.sleep(self._wheel.tick)
+            expired = self._wheel.advance()
+            for session_id in expired:
+                session = self._sessions.pop(session_id, None)
+                if session is not None:
+                    session.stop("expired")
+                    self._reaped += 1
+            if expired:
+                log_service_status("SESSION_CLEANUP", "info", f"Reaped {len(expired)} expired streaming sessions")
+                if self._redis is not None:
+                    await self._unregister(expired)
+
+    async def _listen(self) -> None:
+        """Apply stop requests published by other workers to the sessions running here.
+
+        The subscription runs on its own connection without a socket timeout (see
+        ``create_listener_client``) and polls, so it moves to a client attached after a reconnect.
+        """
+        from utilities.redis_access import create_listener_client
+
+        while True:
+            redis_client = self._redis
+            listener = create_listener_client(redis_client)
+            pubsub = listener.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                while self._redis is redis_client:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None or message.get("type") != "message":
+                        continue
+                    data = message["data"]
+                    session = self._sessions.get(data.decode() if isinstance(data, bytes) else data)
+                    if session is not None and not session.stopped:
+                        session.stop("remote")
+                        self._remote_stops += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log_service_status("STREAM", "warning", f"Stop channel listener failed, resubscribing: {e}")
+                await asyncio.sleep(1.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                    await listener.aclose(close_connection_pool=True)
+                except Exception:
+                    pass
+
+    def get_session_status(self) -> Dict[str, Any]:
         """Get status of all active streaming sessions."""
         current_time = time.time()
-        active_sessions = []
-
-        for session_id, metadata in STREAM_SESSION_METADATA.items():
-            session_info = {
-                "session_id": session_id,
-                "created_at": metadata.get("created_at"),
-                "age_seconds": current_time - metadata.get("created_at", current_time),
-                "is_stopped": STREAM_SESSION_STOP.get(session_id, False),
-                "stopped_at": metadata.get("stopped_at"),
+        active_sessions = [
+            {
+                "session_id": session.session_id,
+                "user_id": session.user_id,
+                "model": session.model,
+                "created_at": session.created_at,
+                "age_seconds": round(current_time - session.created_at, 1),
+                "is_stopped": session.stopped,
+                "stopped_at": session.stopped_at,
+                "stopped_by": session.stopped_by,
             }
-            active_sessions.append(session_info)
+            for session in self._sessions.values()
+        ]
 
         return {
             "status": "ok",
             "total_sessions": len(active_sessions),
             "active_sessions": active_sessions,
+            "scheduled_expiries": len(self._wheel),
+            "created": self._created,
+            "stopped": self._stopped,
+            "stops_forwarded": self._forwarded,
+            "remote_stops": self._remote_stops,
+            "reaped": self._reaped,
             "timestamp": datetime.now().isoformat(),
         }
 
@@ -0,0 +1,202 @@
+"""
+Async tool runtime.
+
+Tools are registered with an async implementation and run through ``run``, which
+applies, per tool:
+
+- a timeout (including time spent waiting for a slot), after which the tool's
+  fallback message is returned and the request moves on;
+- a concurrency limit, so a burst of requests cannot flood a third-party API;
+- a TTL cache of answers (weather for 10 minutes, exchange rates for an hour, ...),
+  keyed by the normalized arguments. Failures and timeouts are never cached.
+
+Nothing here blocks the event loop: network calls go through the pooled async
+HTTP clients and blocking libraries run on the "tools" executor.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config import TOOL_CACHE_SIZE, TOOL_CACHE_TTLS, TOOL_MAX_CONCURRENCY, TOOL_TIMEOUT, TOOL_TIMEOUTS
+from error_handler import ToolErrorHandler
+from human_logging import log_service_status
+
+
+def parse_tool_settings(spec: str) -> Dict[str, float]:
+    """Parse ``"tool=seconds,tool=seconds"`` into a dict (invalid items are ignored)."""
+    settings: Dict[str, float] = {}
+    for item in spec.split(","):
+        tool, _, value = item.strip().rpartition("=")
+        try:
+            if tool:
+                settings[tool.strip()] = float(value)
+        except ValueError:
+            continue
+    return settings
+
+
+@dataclass
+class ToolSpec:
+    """A registered tool and its limits."""
+
+    name: str
+    func: Callable[..., Awaitable[str]]
+    timeout: float
+    ttl: float
+    semaphore: asyncio.Semaphore
+
+
+class _ToolStats:
+    """Counters for one tool."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.total_seconds = 0.0
+
+
+class ToolRuntime:
+    """Runs registered async tools with timeouts, concurrency limits and a TTL cache."""
+
+    def __init__(
+        self,
+        default_timeout: float = TOOL_TIMEOUT,
+        timeouts: Optional[Dict[str, float]] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        max_concurrency: int = TOOL_MAX_CONCURRENCY,
+        cache_size: int = TOOL_CACHE_SIZE,
+    ):
+        """Initialize the runtime.
+
+        Args:
+            default_timeout: Seconds a tool call may take unless overridden in ``timeouts``.
+            timeouts: Per-tool timeouts in seconds.
+            ttls: Per-tool cache lifetimes in seconds (tools not listed are not cached).
+            max_concurrency: Concurrent calls allowed per tool.
+            cache_size: Maximum number of cached answers across tools.
+        """
+        self.default_timeout = default_timeout
+        self.timeouts = timeouts if timeouts is not None else parse_tool_settings(TOOL_TIMEOUTS)
+        self.ttls = ttls if ttls is not None else parse_tool_settings(TOOL_CACHE_TTLS)
+        self.max_concurrency = max_concurrency
+        self._cache: "OrderedDict[Tuple[Any, ...], Tuple[float, str]]" = OrderedDict()
+        self._cache_size = cache_size
+        self._tools: Dict[str, ToolSpec] = {}
+        self._stats: Dict[str, _ToolStats] = {}
+
+    def register(self, name: str, func: Callable[..., Awaitable[str]], max_concurrency: Optional[int] = None) -> None:
+        """Register an async tool implementation under ``name``."""
+        self._tools[name] = ToolSpec(
+            name=name,
+            func=func,
+            timeout=self.timeouts.get(name, self.default_timeout),
+            ttl=self.ttls.get(name, 0.0),
+            semaphore=asyncio.Semaphore(max_concurrency or self.max_concurrency),
+        )
+        self._stats.setdefault(name, _ToolStats())
+
+    @staticmethod
+    def _cache_key(name: str, args: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        """Cache key of a call: tool name plus arguments, strings compared case-insensitively."""
+        return (name,) + tuple(" ".join(arg.lower().split()) if isinstance(arg, str) else arg for arg in args)
+
+    def _get_cached(self, key: Tuple[Any, ...]) -> Optional[str]:
+        """Get a live cached answer, dropping it if it has expired."""
+        item = self._cache.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.time():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return value
+
+    def _set_cached(self, key: Tuple[Any, ...], ttl: float, value: str) -> None:
+        """Cache an answer, evicting the least recently used one when full."""
+        if key in self._cache:
+            self._cache.move_to_end(key)
+        elif len(self._cache) >= self._cache_size:
+            self._cache.popitem(last=False)
+        self._cache[key] = (time.time() + ttl, value)
+
+    async def _call(self, spec: ToolSpec, stats: _ToolStats, args: Tuple[Any, ...]) -> str:
+        """Call a tool once a concurrency slot is free."""
+        async with spec.semaphore:
+            stats.in_flight += 1
+            stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+            try:
+                return await spec.func(*args)
+            finally:
+                stats.in_flight -= 1
+
+    async def run(self, name: str, *args: Any, user_id: str = "", request_id: str = "") -> Tuple[str, bool]:
+        """Run a tool.
+
+        Returns:
+            (answer, failed): the tool's answer, or its fallback message with ``failed`` set
+            on timeout or failure.
+        """
+        spec = self._tools[name]
+        stats = self._stats[name]
+        stats.calls += 1
+
+        key = self._cache_key(name, args)
+        if spec.ttl > 0:
+            cached = self._get_cached(key)
+            if cached is not None:
+                stats.cache_hits += 1
+                return cached, False
+
+        input_data = " ".join(str(arg) for arg in args)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._call(spec, stats, args), timeout=spec.timeout)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            error = TimeoutError(f"Tool '{name}' timed out after {spec.timeout}s")
+            return ToolErrorHandler.handle_tool_error(error, name, user_id, input_data, request_id), True
+        except Exception as e:
+            stats.errors += 1
+            return ToolErrorHandler.handle_tool_error(e, name, user_id, input_data, request_id), True
+        finally:
+            stats.total_seconds += time.perf_counter() - start
+
+        if spec.ttl > 0:
+            self._set_cached(key, spec.ttl, result)
+        return result, False
+
+    def clear_cache(self) -> None:
+        """Drop every cached answer."""
+        self._cache.clear()
+        log_service_status("TOOLS", "info", "Tool answer cache cleared")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-tool call, cache and latency statistics."""
+        tools = {}
+        for name, spec in self._tools.items():
+            stats = self._stats[name]
+            executed = stats.calls - stats.cache_hits
+            tools[name] = {
+                "timeout": spec.timeout,
+                "ttl": spec.ttl,
+                "calls": stats.calls,
+                "cache_hits": stats.cache_hits,
+                "timeouts": stats.timeouts,
+                "errors": stats.errors,
+                "in_flight": stats.in_flight,
+                "max_in_flight": stats.max_in_flight,
+                "avg_ms": round(stats.total_seconds / executed * 1000, 2) if executed else 0.0,
+            }
+        return {"cache_size": len(self._cache), "max_concurrency": self.max_concurrency, "tools": tools}
+
+
+# Global tool runtime instance
+tool_runtime = ToolRuntime()
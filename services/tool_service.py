@@ -2,159 +2,162 @@
 Tool service for handling tool detection and execution.
 """
 
+import asyncio
 import re
 import logging
-from typing import Tuple, Optional, List, Dict, Any
+from typing import Tuple, Optional, List
 
+from config import TOOL_MAX_PARALLEL
 from utilities.ai_tools import (
+    aget_exchange_rate,
+    aget_news,
+    aget_time_from_timeanddate,
+    aget_weather,
+    arun_python_code,
+    aweb_search,
+    awikipedia_search,
     convert_units,
-    get_current_time,
-    get_weather,
-    get_time_from_timeanddate,
-    wikipedia_search,
-    run_python_code,
     get_system_info,
-    get_exchange_rate,
-    get_news,
-    web_search,
 )
 from error_handler import ToolErrorHandler, safe_execute
 from human_logging import log_service_status
+from services.tool_runtime import tool_runtime
+from utilities.tool_router import Route, tool_router
+
+# Compiled once: location extraction for time queries, most specific first
+_TIME_LOCATION_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"current time in ([a-zA-Z ]+)",
+        r"what(?:'s| is) the time in ([a-zA-Z ]+)",
+        r"time(?:\s*(?:in|for|at))?\s+([a-zA-Z ]+)",
+        r"timeanddate\.com.*([a-zA-Z ]+)",
+    )
+]
+_LOCATION_FILLER = re.compile(
+    r"^(?:(?:is|it|what|'s|the|current|now|right|please|tell|me|show|give|provide|can|you|do|does"
+    r"|in|for|at|on|of|about|time)\s+)+",
+    re.IGNORECASE,
+)
+# Where the next question starts in a multi-part message ("weather in Paris and the time in Tokyo")
+_NEXT_CLAUSE = re.compile(r"\s+(?:and|&|plus|also|then)\s+.*$", re.IGNORECASE)
 
 
 class ToolService:
     """Service for handling tool detection and execution."""
 
-    def __init__(self):
-        pass
+    # General news lookups use the news tool; topic news is left to web search
+    _TOPIC_NEWS = re.compile(r"news about|news on|climate change|ai news|technology news", re.IGNORECASE)
 
-    def detect_and_execute_tool(
-        self, user_message: str, user_id: str, request_id: str
-    ) -> Tuple[bool, Optional[str], Optional[str], List[str]]:
+    # Local, cheap and free of side effects: safe to run before knowing whether the answer is needed
+    SPECULATIVE_TOOLS = frozenset({"unit_conversion", "system_info"})
+
+    def __init__(self):
+        self._executors = {
+            "time": self._execute_time_tool,
+            "weather": self._execute_weather_tool,
+            "unit_conversion": self._execute_conversion_tool,
+            "news": self._execute_news_tool,
+            "web_search": self._execute_search_tool,
+            "exchange_rate": self._execute_exchange_rate_tool,
+            "system_info": self._execute_system_info_tool,
+            "python_code_execution": self._execute_python_tool,
+            "wikipedia": self._execute_wikipedia_tool,
+        }
+
+        # Network-bound tools run through the async runtime (timeouts, TTL cache, concurrency limits)
+        tool_runtime.register("time", aget_time_from_timeanddate)
+        tool_runtime.register("weather", aget_weather)
+        tool_runtime.register("news", aget_news)
+        tool_runtime.register("web_search", aweb_search)
+        tool_runtime.register("exchange_rate", aget_exchange_rate)
+        tool_runtime.register("wikipedia", awikipedia_search)
+        tool_runtime.register("python_code_execution", arun_python_code)
+
+    def route(self, user_message: str) -> List[Route]:
+        """Pick the tools for a message, best first (empty when the LLM should answer it)."""
+        return tool_router.route_all(user_message)
+
+    def is_speculative(self, routes: List[Route]) -> bool:
+        """Whether every routed tool may run before a cached answer is ruled out."""
+        return all(route.tool in self.SPECULATIVE_TOOLS for route in routes)
+
+    async def detect_and_execute_tool(
+        self, user_message: str, user_id: str, request_id: str, routes: Optional[List[Route]] = None
+    ) -> Tuple[bool, Optional[str], Optional[str], List[str], bool]:
         """
-        Detect if a tool should be used and execute it.
+        Detect which tools a message needs and execute them, in parallel when there are several.
+
+        Args:
+            routes: Routes already computed for this message (skips routing it again).
 
         Returns:
-            (tool_used, tool_response, tool_name, debug_info)
+            (tool_used, tool_response, tool_name, debug_info, tool_failed); several tools give
+            their answers joined by blank lines and their names joined by "+", and fail when
+            any of them does (the response is then a tool's fallback message).
         """
         debug_info = []
 
-        # Time query detection (with robust patterns)
-        if self._is_time_query(user_message):
-            return self._execute_time_tool(user_message, user_id, request_id, debug_info)
-
-        # Weather query detection
-        elif "weather" in user_message.lower():
-            return self._execute_weather_tool(user_message, user_id, request_id, debug_info)
-
-        # Unit conversion detection
-        elif "convert" in user_message.lower() and "to" in user_message.lower():
-            return self._execute_conversion_tool(user_message, user_id, request_id, debug_info)
-
-        # Other tool detections...
-        # News queries - let web search handle topic-specific news
-        elif "news" in user_message.lower():
-            # Check if it's a topic-specific news query (should go to web search)
-            topic_news_keywords = ["news about", "news on", "climate change", "AI news", "technology news"]
-            if any(keyword in user_message.lower() for keyword in topic_news_keywords):
-                # Let web search handle topic-specific news queries
+        if routes is None:
+            routes = self.route(user_message)
+        selected = []
+        for route in routes[:TOOL_MAX_PARALLEL]:
+            debug_info.append(
+                f"[TOOL] Routed to {route.tool} (confidence {route.confidence:.2f}, matched {list(route.matched)})"
+            )
+            if route.tool == "news" and self._TOPIC_NEWS.search(user_message):
                 debug_info.append("[TOOL] Topic-specific news query - deferring to web search")
-                return False, None, None, debug_info
-            else:
-                # General news lookup
-                return self._execute_news_tool(user_message, user_id, request_id, debug_info)
-
-        elif "search" in user_message.lower():
-            return self._execute_search_tool(user_message, user_id, request_id, debug_info)
-
-        elif "exchange rate" in user_message.lower():
-            return self._execute_exchange_rate_tool(user_message, user_id, request_id, debug_info)
-
-        elif "system info" in user_message.lower():
-            return self._execute_system_info_tool(user_message, user_id, request_id, debug_info)
-
-        elif self._is_python_code_query(user_message):
-            return self._execute_python_tool(user_message, user_id, request_id, debug_info)
-
-        elif "wikipedia" in user_message.lower() or "wiki" in user_message.lower():
-            return self._execute_wikipedia_tool(user_message, user_id, request_id, debug_info)
-
-        # No tool detected
-        return False, None, None, debug_info
-
-    def _is_time_query(self, message: str) -> bool:
-        """Check if the message is a time query."""
-        time_patterns = [
-            r"time(?:\s*(?:in|for|at))?\s+([a-zA-Z ]+)",
-            r"current time in ([a-zA-Z ]+)",
-            r"what(?:'s| is) the time in ([a-zA-Z ]+)",
-            r"timeanddate\.com.*([a-zA-Z ]+)",
-        ]
-
-        for pattern in time_patterns:
-            if re.search(pattern, message, re.IGNORECASE):
-                return True
+                continue
+            selected.append(route.tool)
+        if not selected:
+            return False, None, None, debug_info, False
 
-        return "timeanddate.com" in message.lower() or "time" in message.lower()
-
-    def _is_python_code_query(self, message: str) -> bool:
-        """Check if the message is a Python code execution request."""
-        python_indicators = ["run python", "python code", "```python", "execute python"]
-        return any(indicator in message.lower() for indicator in python_indicators) or message.lower().startswith(
-            "python "
+        results = await asyncio.gather(
+            *(self._executors[tool](user_message, user_id, request_id, debug_info) for tool in selected)
         )
+        if len(results) == 1:
+            return results[0]
+
+        log_service_status("TOOLS", "info", f"Ran {len(results)} tools in parallel: {', '.join(selected)}")
+        response = "\n\n".join(str(result[1]) for result in results)
+        failed = any(result[4] for result in results)
+        return True, response, "+".join(result[2] for result in results), debug_info, failed
 
-    def _execute_time_tool(
+    async def _execute_time_tool(
         self, message: str, user_id: str, request_id: str, debug_info: List[str]
-    ) -> Tuple[bool, str, str, List[str]]:
+    ) -> Tuple[bool, str, str, List[str], bool]:
         """Execute time query tool."""
-        system_msg = (
-            f"[TOOL] Robust time lookup (geo+timezone, fallback to timeanddate.com) triggered for user {user_id}"
-        )
+        system_msg = f"[TOOL] Time lookup (timeanddate.com) triggered for user {user_id}"
         logging.debug(system_msg)
         debug_info.append(system_msg)
 
         # Extract country/location from message
         country = self._extract_location_from_message(message)
 
-        user_response = safe_execute(
-            get_time_from_timeanddate,
-            country,
-            fallback_value=ToolErrorHandler.handle_tool_error(
-                Exception("Time lookup failed"), "time", user_id, country, request_id
-            ),
-            error_handler=lambda e: ToolErrorHandler.handle_tool_error(e, "time", user_id, country, request_id),
-        )
+        user_response, failed = await tool_runtime.run("time", country, user_id=user_id, request_id=request_id)
 
         debug_info.append(f"[TOOL] Used timeanddate.com for {country}")
 
-        return True, user_response, "time", debug_info
+        return True, user_response, "time", debug_info, failed
 
-    def _execute_weather_tool(
+    async def _execute_weather_tool(
         self, message: str, user_id: str, request_id: str, debug_info: List[str]
-    ) -> Tuple[bool, str, str, List[str]]:
+    ) -> Tuple[bool, str, str, List[str], bool]:
         """Execute weather query tool."""
         system_msg = f"[TOOL] Weather lookup triggered for user {user_id}"
         logging.debug(system_msg)
         debug_info.append(system_msg)
 
         match = re.search(r"weather in ([a-zA-Z ]+)", message, re.IGNORECASE)
-        city = match.group(1).strip() if match else "London"
+        city = _NEXT_CLAUSE.sub("", match.group(1)).strip() if match else "London"
 
-        user_response = safe_execute(
-            get_weather,
-            city,
-            fallback_value=ToolErrorHandler.handle_tool_error(
-                Exception("Weather lookup failed"), "weather", user_id, city, request_id
-            ),
-            error_handler=lambda e: ToolErrorHandler.handle_tool_error(e, "weather", user_id, city, request_id),
-        )
+        user_response, failed = await tool_runtime.run("weather", city, user_id=user_id, request_id=request_id)
 
-        return True, user_response, "weather", debug_info
+        return True, user_response, "weather", debug_info, failed
 
-    def _execute_conversion_tool(
+    async def _execute_conversion_tool(
         self, message: str, user_id: str, request_id: str, debug_info: List[str]
-    ) -> Tuple[bool, str, str, List[str]]:
+    ) -> Tuple[bool, str, str, List[str], bool]:
         """Execute unit conversion tool."""
         system_msg = f"[TOOL] Unit conversion triggered for user {user_id}"
         logging.debug(system_msg)
@@ -169,13 +172,7 @@ class ToolService:
                 value,
                 from_unit,
                 to_unit,
-                fallback_value=ToolErrorHandler.handle_tool_error(
-                    Exception("Unit conversion failed"),
-                    "unit_conversion",
-                    user_id,
-                    f"{value} {from_unit} to {to_unit}",
-                    request_id,
-                ),
+                fallback_value=None,
                 error_handler=lambda e: ToolErrorHandler.handle_tool_error(
                     e,
                     "unit_conversion",
@@ -184,14 +181,17 @@ class ToolService:
                     request_id,
                 ),
             )
+            failed = user_response is None
+            if failed:
+                user_response = ToolErrorHandler.fallback_message("unit_conversion")
         else:
-            user_response = "Please specify conversion like 'convert 10 km to m'."
+            user_response, failed = "Please specify conversion like 'convert 10 km to m'.", False
 
-        return True, user_response, "unit_conversion", debug_info
+        return True, user_response, "unit_conversion", debug_info, failed
 
-    def _execute_search_tool(
+    async def _execute_search_tool(
         self, message: str, user_id: str, request_id: str, debug_info: List[str]
-    ) -> Tuple[bool, str, str, List[str]]:
+    ) -> Tuple[bool, str, str, List[str], bool]:
         """Execute web search tool."""
         system_msg = f"[TOOL] Web search triggered for user {user_id}"
         logging.debug(system_msg)
@@ -200,22 +200,13 @@ class ToolService:
         match = re.search(r"search (.+)", message, re.IGNORECASE)
         query = match.group(1) if match else message
 
-        user_response = safe_execute(
-            web_search,
-            query,
-            fallback_value=ToolErrorHandler.handle_tool_error(
-                Exception("Web search failed"), "web_search", user_id, query, request_id
-            ),
-            error_handler=lambda e: ToolErrorHandler.handle_tool_error(
-                e, "web_search", user_id, query, request_id
-            ),
-        )
+        user_response, failed = await tool_runtime.run("web_search", query, user_id=user_id, request_id=request_id)
 
-        return True, user_response, "web_search", debug_info
+        return True, user_response, "web_search", debug_info, failed
 
-    def _execute_news_tool(
+    async def _execute_news_tool(
         self, message: str, user_id: str, request_id: str, debug_info: List[str]
-    ) -> Tuple[bool, str, str, List[str]]:
+    ) -> Tuple[bool, str, str, List[str], bool]:
         """Execute news query tool."""
         system_msg = f"[TOOL] News lookup triggered for user {user_id}"
         logging.debug(system_msg)
@@ -224,22 +215,13 @@ class ToolService:
         match = re.search(r"news (?:about|on) (.+)", message, re.IGNORECASE)
         category = match.group(1) if match else "general"
 
-        user_response = safe_execute(
-            get_news,
-            category,
-            fallback_value=ToolErrorHandler.handle_tool_error(
-                Exception("News lookup failed"), "news", user_id, category, request_id
-            ),
-            error_handler=lambda e: ToolErrorHandler.handle_tool_error(
-                e, "news", user_id, category, request_id
-            ),
-        )
+        user_response, failed = await tool_runtime.run("news", category, user_id=user_id, request_id=request_id)
 
-        return True, user_response, "news", debug_info
+        return True, user_response, "news", debug_info, failed
 
-    def _execute_exchange_rate_tool(
+    async def _execute_exchange_rate_tool(
         self, message: str, user_id: str, request_id: str, debug_info: List[str]
-    ) -> Tuple[bool, str, str, List[str]]:
+    ) -> Tuple[bool, str, str, List[str], bool]:
         """Execute exchange rate tool."""
         system_msg = f"[TOOL] Exchange rate lookup triggered for user {user_id}"
         logging.debug(system_msg)
@@ -249,29 +231,17 @@ class ToolService:
 
         if match:
             from_cur, to_cur = match.group(1).upper(), match.group(2).upper()
-            user_response = safe_execute(
-                get_exchange_rate,
-                from_cur,
-                to_cur,
-                fallback_value=ToolErrorHandler.handle_tool_error(
-                    Exception("Exchange rate lookup failed"),
-                    "exchange_rate",
-                    user_id,
-                    f"{from_cur} to {to_cur}",
-                    request_id,
-                ),
-                error_handler=lambda e: ToolErrorHandler.handle_tool_error(
-                    e, "exchange_rate", user_id, f"{from_cur} to {to_cur}", request_id
-                ),
+            user_response, failed = await tool_runtime.run(
+                "exchange_rate", from_cur, to_cur, user_id=user_id, request_id=request_id
             )
         else:
-            user_response = "Please specify currencies like 'exchange rate USD to EUR'.
+            user_response, failed = "Please specify currencies like 'exchange rate USD to EUR'.", False
 
-        return True, user_response, "exchange_rate", debug_info
+        return True, user_response, "exchange_rate", debug_info, failed
 
-    def _execute_system_info_tool(
+    async def _execute_system_info_tool(
         self, message: str, user_id: str, request_id: str, debug_info: List[str]
-    ) -> Tuple[bool, str, str, List[str]]:
+    ) -> Tuple[bool, str, str, List[str], bool]:
         """Execute system info tool."""
         system_msg = f"[TOOL] System info lookup triggered for user {user_id}"
         logging.debug(system_msg)
@@ -279,19 +249,20 @@ class ToolService:
 
         user_response = safe_execute(
             get_system_info,
-            fallback_value=ToolErrorHandler.handle_tool_error(
-                Exception("System info lookup failed"), "system_info", user_id, "system", request_id
-            ),
+            fallback_value=None,
             error_handler=lambda e: ToolErrorHandler.handle_tool_error(
                 e, "system_info", user_id, "system", request_id
             ),
         )
+        failed = user_response is None
+        if failed:
+            user_response = ToolErrorHandler.fallback_message("system_info")
 
-        return True, user_response, "system_info", debug_info
+        return True, user_response, "system_info", debug_info, failed
 
-    def _execute_python_tool(
+    async def _execute_python_tool(
         self, message: str, user_id: str, request_id: str, debug_info: List[str]
-    ) -> Tuple[bool, str, str, List[str]]:
+    ) -> Tuple[bool, str, str, List[str], bool]:
         """Execute Python code execution tool."""
         system_msg = f"[TOOL] Python code execution triggered for user {user_id}"
         logging.debug(system_msg)
@@ -301,28 +272,17 @@ class ToolService:
         code = self._extract_python_code(message)
 
         if not code:
-            user_response = "Please provide Python code to execute, e.g., using ```python ... ```."
+            user_response, failed = "Please provide Python code to execute, e.g., using ```python ... ```.", False
         else:
-            user_response = safe_execute(
-                run_python_code,
-                code,
-                fallback_value=ToolErrorHandler.handle_tool_error(
-                    Exception("Python execution failed"),
-                    "python_code_execution",
-                    user_id,
-                    "code",
-                    request_id,
-                ),
-                error_handler=lambda e: ToolErrorHandler.handle_tool_error(
-                    e, "python_code_execution", user_id, "code", request_id
-                ),
+            user_response, failed = await tool_runtime.run(
+                "python_code_execution", code, user_id=user_id, request_id=request_id
             )
 
-        return True, user_response, "python_code_execution", debug_info
+        return True, user_response, "python_code_execution", debug_info, failed
 
-    def _execute_wikipedia_tool(
+    async def _execute_wikipedia_tool(
         self, message: str, user_id: str, request_id: str, debug_info: List[str]
-    ) -> Tuple[bool, str, str, List[str]]:
+    ) -> Tuple[bool, str, str, List[str], bool]:
         """Execute Wikipedia search tool."""
         system_msg = f"[TOOL] Wikipedia search triggered for user {user_id}"
         logging.debug(system_msg)
@@ -331,43 +291,20 @@ class ToolService:
         # Extract search query
         query = message.lower().replace("wikipedia", "").replace("wiki", "").replace("search", "").strip()
         if not query:
-            user_response = "Please provide a topic to search on Wikipedia."
+            user_response, failed = "Please provide a topic to search on Wikipedia.", False
         else:
-            user_response = safe_execute(
-                wikipedia_search,
-                query,
-                fallback_value=ToolErrorHandler.handle_tool_error(
-                    Exception("Wikipedia search failed"), "wikipedia", user_id, query, request_id
-                ),
-                error_handler=lambda e: ToolErrorHandler.handle_tool_error(
-                    e, "wikipedia", user_id, query, request_id
-                ),
-            )
+            user_response, failed = await tool_runtime.run("wikipedia", query, user_id=user_id, request_id=request_id)
 
-        return True, user_response, "wikipedia", debug_info
+        return True, user_response, "wikipedia", debug_info, failed
 
     def _extract_location_from_message(self, message: str) -> str:
         """Extract location/country from time query message."""
-        time_patterns = [
-            r"time(?:\s*(?:in|for|at))?\s+([a-zA-Z ]+)",
-            r"current time in ([a-zA-Z ]+)",
-            r"what(?:'s| is) the time in ([a-zA-Z ]+)",
-            r"timeanddate\.com.*([a-zA-Z ]+)",
-        ]
-
-        for pattern in time_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
+        for pattern in _TIME_LOCATION_PATTERNS:
+            match = pattern.search(message)
             if match:
-                country = match.group(1).strip()
                 # Clean up extracted location string
-                country = re.sub(
-                    r"^(is|what|'s|the|current|now|please|tell|me|show|give|provide|can|you|do|does|in|for|at|on|of|about|time|current time|the time)\s+",
-                    "",
-                    country,
-                    flags=re.IGNORECASE,
-                )
-                country = country.strip()
-                country = re.sub(r"\?$", "", country).strip()
+                country = _LOCATION_FILLER.sub("", match.group(1).strip()).strip()
+                country = _NEXT_CLAUSE.sub("", country).rstrip("?").strip()
                 if country:
                     return country
 
@@ -0,0 +1,511 @@
+"""
+Write-behind queue for post-response persistence.
+
+Writes that only matter for later requests (the chat history turn, conversations
+kept as long-term memories) are queued instead of awaited, so a chat response is
+returned as soon as it is generated. Jobs are appended to a Redis stream and
+drained by a small pool of workers through a consumer group:
+
+- jobs of the same kind are handled as a batch, so memories queued by different
+  users are chunked and embedded in one encode pass and upserted in one call;
+- failed jobs are retried with exponential backoff, then moved to a dead-letter
+  stream;
+- a job is only acknowledged once written, so jobs of a worker that died are
+  claimed again by the survivors (or after a restart);
+- chat turns are numbered per chat as they are queued and appended in that order,
+  whichever worker takes them (see ``_append_chat_turns``).
+
+When Redis is unavailable jobs fall back to an in-process queue (not durable).
+Best-effort writes such as response cache updates use ``defer`` and simply run
+in the background.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import redis
+
+from config import (
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_DEDUPE_TTL,
+    WRITE_BEHIND_ENABLED,
+    WRITE_BEHIND_MAX_ATTEMPTS,
+    WRITE_BEHIND_MAXLEN,
+    WRITE_BEHIND_RECLAIM_IDLE,
+    WRITE_BEHIND_RETRY_DELAY,
+    WRITE_BEHIND_STREAM,
+    WRITE_BEHIND_WORKERS,
+)
+from human_logging import log_service_status
+from utilities.chat_history import SKIP_TURN_SCRIPT, applied_sequence_key, sequence_key
+from utilities.executors import run_in_executor
+
+# A handler takes the payloads of a batch, their stream entry ids (None for in-process jobs) and whether this
+# is the last attempt, and returns the indexes that still need a retry (raising = all of them)
+Handler = Callable[[List[Dict[str, Any]], List[Optional[str]], bool], Awaitable[List[int]]]
+
+# A queued job as (stream entry id or None for in-process jobs, {"kind", "payload"})
+Entry = Tuple[Optional[str], Dict[str, Any]]
+
+GROUP = "writers"
+
+# KEYS: stream, counter, applied sequence. ARGV: job, stream maxlen, counter TTL.
+# Queues a job numbered by the counter; a counter that starts over also restarts the applied sequence.
+SEQUENCED_XADD_SCRIPT = """
+local sequence = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+if sequence == 1 then
+    redis.call('DEL', KEYS[3])
+end
+return redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[2], '*', 'job', ARGV[1], 'seq', sequence)
+"""
+
+
+class WriteBehindQueue:
+    """Durable queue of post-response writes, drained by background workers."""
+
+    def __init__(
+        self,
+        stream: str = WRITE_BEHIND_STREAM,
+        workers: int = WRITE_BEHIND_WORKERS,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        max_attempts: int = WRITE_BEHIND_MAX_ATTEMPTS,
+        retry_delay: float = WRITE_BEHIND_RETRY_DELAY,
+        reclaim_idle: float = WRITE_BEHIND_RECLAIM_IDLE,
+        maxlen: int = WRITE_BEHIND_MAXLEN,
+        enabled: bool = WRITE_BEHIND_ENABLED,
+    ):
+        """Initialize the queue with sizing from config.py."""
+        self.stream = stream
+        self.dead_letter_stream = f"{stream}:dead"
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.reclaim_idle_ms = int(reclaim_idle * 1000)
+        self.maxlen = maxlen
+        self.enabled = enabled
+
+        self._handlers: Dict[str, Handler] = {
+            "chat_turn": self._append_chat_turns,
+            "memory": self._store_memories,
+        }
+        self._redis: Any = None
+        self._local: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._deferred: Set[asyncio.Task] = set()
+        self._consumer = f"{socket.gethostname()}-{os.getpid()}"
+        self._stopping = False
+
+        self._enqueued = 0
+        self._local_fallbacks = 0
+        self._completed = 0
+        self._retries = 0
+        self._dead_lettered = 0
+        self._reclaimed = 0
+        self._batches = 0
+        self._batched_jobs = 0
+        self._memory_chunks_embedded = 0
+        self._memory_encode_calls = 0
+        self._deferred_failures = 0
+        self._lag_total = 0.0
+
+    async def start(self, redis_client: Any = None) -> None:
+        """Start the workers, using the Redis stream when a client is given."""
+        if not self.enabled or self._tasks:
+            return
+        self._stopping = False
+        if redis_client is not None:
+            try:
+                await redis_client.xgroup_create(self.stream, GROUP, id="0", mkstream=True)
+            except redis.ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    log_service_status("WRITE_BEHIND", "warning", f"Could not create consumer group: {e}")
+                    redis_client = None
+            except redis.RedisError as e:
+                log_service_status("WRITE_BEHIND", "warning", f"Redis unavailable, using in-process queue: {e}")
+                redis_client = None
+        self._redis = redis_client
+
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        if self._redis is not None:
+            self._tasks.append(asyncio.create_task(self._reclaimer()))
+        mode = f"stream '{self.stream}'" if self._redis is not None else "in-process queue"
+        log_service_status("WRITE_BEHIND", "ready", f"Started {self.workers} write-behind workers on {mode}")
+
+    def attach_redis(self, redis_client: Any) -> None:
+        """Move a queue running on the Redis stream to a new client (after a reconnect)."""
+        if self._redis is not None and redis_client is not None:
+            self._redis = redis_client
+
+    async def enqueue(self, kind: str, payload: Dict[str, Any]) -> None:
+        """Queue a write. With write-behind disabled (or not started) the write runs inline."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown write-behind job kind: {kind}")
+        job = {"kind": kind, "payload": payload, "queued_at": time.time()}
+
+        if not self.enabled or not self._tasks:
+            # Inline writes get one attempt, like the direct calls they replace
+            if await self._handlers[kind]([payload], [None], True):
+                log_service_status("WRITE_BEHIND", "warning", f"Inline '{kind}' write failed")
+            return
+
+        self._enqueued += 1
+        if self._redis is not None:
+            try:
+                if kind == "chat_turn":
+                    chat_id = payload["chat_id"]
+                    await self._redis.eval(
+                        SEQUENCED_XADD_SCRIPT,
+                        3,
+                        self.stream,
+                        sequence_key(chat_id),
+                        applied_sequence_key(chat_id),
+                        json.dumps(job),
+                        self.maxlen,
+                        WRITE_BEHIND_DEDUPE_TTL,
+                    )
+                else:
+                    await self._redis.xadd(
+                        self.stream, {"job": json.dumps(job)}, maxlen=self.maxlen, approximate=True
+                    )
+                return
+            except redis.RedisError as e:
+                log_service_status("WRITE_BEHIND", "warning", f"Stream append failed, queueing in-process: {e}")
+        self._local_fallbacks += 1
+        self._local.put_nowait(job)
+
+    async def defer(self, coro: Awaitable[Any]) -> None:
+        """Run a best-effort write (e.g. a cache update) in the background."""
+        if not self.enabled:
+            await self._guard(coro)
+            return
+        task = asyncio.create_task(self._guard(coro))
+        self._deferred.add(task)
+        task.add_done_callback(self._deferred.discard)
+
+    async def _guard(self, coro: Awaitable[Any]) -> None:
+        """Await a deferred write, logging instead of raising on failure."""
+        try:
+            await coro
+        except Exception as e:
+            self._deferred_failures += 1
+            log_service_status("WRITE_BEHIND", "warning", f"Deferred write failed: {e}")
+
+    async def _worker(self, index: int) -> None:
+        """Drain batches until shutdown."""
+        consumer = f"{self._consumer}-{index}"
+        while not self._stopping:
+            try:
+                entries = await self._next_batch(consumer)
+                if entries:
+                    await self._process(entries)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log_service_status("WRITE_BEHIND", "error", f"Worker {index} error: {e}")
+                await asyncio.sleep(self.retry_delay)
+
+    async def _next_batch(self, consumer: str) -> List[Entry]:
+        """Take up to ``batch_size`` jobs, preferring in-process fallbacks over the stream."""
+        entries: List[Entry] = []
+        while len(entries) < self.batch_size and not self._local.empty():
+            entries.append((None, self._local.get_nowait()))
+        if entries:
+            return entries
+
+        if self._redis is None:
+            entries.append((None, await self._local.get()))
+            while len(entries) < self.batch_size and not self._local.empty():
+                entries.append((None, self._local.get_nowait()))
+            return entries
+
+        # Block well under the client's socket timeout
+        response = await self._redis.xreadgroup(
+            GROUP, consumer, {self.stream: ">"}, count=self.batch_size, block=1000
+        )
+        for _, messages in response or []:
+            entries.extend(self._decode(messages))
+        return entries
+
+    def _decode(self, messages: List[Tuple[str, Dict[str, str]]]) -> List[Entry]:
+        """Decode stream messages into entries (undecodable ones are kept for dead-lettering)."""
+        entries: List[Entry] = []
+        for entry_id, fields in messages:
+            try:
+                job = json.loads(fields["job"])
+                if "seq" in fields:
+                    job["payload"]["sequence"] = int(fields["seq"])
+            except (KeyError, TypeError, ValueError):
+                job = {"kind": "invalid", "payload": {"raw": fields}}
+            entries.append((entry_id, job))
+        return entries
+
+    async def _process(self, entries: List[Entry]) -> None:
+        """Run a batch, grouped by job kind."""
+        self._batches += 1
+        self._batched_jobs += len(entries)
+        now = time.time()
+        for _, job in entries:
+            self._lag_total += max(0.0, now - float(job.get("queued_at", now)))
+
+        groups: Dict[str, List[Entry]] = defaultdict(list)
+        for entry in entries:
+            groups[entry[1].get("kind", "invalid")].append(entry)
+        await asyncio.gather(*(self._run_group(kind, group) for kind, group in groups.items()))
+
+    async def _run_group(self, kind: str, group: List[Entry]) -> None:
+        """Run the handler for one kind, retrying failed jobs with backoff, then acknowledge them."""
+        handler = self._handlers.get(kind)
+        if handler is None:
+            await self._dead_letter(group, f"unknown job kind '{kind}'")
+            return
+
+        remaining = group
+        error = ""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                payloads = [job["payload"] for _, job in remaining]
+                failed = await handler(payloads, [entry_id for entry_id, _ in remaining], attempt == self.max_attempts)
+                error = "handler reported failure"
+            except Exception as e:
+                failed = list(range(len(remaining)))
+                error = str(e)
+
+            failed_set = set(failed)
+            self._completed += len(remaining) - len(failed_set)
+            await self._ack([entry_id for i, (entry_id, _) in enumerate(remaining) if i not in failed_set])
+            remaining = [remaining[i] for i in sorted(failed_set)]
+            if not remaining:
+                return
+            if attempt < self.max_attempts:
+                self._retries += len(remaining)
+                log_service_status(
+                    "WRITE_BEHIND",
+                    "warning",
+                    f"{len(remaining)} '{kind}' job(s) failed (attempt {attempt}/{self.max_attempts}): {error}",
+                )
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+        await self._dead_letter(remaining, error)
+
+    async def _ack(self, entry_ids: List[Optional[str]]) -> None:
+        """Acknowledge and remove finished stream entries in one round trip."""
+        ids = [entry_id for entry_id in entry_ids if entry_id is not None]
+        if not ids or self._redis is None:
+            return
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            pipe.xack(self.stream, GROUP, *ids)
+            pipe.xdel(self.stream, *ids)
+            await pipe.execute()
+        except redis.RedisError as e:
+            # Unacknowledged entries are reclaimed and re-run: chat turns are deduplicated by entry id,
+            # memories are upserted under content-derived ids
+            log_service_status("WRITE_BEHIND", "warning", f"Acknowledge failed for {len(ids)} job(s): {e}")
+
+    async def _dead_letter(self, entries: List[Entry], error: str) -> None:
+        """Give up on jobs: keep them in the dead-letter stream for inspection."""
+        self._dead_lettered += len(entries)
+        log_service_status(
+            "WRITE_BEHIND", "error", f"Giving up on {len(entries)} job(s) after {self.max_attempts} attempts: {error}"
+        )
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline(transaction=False)
+                for _, job in entries:
+                    pipe.xadd(
+                        self.dead_letter_stream,
+                        {"job": json.dumps(job), "error": error[:500]},
+                        maxlen=self.maxlen,
+                        approximate=True,
+                    )
+                    payload = job.get("payload")
+                    if job.get("kind") == "chat_turn" and isinstance(payload, dict) and payload.get("sequence"):
+                        # Later turns of the chat stop waiting for a turn given up on
+                        pipe.eval(
+                            SKIP_TURN_SCRIPT,
+                            1,
+                            applied_sequence_key(payload["chat_id"]),
+                            payload["sequence"],
+                            WRITE_BEHIND_DEDUPE_TTL,
+                        )
+                await pipe.execute()
+            except redis.RedisError as e:
+                log_service_status("WRITE_BEHIND", "warning", f"Dead-letter write failed: {e}")
+        await self._ack([entry_id for entry_id, _ in entries])
+
+    async def _reclaimer(self) -> None:
+        """Periodically take over jobs left unacknowledged by a dead worker (including before a restart)."""
+        consumer = f"{self._consumer}-reclaim"
+        while not self._stopping:
+            try:
+                pending = await self._redis.xpending_range(
+                    self.stream, GROUP, min="-", max="+", count=self.batch_size, idle=self.reclaim_idle_ms
+                )
+                if pending:
+                    exhausted = [p["message_id"] for p in pending if p["times_delivered"] > self.max_attempts]
+                    claimed = await self._redis.xclaim(
+                        self.stream, GROUP, consumer, self.reclaim_idle_ms, [p["message_id"] for p in pending]
+                    )
+                    # Entries deleted after a late acknowledgement come back without fields
+                    await self._ack([entry_id for entry_id, fields in claimed if not fields])
+                    entries = self._decode([message for message in claimed if message[1]])
+                    self._reclaimed += len(entries)
+                    dead = [entry for entry in entries if entry[0] in exhausted]
+                    if dead:
+                        await self._dead_letter(dead, "redelivered too many times")
+                    live = [entry for entry in entries if entry[0] not in exhausted]
+                    if live:
+                        await self._process(live)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log_service_status("WRITE_BEHIND", "warning", f"Reclaim failed: {e}")
+            await asyncio.sleep(max(1.0, self.reclaim_idle_ms / 2000))
+
+    async def _append_chat_turns(
+        self, payloads: List[Dict[str, Any]], entry_ids: List[Optional[str]], last_attempt: bool
+    ) -> List[int]:
+        """Append queued chat turns to their histories.
+
+        Chats are written concurrently, the turns of one chat in order: a turn from the stream
+        carries its number among the chat's queued turns and waits until the earlier ones were
+        appended or given up on, whichever worker holds them. Each turn is applied at most once
+        per stream entry id, so a redelivered job is not appended twice.
+
+        On the last attempt turns no longer wait (an earlier turn that is still pending has
+        outlived the whole retry schedule, e.g. its worker died, and is appended late) and a
+        failed turn does not hold back the chat's later turns.
+        """
+        from database_manager import append_chat_turn
+
+        by_chat: Dict[str, List[int]] = defaultdict(list)
+        for i, p in enumerate(payloads):
+            by_chat[p["chat_id"]].append(i)
+
+        async def append_in_order(indexes: List[int]) -> List[int]:
+            failed: List[int] = []
+            for position, i in enumerate(indexes):
+                p = payloads[i]
+                try:
+                    appended = await append_chat_turn(
+                        p["chat_id"],
+                        p["user_message"],
+                        p["assistant_response"],
+                        p.get("timestamp"),
+                        entry_ids[i],
+                        p.get("partial", False),
+                        p.get("sequence"),
+                        ordered=not last_attempt,
+                    )
+                except Exception:
+                    appended = False
+                if appended is not True:
+                    if not last_attempt:
+                        # The chat's later turns are retried with this one
+                        return indexes[position:]
+                    failed.append(i)
+            return failed
+
+        results = await asyncio.gather(*(append_in_order(indexes) for indexes in by_chat.values()))
+        return sorted(i for failed in results for i in failed)
+
+    async def _store_memories(
+        self, payloads: List[Dict[str, Any]], entry_ids: List[Optional[str]], last_attempt: bool
+    ) -> List[int]:
+        """Chunk, embed (one encode for the whole batch) and upsert conversations kept as memories."""
+        from database_manager import db_manager
+        from services.ingestion_service import IngestionService
+        from utilities.ai_tools import chunk_text
+
+        if db_manager is None or db_manager.chroma_collection is None or not db_manager.is_embeddings_available():
+            raise RuntimeError("ChromaDB or embeddings not available for memory storage")
+
+        ids: List[str] = []
+        seen: Set[str] = set()
+        documents: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        for p in payloads:
+            for i, chunk in enumerate(chunk_text(p["text"], 1000, 200)):
+                # Same content-addressed ids as document ingestion, so both paths agree on a chunk's id
+                chunk_id = IngestionService.chunk_id(p["doc_id"], chunk)
+                if chunk_id in seen:
+                    continue  # Repeated text (one upsert cannot carry an id twice)
+                seen.add(chunk_id)
+                ids.append(chunk_id)
+                documents.append(chunk)
+                metadatas.append({"user_id": p["user_id"], "doc_id": p["doc_id"], "source": p["name"], "chunk_index": i})
+        if not ids:
+            return []
+
+        embeddings = await db_manager.encode_chunks(documents)
+        self._memory_encode_calls += 1
+        self._memory_chunks_embedded += len(documents)
+
+        # Upserts with content-derived ids keep retries and redeliveries idempotent
+        await run_in_executor(
+            "chroma",
+            db_manager.chroma_collection.upsert, embeddings=embeddings, documents=documents, metadatas=metadatas, ids=ids
+        )
+        await run_in_executor("chroma", db_manager.vector_index.upsert, ids, embeddings, documents, metadatas)
+        for user_id in {p["user_id"] for p in payloads}:
+            db_manager.memory_changed(user_id)
+        log_service_status(
+            "WRITE_BEHIND", "info", f"Stored {len(payloads)} memories ({len(ids)} chunks) in one embedding batch"
+        )
+        return []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue statistics."""
+        return {
+            "enabled": self.enabled,
+            "mode": "stream" if self._redis is not None else "in-process",
+            "stream": self.stream,
+            "workers": self.workers,
+            "enqueued": self._enqueued,
+            "local_fallbacks": self._local_fallbacks,
+            "local_queue_depth": self._local.qsize(),
+            "completed": self._completed,
+            "retries": self._retries,
+            "dead_lettered": self._dead_lettered,
+            "reclaimed": self._reclaimed,
+            "batches": self._batches,
+            "avg_batch_size": round(self._batched_jobs / self._batches, 2) if self._batches else 0.0,
+            "avg_queue_lag_ms": round(self._lag_total / self._batched_jobs * 1000, 2) if self._batched_jobs else 0.0,
+            "memory_encode_calls": self._memory_encode_calls,
+            "memory_chunks_embedded": self._memory_chunks_embedded,
+            "deferred_in_flight": len(self._deferred),
+            "deferred_failures": self._deferred_failures,
+        }
+
+    async def shutdown(self, timeout: float = 5.0) -> None:
+        """Drain in-process jobs and deferred writes (for up to ``timeout``), then stop the workers.
+
+        Unacknowledged stream jobs stay pending and are claimed again after a restart.
+        """
+        deadline = time.monotonic() + timeout
+        while self._tasks and not self._local.empty() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._deferred:
+            await asyncio.wait(list(self._deferred), timeout=max(0.0, deadline - time.monotonic()))
+
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if not self._local.empty():
+            log_service_status(
+                "WRITE_BEHIND", "warning", f"Dropping {self._local.qsize()} in-process job(s) at shutdown"
+            )
+
+
+# Global write-behind queue instance
+write_behind_queue = WriteBehindQueue()
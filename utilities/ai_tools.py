@@ -22,9 +22,12 @@ import httpx
 from human_logging import log_service_status
 import wikipedia
 from bs4 import BeautifulSoup
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from RestrictedPython import compile_restricted
 
+from utilities.executors import run_in_executor
+from utilities.http_client_pool import http_client_pool
+from utilities.text_chunker import get_text_splitter
+
 
 def get_current_time(timezone: Optional[str] = None) -> str:
     """TODO: Add proper docstring for get_current_time."""
@@ -56,12 +59,7 @@ def get_weather_weatherapi(city: str = "London") -> str:
         logging.debug(f"[WeatherAPI] Response: {data}")
         if resp.status_code != 200 or "error" in data:
             return f"WeatherAPI.com error: {data.get('error', {}).get('message', 'Unknown error')}"
-        c = data["current"]
-        loc = data["location"]
-        return (
-            f"Weather in {loc['name']}, {loc['country']}: {c['temp_c']}°C, "
-            f"{c['condition']['text']}, wind {c['wind_kph']} kph, humidity {c['humidity']}%"
-        )
+        return _format_weatherapi(data)
     except Exception as e:
         logging.error(f"[WeatherAPI] Exception: {e}")
         return f"WeatherAPI.com lookup failed: {e}"
@@ -93,13 +91,28 @@ def get_weather(city: str = "London") -> str:
             )
             weather = weather_resp.json()
         logging.debug(f"[WeatherTool] Open-Meteo weather response: {weather}")
-        w = weather.get("current_weather", {})
-        return f"Weather in {city}: {w.get('temperature', '?')}°C, wind {w.get('windspeed', '?')} km/h, code {w.get('weathercode', '?')}"
+        return _format_open_meteo(city, weather)
     except Exception as e:
         logging.error(f"[WeatherTool] Error fetching weather for {city}: {e}")
         return f"Error fetching weather for {city}: {e}"
 
 
+def _format_weatherapi(data: dict) -> str:
+    """Format a WeatherAPI.com current-conditions response."""
+    c = data["current"]
+    loc = data["location"]
+    return (
+        f"Weather in {loc['name']}, {loc['country']}: {c['temp_c']}°C, "
+        f"{c['condition']['text']}, wind {c['wind_kph']} kph, humidity {c['humidity']}%"
+    )
+
+
+def _format_open_meteo(city: str, weather: dict) -> str:
+    """Format an Open-Meteo current_weather response."""
+    w = weather.get("current_weather", {})
+    return f"Weather in {city}: {w.get('temperature', '?')}°C, wind {w.get('windspeed', '?')} km/h, code {w.get('weathercode', '?')}"
+
+
 # --- Tool: Text Chunking ---
 def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
     """
@@ -114,12 +127,7 @@ def chunk_text(text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> L
         List of text chunks
     """
     try:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""],
-        )
+        text_splitter = get_text_splitter(chunk_size, chunk_overlap)
         chunks = text_splitter.split_text(text)
         logging.debug(f"[CHUNKING] Created {len(chunks)} chunks from text of length {len(text)}")
         return chunks
@@ -242,63 +250,67 @@ def get_time_from_timeanddate(location: str) -> str:
         String with current time and location
     """
     try:
-        # Clean up location name for URL
-        location_clean = location.strip().lower().replace(" ", "-")
-
-        # Map some common locations to timeanddate.com format
-        location_mappings = {
-            "netherlands": "netherlands/amsterdam",
-            "amsterdam": "netherlands/amsterdam",
-            "london": "uk/london",
-            "new-york": "usa/new-york",
-            "tokyo": "japan/tokyo",
-            "paris": "france/paris",
-            "berlin": "germany/berlin",
-            "moscow": "russia/moscow",
-            "sydney": "australia/sydney",
-        }
-
-        location_url = location_mappings.get(location_clean, f"world/{location_clean}")
-        url = f"https://www.timeanddate.com/worldclock/{location_url}"
-
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-
         with httpx.Client(timeout=10) as client:
-            response = client.get(url, headers=headers)
+            response = client.get(_timeanddate_url(location), headers=_TIMEANDDATE_HEADERS)
             response.raise_for_status()
+        return _parse_timeanddate(location, response.content)
 
-        # Parse HTML to extract time
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        # Look for time elements (timeanddate.com uses specific IDs/classes)
-        time_element = soup.find("span", {"id": "ct"}) or soup.find("span", class_="h1")
-
-        if time_element:
-            current_time = time_element.get_text().strip()
-            return f"Current time in {location}: {current_time} (via timeanddate.com)"
-        else:
-            # Fallback: look for any time-like text
-            time_patterns = [
-                r"\d{1,2}:\d{2}:\d{2}",
-                r"\d{1,2}:\d{2}\s*(AM|PM)",
-            ]
-
-            page_text = soup.get_text()
-            for pattern in time_patterns:
-                matches = re.findall(pattern, page_text, re.IGNORECASE)
-                if matches:
-                    return "Current time in {location}: {matches[0]} (via timeanddate.com)"
-
-            return "Could not extract time for {location} from timeanddate.com"
-
-    except httpx.RequestError:
-        logging.error("[TIMEANDDATE] Network error for {location}: {e}")
-        return "Network error getting time for {location}: {e}"
-    except Exception:
-        logging.error("[TIMEANDDATE] Error getting time for {location}: {e}")
-        return "Error getting time for {location}: {e}"
+    except httpx.RequestError as e:
+        logging.error(f"[TIMEANDDATE] Network error for {location}: {e}")
+        return f"Network error getting time for {location}: {e}"
+    except Exception as e:
+        logging.error(f"[TIMEANDDATE] Error getting time for {location}: {e}")
+        return f"Error getting time for {location}: {e}"
+
+
+_TIMEANDDATE_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+}
+
+# Map some common locations to timeanddate.com format
+_TIMEANDDATE_LOCATIONS = {
+    "netherlands": "netherlands/amsterdam",
+    "amsterdam": "netherlands/amsterdam",
+    "london": "uk/london",
+    "new-york": "usa/new-york",
+    "tokyo": "japan/tokyo",
+    "paris": "france/paris",
+    "berlin": "germany/berlin",
+    "moscow": "russia/moscow",
+    "sydney": "australia/sydney",
+}
+
+
+def _timeanddate_url(location: str) -> str:
+    """World clock URL of a location on timeanddate.com."""
+    # Clean up location name for URL
+    location_clean = location.strip().lower().replace(" ", "-")
+    location_url = _TIMEANDDATE_LOCATIONS.get(location_clean, f"world/{location_clean}")
+    return f"https://www.timeanddate.com/worldclock/{location_url}"
+
+
+def _parse_timeanddate(location: str, content: bytes) -> str:
+    """Extract the current time from a timeanddate.com world clock page."""
+    soup = BeautifulSoup(content, "html.parser")
+
+    # Look for time elements (timeanddate.com uses specific IDs/classes)
+    time_element = soup.find("span", {"id": "ct"}) or soup.find("span", class_="h1")
+    if time_element:
+        current_time = time_element.get_text().strip()
+        return f"Current time in {location}: {current_time} (via timeanddate.com)"
+
+    # Fallback: look for any time-like text
+    time_patterns = [
+        r"\d{1,2}:\d{2}:\d{2}",
+        r"\d{1,2}:\d{2}\s*(?:AM|PM)",
+    ]
+    page_text = soup.get_text()
+    for pattern in time_patterns:
+        matches = re.findall(pattern, page_text, re.IGNORECASE)
+        if matches:
+            return f"Current time in {location}: {matches[0]} (via timeanddate.com)"
+
+    return f"Could not extract time for {location} from timeanddate.com"
 
 
 # --- Tool: Wikipedia Search ---
@@ -313,6 +325,15 @@ def wikipedia_search(query: str, sentences: int = 3) -> str:
     Returns:
         Wikipedia summary text
     """
+    try:
+        return _wikipedia_summary(query, sentences)
+    except Exception as e:
+        logging.error(f"[WIKIPEDIA] Error searching for {query}: {e}")
+        return f"Error searching Wikipedia for '{query}': {e}"
+
+
+def _wikipedia_summary(query: str, sentences: int) -> str:
+    """Look up a Wikipedia summary; raises on network errors."""
     try:
         # Search for the topic
         search_results = wikipedia.search(query, results=3)
@@ -335,9 +356,6 @@ def wikipedia_search(query: str, sentences: int = 3) -> str:
             return f"Multiple results found for '{query}'. Be more specific."
     except wikipedia.exceptions.PageError:
         return f"No Wikipedia page found for '{query}'"
-    except Exception as e:
-        logging.error(f"[WIKIPEDIA] Error searching for {query}: {e}")
-        return f"Error searching Wikipedia for '{query}': {e}"
 
 
 # --- Tool: Python Code Execution (Safe) ---
@@ -466,29 +484,35 @@ def web_search(query: str, num_results: int = 5) -> str:
     Returns:
         Search results or error message"""
     try:
+        with httpx.Client(timeout=10) as client:
+            response = client.get(_duckduckgo_url(query), headers=_DUCKDUCKGO_HEADERS)
+            data = response.json()
+        return _format_duckduckgo(query, data)
 
-        # Use DuckDuckGo Instant Answer API as a simple search
-        encoded_query = urllib.parse.quote_plus(query)
-        url = f"https://api.duckduckgo.com/?q={encoded_query}&format=json&no_html=1&skip_disambig=1"
+    except Exception as e:
+        return f"Web search unavailable: {str(e)}"
 
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) \
-                Chrome/91.0.4472.124 Safari/537.36"
-        }
 
-        with httpx.Client(timeout=10) as client:
-            response = client.get(url, headers=headers)
-            data = response.json()
+_DUCKDUCKGO_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/91.0.4472.124 Safari/537.36"
+}
 
-        if data.get("AbstractText"):
-            return "Search result for '{query}': {data['AbstractText']}"
-        elif data.get("Definition"):
-            return "Definition for '{query}': {data['Definition']}"
-        else:
-            return "No detailed results found for '{query}'. Try a more specific search."
 
-    except Exception:
-        return "Web search unavailable: {str(e)}"
+def _duckduckgo_url(query: str) -> str:
+    """DuckDuckGo Instant Answer API URL (used as a simple search)."""
+    encoded_query = urllib.parse.quote_plus(query)
+    return f"https://api.duckduckgo.com/?q={encoded_query}&format=json&no_html=1&skip_disambig=1"
+
+
+def _format_duckduckgo(query: str, data: dict) -> str:
+    """Format an Instant Answer API response."""
+    if data.get("AbstractText"):
+        return f"Search result for '{query}': {data['AbstractText']}"
+    elif data.get("Definition"):
+        return f"Definition for '{query}': {data['Definition']}"
+    else:
+        return f"No detailed results found for '{query}'. Try a more specific search."
 
 
 def get_news(category: str = "general", country: str = "us") -> str:
@@ -506,11 +530,11 @@ def get_news(category: str = "general", country: str = "us") -> str:
         # For demo purposes, return a placeholder
         # In production, you would integrate with a news API like NewsAPI
         return (
-            "News lookup is currently unavailable. Would you like me to search the web for '{category}' news instead?"
+            f"News lookup is currently unavailable. Would you like me to search the web for '{category}' news instead?"
         )
 
-    except Exception:
-        return "News service error: {str(e)}"
+    except Exception as e:
+        return f"News service error: {str(e)}"
 
 
 def get_exchange_rate(from_currency: str, to_currency: str, amount: float = 1.0) -> str:
@@ -525,22 +549,30 @@ def get_exchange_rate(from_currency: str, to_currency: str, amount: float = 1.0)
         Exchange rate information or error message
     """
     try:  # Use a free exchange rate API
-        url = f"https://api.exchangerate-api.com/v4/latest/{from_currency.upper()}"
         with httpx.Client(timeout=10) as client:
-            response = client.get(url)
+            response = client.get(_exchange_rate_url(from_currency))
             data = response.json()
-
-        if to_currency.upper() in data["rates"]:
-            rate = data["rates"][to_currency.upper()]
-            converted_amount = amount * rate
-            return f"{amount} {from_currency.upper()} = {converted_amount:.2f} {to_currency.upper()} (Rate: {rate:.4f})"
-        else:
-            return f"Currency {to_currency.upper()} not found"
+        return _format_exchange_rate(data, from_currency, to_currency, amount)
 
     except Exception as e:
         return f"Exchange rate lookup failed: {str(e)}"
 
 
+def _exchange_rate_url(from_currency: str) -> str:
+    """Latest rates of a base currency (free exchange rate API)."""
+    return f"https://api.exchangerate-api.com/v4/latest/{from_currency.upper()}"
+
+
+def _format_exchange_rate(data: dict, from_currency: str, to_currency: str, amount: float) -> str:
+    """Convert ``amount`` with a rates response."""
+    if to_currency.upper() in data["rates"]:
+        rate = data["rates"][to_currency.upper()]
+        converted_amount = amount * rate
+        return f"{amount} {from_currency.upper()} = {converted_amount:.2f} {to_currency.upper()} (Rate: {rate:.4f})"
+    else:
+        return f"Currency {to_currency.upper()} not found"
+
+
 def get_system_info() -> str:
     """
     Get system information.
@@ -558,7 +590,7 @@ def get_system_info() -> str:
             "Hostname": platform.node(),
         }
 
-        return "System Information: " + ", ".join(["{k}: {v}" for k, v in info.items()])
+        return "System Information: " + ", ".join([f"{k}: {v}" for k, v in info.items()])
 
     except Exception:
         return "System info unavailable: {str(e)}"
@@ -581,3 +613,75 @@ def get_timezone_for_location(location: str) -> str:
 
     except Exception:
         return "Timezone lookup failed: {str(e)}"
+
+
+# --- Async tool implementations (see services/tool_runtime.py) ---
+# These share the pooled HTTP clients instead of opening a client per call and raise on
+# network/HTTP errors instead of returning an error string, so the tool runtime can apply
+# its timeout, fall back to the tool's error message and cache only real answers.
+
+
+async def aget_weather(city: str = "London") -> str:
+    """Async get_weather: WeatherAPI.com when WEATHERAPI_KEY is set, Open-Meteo otherwise."""
+    api_key = os.getenv("WEATHERAPI_KEY", "")
+    if api_key:
+        url = "http://api.weatherapi.com/v1/current.json"
+        resp = await http_client_pool.get_client(url).get(url, params={"key": api_key, "q": city})
+        data = resp.json()
+        if resp.status_code == 200 and "error" not in data:
+            return _format_weatherapi(data)
+        logging.warning(f"[WeatherAPI] {data.get('error', {}).get('message', resp.status_code)}; using Open-Meteo")
+
+    geo_url = "https://geocoding-api.open-meteo.com/v1/search"
+    geo_resp = await http_client_pool.get_client(geo_url).get(geo_url, params={"name": city})
+    geo_resp.raise_for_status()
+    geo = geo_resp.json()
+    if not geo.get("results"):
+        return f"Could not find city: {city}"
+    lat, lon = geo["results"][0]["latitude"], geo["results"][0]["longitude"]
+
+    forecast_url = "https://api.open-meteo.com/v1/forecast"
+    weather_resp = await http_client_pool.get_client(forecast_url).get(
+        forecast_url, params={"latitude": lat, "longitude": lon, "current_weather": "true"}
+    )
+    weather_resp.raise_for_status()
+    return _format_open_meteo(city, weather_resp.json())
+
+
+async def aget_time_from_timeanddate(location: str) -> str:
+    """Async get_time_from_timeanddate; the page is parsed on the "tools" executor."""
+    url = _timeanddate_url(location)
+    response = await http_client_pool.get_client(url).get(url, headers=_TIMEANDDATE_HEADERS)
+    response.raise_for_status()
+    return await run_in_executor("tools", _parse_timeanddate, location, response.content)
+
+
+async def awikipedia_search(query: str, sentences: int = 3) -> str:
+    """Async wikipedia_search (the wikipedia client is blocking, so it runs on the "tools" executor)."""
+    return await run_in_executor("tools", _wikipedia_summary, query, sentences)
+
+
+async def aweb_search(query: str) -> str:
+    """Async web_search."""
+    url = _duckduckgo_url(query)
+    response = await http_client_pool.get_client(url).get(url, headers=_DUCKDUCKGO_HEADERS)
+    response.raise_for_status()
+    return _format_duckduckgo(query, response.json())
+
+
+async def aget_news(category: str = "general") -> str:
+    """Async get_news."""
+    return get_news(category)
+
+
+async def aget_exchange_rate(from_currency: str, to_currency: str, amount: float = 1.0) -> str:
+    """Async get_exchange_rate."""
+    url = _exchange_rate_url(from_currency)
+    response = await http_client_pool.get_client(url).get(url)
+    response.raise_for_status()
+    return _format_exchange_rate(response.json(), from_currency, to_currency, amount)
+
+
+async def arun_python_code(code: str) -> str:
+    """Async run_python_code on the "tools" executor (the thread finishes even if the caller times out)."""
+    return await run_in_executor("tools", run_python_code, code)
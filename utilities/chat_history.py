@@ -0,0 +1,175 @@
+"""
+Compact encoding for capped per-chat history lists.
+
+A chat's history is a Redis list with the newest turn at the head, trimmed to a
+fixed number of turns on every write. Each list element is one fixed-schema JSON
+array instead of a keyed object:
+
+    ["t", timestamp, user_message, assistant_response]
+
+A turn whose answer was cut short (the client stopped the stream) is tagged "p"
+instead of "t" and decodes with ``"partial": True``.
+
+Turns pushed out of the list can be folded into a single bounded summary stored
+next to it, so the context of older turns survives without the list growing.
+
+Turns written by the write-behind queue go through ``APPEND_ONCE_SCRIPT``, which
+marks the job as applied in the same atomic step as the push, so a redelivered
+job does not append its turn twice. Turns queued on the Redis stream are numbered
+per chat (``sequence_key``); the script holds back a turn until every earlier one
+was appended or given up on (``SKIP_TURN_SCRIPT``), whichever worker runs it.
+Entries written before this format (JSON objects with ``user_message``/
+``assistant_response``, ``message``/``response`` or ``role``/``content`` keys)
+are still decoded.
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+TURN = "t"
+PARTIAL_TURN = "p"
+
+# KEYS: history list, applied marker, applied sequence. ARGV: entry, max turns, list TTL (0 = none),
+# marker TTL, "1" to return the trimmed turns, sequence number (0 = none), "1" to wait for earlier turns.
+# Returns {0} for a job already applied, {2} while an earlier turn is pending, else {1, trimmed...}.
+APPEND_ONCE_SCRIPT = """
+local sequence = tonumber(ARGV[6])
+local applied = tonumber(redis.call('GET', KEYS[3]) or '0')
+if sequence > applied + 1 and ARGV[7] == '1' then
+    return {2}
+end
+if not redis.call('SET', KEYS[2], '1', 'NX', 'EX', ARGV[4]) then
+    return {0}
+end
+if sequence > applied then
+    redis.call('SET', KEYS[3], sequence, 'EX', ARGV[4])
+end
+redis.call('LPUSH', KEYS[1], ARGV[1])
+local result = {1}
+if ARGV[5] == '1' then
+    for _, turn in ipairs(redis.call('LRANGE', KEYS[1], tonumber(ARGV[2]), -1)) do
+        result[#result + 1] = turn
+    end
+end
+redis.call('LTRIM', KEYS[1], 0, tonumber(ARGV[2]) - 1)
+if tonumber(ARGV[3]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return result
+"""
+
+# KEYS: applied sequence. ARGV: sequence number of a turn given up on, TTL. Lets later turns through.
+SKIP_TURN_SCRIPT = """
+if tonumber(ARGV[1]) > tonumber(redis.call('GET', KEYS[1]) or '0') then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+return 1
+"""
+
+
+def history_key(chat_id: str) -> str:
+    """Redis list holding a chat's turns, newest first."""
+    return f"chat:{chat_id}"
+
+
+def summary_key(chat_id: str) -> str:
+    """Redis key holding the rolled-up summary of a chat's trimmed turns."""
+    return f"chat_summary:{chat_id}"
+
+
+def applied_key(chat_id: str, job_id: str) -> str:
+    """Redis key marking a queued turn as already appended to a chat."""
+    return f"chat_applied:{chat_id}:{job_id}"
+
+
+def sequence_key(chat_id: str) -> str:
+    """Redis counter numbering the turns queued for a chat."""
+    return f"chat_seq:{chat_id}"
+
+
+def applied_sequence_key(chat_id: str) -> str:
+    """Redis key holding the highest turn number of a chat appended (or given up on)."""
+    return f"chat_seq_applied:{chat_id}"
+
+
+def encode_turn(
+    user_message: str, assistant_response: str, timestamp: Optional[float] = None, partial: bool = False
+) -> str:
+    """Encode one exchange as a compact list element."""
+    tag = PARTIAL_TURN if partial else TURN
+    entry = [tag, round(timestamp if timestamp is not None else time.time(), 3), user_message, assistant_response]
+    return json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+
+
+def turn_from_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a keyed chat entry (any of the historical shapes) to a turn dict."""
+    role = entry.get("role")
+    user_message = entry.get("user_message", entry.get("message", ""))
+    assistant_response = entry.get("assistant_response", entry.get("response", ""))
+    if role == "user":
+        user_message = entry.get("content", "")
+    elif role == "assistant":
+        assistant_response = entry.get("content", "")
+
+    timestamp = entry.get("timestamp")
+    if not isinstance(timestamp, (int, float)):
+        timestamp = None
+    turn = {
+        "user_message": str(user_message or ""),
+        "assistant_response": str(assistant_response or ""),
+        "timestamp": timestamp,
+    }
+    if entry.get("partial"):
+        turn["partial"] = True
+    return turn
+
+
+def decode_turn(data: Any) -> Optional[Dict[str, Any]]:
+    """Decode a list element into ``{"user_message", "assistant_response", "timestamp"}`` (plus ``"partial"``)."""
+    if isinstance(data, bytes):
+        data = data.decode("utf-8", errors="replace")
+    try:
+        value = json.loads(data)
+    except (TypeError, ValueError):
+        return None
+
+    if isinstance(value, list) and len(value) == 4 and value[0] == TURN:
+        return {"user_message": value[2], "assistant_response": value[3], "timestamp": value[1]}
+    if isinstance(value, list) and len(value) == 4 and value[0] == PARTIAL_TURN:
+        return {"user_message": value[2], "assistant_response": value[3], "timestamp": value[1], "partial": True}
+    if isinstance(value, dict):
+        return turn_from_entry(value)
+    return None
+
+
+def decode_window(entries: List[Any]) -> List[Dict[str, Any]]:
+    """Decode a newest-first LRANGE result into turns in chronological order."""
+    turns = [decode_turn(entry) for entry in reversed(entries)]
+    return [turn for turn in turns if turn is not None]
+
+
+def roll_up(summary: Optional[str], dropped: List[Dict[str, Any]], max_chars: int, snippet_chars: int = 160) -> str:
+    """Fold trimmed turns (oldest first) into the running summary, keeping its most recent ``max_chars``.
+
+    The summary is extractive: one shortened line per exchange, so rolling up costs
+    no model call and its size is bounded however long the chat runs.
+    """
+
+    def shorten(text: str) -> str:
+        text = " ".join(text.split())
+        return text if len(text) <= snippet_chars else text[: snippet_chars - 1] + "…"
+
+    lines = [summary] if summary else []
+    for turn in dropped:
+        line = f"User: {shorten(turn['user_message'])}"
+        if turn["assistant_response"]:
+            line += f" / Assistant: {shorten(turn['assistant_response'])}"
+        lines.append(line)
+
+    text = "\n".join(lines)
+    if len(text) > max_chars:
+        # Drop whole lines from the oldest end
+        text = text[-max_chars:]
+        text = text[text.find("\n") + 1 :] if "\n" in text else text
+    return text
@@ -0,0 +1,336 @@
+"""
+Token-budgeted conversation context assembly.
+
+Every chat path sends the model the same kinds of context: a system prompt
+(persona plus user profile), retrieved memories, recent conversation turns and
+the current message. ``ContextBuilder`` packs them into one message list that
+fits a per-model token budget, in priority order:
+
+1. the system prompt and the current message (truncated only if they alone overflow),
+2. retrieved memories, most relevant first, within a share of what is left,
+3. recent history, newest first, whole messages while they fit,
+4. the rolled-up summary of older turns, truncated to what remains.
+
+Token counts are estimated (no model tokenizer is available for Ollama models),
+and the count of each distinct system prompt is cached, since it is the same
+for every request of a user. A smaller prompt directly shortens prefill.
+
+This module only depends on the standard library so the standalone memory
+service can ship it alongside ``memory/``.
+"""
+
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from config import CONTEXT_MEMORY_SHARE, CONTEXT_MODEL_BUDGETS, CONTEXT_RESPONSE_RESERVE, CONTEXT_TOKEN_BUDGET
+except ImportError:
+    # The standalone memory service image ships without config.py
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4096"))
+    CONTEXT_MODEL_BUDGETS = os.getenv("CONTEXT_MODEL_BUDGETS", "")
+    CONTEXT_RESPONSE_RESERVE = int(os.getenv("CONTEXT_RESPONSE_RESERVE", "1024"))
+    CONTEXT_MEMORY_SHARE = float(os.getenv("CONTEXT_MEMORY_SHARE", "0.4"))
+
+# Word runs, and any other non-space character on its own
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+# Per-message overhead of chat templates (role markers, separators)
+MESSAGE_OVERHEAD = 4
+
+# Do not bother appending a truncated fragment smaller than this
+MIN_FRAGMENT_TOKENS = 16
+
+MEMORIES_HEADER = "Relevant memories:"
+SUMMARY_HEADER = "Summary of earlier conversation:"
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of BPE tokens in a text.
+
+    Short words are usually one token and long ones split every ~4 characters;
+    punctuation is one token each. Errs on the high side for prose.
+    """
+    return sum(1 if len(piece) <= 4 else math.ceil(len(piece) / 4) for piece in _TOKEN_PIECES.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Shorten a text to roughly ``max_tokens`` estimated tokens, cutting at a word boundary."""
+    if max_tokens <= 0:
+        return ""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    cut = int(len(text) * max_tokens / tokens)
+    while cut > 0 and estimate_tokens(text[:cut]) > max_tokens - 1:
+        cut = int(cut * 0.9)
+    head = text[:cut]
+    space = head.rfind(" ")
+    if space > cut // 2:
+        head = head[:space]
+    return head.rstrip() + "…"
+
+
+def parse_model_budgets(spec: str) -> Dict[str, int]:
+    """Parse ``"model=tokens,model=tokens"`` into a dict (invalid items are ignored)."""
+    budgets: Dict[str, int] = {}
+    for item in spec.split(","):
+        model, _, tokens = item.strip().rpartition("=")
+        if model and tokens.strip().isdigit():
+            budgets[model.strip()] = int(tokens)
+    return budgets
+
+
+def history_to_messages(history: Sequence[Dict[str, Any]]) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    """Split stored history entries (see ``utilities/chat_history.py``) into chat messages and a summary."""
+    messages: List[Dict[str, str]] = []
+    summary: Optional[str] = None
+    for entry in history:
+        if not isinstance(entry, dict):
+            continue
+        if "summary" in entry:
+            summary = entry["summary"]
+            continue
+        if entry.get("user_message"):
+            messages.append({"role": "user", "content": str(entry["user_message"])})
+        if entry.get("assistant_response"):
+            messages.append({"role": "assistant", "content": str(entry["assistant_response"])})
+    return messages, summary
+
+
+@dataclass
+class BuiltContext:
+    """Messages packed for one model call, with what went in and what was left out."""
+
+    messages: List[Dict[str, str]]
+    budget: int
+    tokens: int
+    sections: Dict[str, int] = field(default_factory=dict)
+    memories_used: int = 0
+    memories_dropped: int = 0
+    history_used: int = 0
+    history_dropped: int = 0
+    truncated: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summarize the packing (for debug output)."""
+        return {
+            "budget": self.budget,
+            "tokens": self.tokens,
+            "sections": self.sections,
+            "memories_used": self.memories_used,
+            "memories_dropped": self.memories_dropped,
+            "history_used": self.history_used,
+            "history_dropped": self.history_dropped,
+            "truncated": self.truncated,
+        }
+
+
+class ContextBuilder:
+    """Packs system prompt, memories, history and the current message into a token budget."""
+
+    def __init__(
+        self,
+        default_budget: int = CONTEXT_TOKEN_BUDGET,
+        model_budgets: Optional[Dict[str, int]] = None,
+        response_reserve: int = CONTEXT_RESPONSE_RESERVE,
+        memory_share: float = CONTEXT_MEMORY_SHARE,
+        prompt_cache_size: int = 256,
+    ):
+        """Initialize the builder.
+
+        Args:
+            default_budget: Context window (tokens) for models without their own entry.
+            model_budgets: Context window per model name.
+            response_reserve: Tokens kept free for the model's answer.
+            memory_share: Maximum fraction of the space left after the system prompt
+                and message that memories may take (unused space flows to history).
+            prompt_cache_size: Number of distinct system prompts whose counts are cached.
+        """
+        self.default_budget = default_budget
+        self.model_budgets = dict(model_budgets or {})
+        self.response_reserve = response_reserve
+        self.memory_share = memory_share
+        self._prompt_tokens: "OrderedDict[str, int]" = OrderedDict()
+        self._prompt_cache_size = prompt_cache_size
+        self._lock = threading.Lock()
+
+        self._builds = 0
+        self._prompt_cache_hits = 0
+        self._truncations = 0
+        self._memories_dropped = 0
+        self._history_dropped = 0
+        self._tokens_sent = 0
+
+    def budget_for(self, model: Optional[str], response_reserve: Optional[int] = None) -> int:
+        """Tokens available for the prompt when calling ``model``."""
+        window = self.default_budget
+        if model:
+            # Exact tag first, then the family ("llama3.2:3b" -> "llama3.2")
+            window = self.model_budgets.get(model, self.model_budgets.get(model.split(":")[0], window))
+        reserve = self.response_reserve if response_reserve is None else response_reserve
+        return max(window - reserve, window // 4)
+
+    def _system_tokens(self, system_prompt: str) -> int:
+        """Token count of a system prompt, cached per distinct prompt."""
+        with self._lock:
+            tokens = self._prompt_tokens.get(system_prompt)
+            if tokens is not None:
+                self._prompt_tokens.move_to_end(system_prompt)
+                self._prompt_cache_hits += 1
+                return tokens
+        tokens = estimate_tokens(system_prompt) + MESSAGE_OVERHEAD
+        with self._lock:
+            self._prompt_tokens[system_prompt] = tokens
+            if len(self._prompt_tokens) > self._prompt_cache_size:
+                self._prompt_tokens.popitem(last=False)
+        return tokens
+
+    def build(
+        self,
+        model: Optional[str],
+        system_prompt: str,
+        message: str,
+        memories: Sequence[Any] = (),
+        history: Sequence[Dict[str, str]] = (),
+        summary: Optional[str] = None,
+        response_reserve: Optional[int] = None,
+    ) -> BuiltContext:
+        """Pack the context for one model call.
+
+        Args:
+            model: Model name, used to pick the budget.
+            system_prompt: Persona and profile; always sent.
+            message: The current user message; always sent.
+            memories: Retrieved memories, most relevant first.
+            history: Prior ``{"role", "content"}`` messages, oldest first.
+            summary: Rolled-up summary of turns older than ``history``.
+            response_reserve: Override for the tokens kept free for the answer.
+
+        Returns:
+            A ``BuiltContext`` whose ``messages`` are system, history (oldest first)
+            and the current user message.
+        """
+        budget = self.budget_for(model, response_reserve)
+        truncated: List[str] = []
+
+        system_tokens = self._system_tokens(system_prompt)
+        if system_tokens > budget // 2:
+            system_prompt = truncate_to_tokens(system_prompt, budget // 2 - MESSAGE_OVERHEAD)
+            system_tokens = estimate_tokens(system_prompt) + MESSAGE_OVERHEAD
+            truncated.append("system")
+
+        message_tokens = estimate_tokens(message) + MESSAGE_OVERHEAD
+        if system_tokens + message_tokens > budget:
+            message = truncate_to_tokens(message, budget - system_tokens - MESSAGE_OVERHEAD)
+            message_tokens = estimate_tokens(message) + MESSAGE_OVERHEAD
+            truncated.append("message")
+
+        remaining = budget - system_tokens - message_tokens
+
+        # Memories, most relevant first, within their share of the remaining space
+        memory_budget = int(remaining * self.memory_share)
+        memory_lines: List[str] = []
+        memory_tokens = 0
+        memory_texts = [str(memory) for memory in memories if memory]
+        if memory_texts:
+            memory_tokens = estimate_tokens(MEMORIES_HEADER) + 1
+            for text in memory_texts:
+                line = f"- {text}"
+                tokens = estimate_tokens(line) + 1
+                if memory_tokens + tokens > memory_budget:
+                    space = memory_budget - memory_tokens - 1
+                    if space >= MIN_FRAGMENT_TOKENS:
+                        line = truncate_to_tokens(line, space)
+                        memory_lines.append(line)
+                        memory_tokens += estimate_tokens(line) + 1
+                        truncated.append("memories")
+                    break
+                memory_lines.append(line)
+                memory_tokens += tokens
+            if not memory_lines:
+                memory_tokens = 0
+        remaining -= memory_tokens
+
+        # History, newest first, whole messages only
+        kept: List[Dict[str, str]] = []
+        history_tokens = 0
+        for entry in reversed(history):
+            tokens = estimate_tokens(entry.get("content", "")) + MESSAGE_OVERHEAD
+            if history_tokens + tokens > remaining:
+                break
+            kept.append(entry)
+            history_tokens += tokens
+        kept.reverse()
+        remaining -= history_tokens
+
+        # Summary of older turns takes whatever is left
+        summary_tokens = 0
+        if summary:
+            space = remaining - estimate_tokens(SUMMARY_HEADER) - 1
+            if space >= MIN_FRAGMENT_TOKENS:
+                if estimate_tokens(summary) > space:
+                    summary = truncate_to_tokens(summary, space)
+                    truncated.append("summary")
+                summary_tokens = estimate_tokens(summary) + estimate_tokens(SUMMARY_HEADER) + 1
+            else:
+                summary = None
+
+        system_content = system_prompt
+        if memory_lines:
+            system_content += "\n\n" + MEMORIES_HEADER + "\n" + "\n".join(memory_lines)
+        if summary:
+            system_content += "\n\n" + SUMMARY_HEADER + "\n" + summary
+
+        messages = [{"role": "system", "content": system_content}]
+        messages.extend({"role": entry["role"], "content": entry["content"]} for entry in kept)
+        messages.append({"role": "user", "content": message})
+
+        built = BuiltContext(
+            messages=messages,
+            budget=budget,
+            tokens=system_tokens + message_tokens + memory_tokens + history_tokens + summary_tokens,
+            sections={
+                "system": system_tokens,
+                "message": message_tokens,
+                "memories": memory_tokens,
+                "history": history_tokens,
+                "summary": summary_tokens,
+            },
+            memories_used=len(memory_lines),
+            memories_dropped=len(memory_texts) - len(memory_lines),
+            history_used=len(kept),
+            history_dropped=len(history) - len(kept),
+            truncated=truncated,
+        )
+        with self._lock:
+            self._builds += 1
+            self._truncations += bool(truncated)
+            self._memories_dropped += built.memories_dropped
+            self._history_dropped += built.history_dropped
+            self._tokens_sent += built.tokens
+        return built
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get packing statistics."""
+        with self._lock:
+            return {
+                "default_budget": self.default_budget,
+                "model_budgets": self.model_budgets,
+                "response_reserve": self.response_reserve,
+                "builds": self._builds,
+                "avg_prompt_tokens": round(self._tokens_sent / self._builds, 1) if self._builds else 0.0,
+                "builds_truncated": self._truncations,
+                "memories_dropped": self._memories_dropped,
+                "history_messages_dropped": self._history_dropped,
+                "cached_system_prompts": len(self._prompt_tokens),
+                "system_prompt_cache_hits": self._prompt_cache_hits,
+            }
+
+
+# Global context builder instance
+context_builder = ContextBuilder(model_budgets=parse_model_budgets(CONTEXT_MODEL_BUDGETS))
@@ -0,0 +1,178 @@
+"""
+Micro-batching engine for embedding generation.
+
+Concurrent callers submit single texts; a background worker drains the queue and
+runs one ``encode`` call for up to ``max_batch_size`` texts, or whatever arrived
+within ``max_wait_ms`` of the first queued text. Each caller gets its own vector
+back through a future.
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from human_logging import log_service_status
+from utilities.executors import run_in_executor
+
+
+class EmbeddingBatcher:
+    """Queue single-text embedding requests and encode them in batches."""
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue_size: int = 0,
+        executor: str = "embedding",
+    ):
+        """Initialize the batcher.
+
+        Args:
+            encode_fn: Blocking function mapping a list of texts to a sequence of vectors.
+                It is run on an executor thread so it never blocks the event loop.
+            max_batch_size: Maximum number of texts passed to one ``encode_fn`` call.
+            max_wait_ms: How long to wait for more texts after the first one arrives.
+            max_queue_size: Upper bound on pending texts (0 means unbounded).
+            executor: Name of the executor (see utilities/executors.py) that runs ``encode_fn``.
+        """
+        self._encode_fn = encode_fn
+        self._executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._max_queue_size = max_queue_size
+        self._worker_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Futures of the batch being encoded (already taken off the queue)
+        self._in_flight: List[asyncio.Future] = []
+
+        # Statistics
+        self._batches = 0
+        self._texts = 0
+        self._max_queue_depth = 0
+        self._encode_time = 0.0
+        self._errors = 0
+
+    def _ensure_worker(self) -> None:
+        """Start the worker lazily on the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker_task is None or self._worker_task.done():
+            if self._loop is not loop:
+                self._queue = asyncio.Queue(maxsize=self._max_queue_size)
+                self._loop = loop
+            self._worker_task = loop.create_task(self._worker())
+
+    async def encode(self, text: str) -> Any:
+        """Queue one text and wait for its vector."""
+        self._ensure_worker()
+        future: asyncio.Future = self._loop.create_future()
+        await self._queue.put((text, future))
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+        return await future
+
+    async def encode_many(self, texts: List[str]) -> List[Any]:
+        """Queue several texts and wait for all of their vectors, in input order."""
+        if not texts:
+            return []
+        return list(await asyncio.gather(*(self.encode(text) for text in texts)))
+
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for the first item, then gather more until the batch is full or the window closes."""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Drain anything that is already queued without yielding
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _worker(self) -> None:
+        """Encode queued texts in batches until cancelled."""
+        while True:
+            batch = await self._collect_batch()
+            # Skip callers that gave up while waiting
+            live = [(text, future) for text, future in batch if not future.done()]
+            if not live:
+                continue
+
+            texts = [text for text, _ in live]
+            self._in_flight = [future for _, future in live]
+            start_time = time.perf_counter()
+            try:
+                vectors = await run_in_executor(self._executor, self._encode_fn, texts)
+                if len(vectors) != len(texts):
+                    raise ValueError(f"Encoder returned {len(vectors)} vectors for {len(texts)} texts")
+            except Exception as e:
+                self._errors += 1
+                log_service_status("embeddings", "error", f"Batch encode of {len(texts)} texts failed: {e}")
+                self._fail(self._in_flight, e)
+                self._in_flight = []
+                continue
+
+            self._encode_time += time.perf_counter() - start_time
+            self._batches += 1
+            self._texts += len(texts)
+
+            for (_, future), vector in zip(live, vectors):
+                if not future.done():
+                    future.set_result(vector)
+            self._in_flight = []
+
+    @staticmethod
+    def _fail(futures: List[asyncio.Future], error: Optional[BaseException] = None) -> None:
+        """Fail (or, without an error, cancel) the futures that are still pending."""
+        for future in futures:
+            if not future.done():
+                if error is None:
+                    future.cancel()
+                else:
+                    future.set_exception(error)
+
+    async def stop(self) -> None:
+        """Cancel the worker and any pending requests, including the batch being encoded."""
+        if self._worker_task:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+
+        self._fail(self._in_flight)
+        self._in_flight = []
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                self._fail([future])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batching statistics."""
+        avg_batch = self._texts / self._batches if self._batches else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self._max_queue_depth,
+            "batches": self._batches,
+            "texts_encoded": self._texts,
+            "avg_batch_size": round(avg_batch, 2),
+            "avg_batch_fill": f"{(avg_batch / self.max_batch_size) * 100:.1f}%",
+            "avg_encode_ms": round((self._encode_time / self._batches) * 1000, 2) if self._batches else 0.0,
+            "errors": self._errors,
+        }
@@ -0,0 +1,162 @@
+"""
+Content-addressed embedding cache.
+
+Vectors are keyed by (model name, prefix mode, text hash) and stored as float32
+bytes: a bounded in-process LRU tier in front of an optional Redis tier shared
+by all workers.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+
+from human_logging import log_service_status
+
+
+class EmbeddingCache:
+    """Two-tier (local LRU + Redis) cache of embedding vectors."""
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        redis_client: Any = None,
+        redis_ttl: int = 86400,
+        key_prefix: str = "emb:",
+    ):
+        """Initialize the cache.
+
+        Args:
+            max_size: Maximum number of vectors held in the local tier.
+            redis_client: Optional binary-safe asyncio Redis client (``decode_responses=False``).
+            redis_ttl: Expiry in seconds for vectors written to Redis.
+            key_prefix: Namespace for Redis keys.
+        """
+        self._local: "OrderedDict[str, bytes]" = OrderedDict()
+        # The local tier is also used from executor threads (ingestion, write-behind)
+        self._lock = threading.Lock()
+        self._max_size = max_size
+        self._redis = redis_client
+        self._redis_ttl = redis_ttl
+        self._key_prefix = key_prefix
+
+        self._local_hits = 0
+        self._redis_hits = 0
+        self._misses = 0
+        self._redis_errors = 0
+
+    @staticmethod
+    def make_key(model_name: str, prefix_mode: str, text: str) -> str:
+        """Build the content address for a text embedded with a given model and prefix mode."""
+        digest = hashlib.sha256(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+        return f"{model_name}|{prefix_mode}|{digest}"
+
+    @staticmethod
+    def _encode(vector: Any) -> bytes:
+        """Serialize a vector as contiguous float32 bytes."""
+        return np.asarray(vector, dtype=np.float32).tobytes()
+
+    @staticmethod
+    def _decode(data: bytes) -> NDArray[np.float32]:
+        """Deserialize float32 bytes into a read-only vector."""
+        return np.frombuffer(data, dtype=np.float32)
+
+    def attach_redis(self, redis_client: Any) -> None:
+        """Enable (or replace) the Redis tier."""
+        self._redis = redis_client
+
+    def _get_local(self, key: str) -> Optional[bytes]:
+        """Look up the local tier and refresh LRU order on hit."""
+        with self._lock:
+            data = self._local.get(key)
+            if data is not None:
+                self._local.move_to_end(key)
+            return data
+
+    def _set_local(self, key: str, data: bytes) -> None:
+        """Insert into the local tier, evicting the least recently used entry if full."""
+        with self._lock:
+            if key in self._local:
+                self._local.move_to_end(key)
+            elif len(self._local) >= self._max_size:
+                self._local.popitem(last=False)
+            self._local[key] = data
+
+    def _redis_error(self, action: str, error: Exception) -> None:
+        """Count and log a failed Redis call; the cache degrades to the local tier."""
+        self._redis_errors += 1
+        log_service_status("embeddings", "warning", f"Embedding cache Redis {action} failed: {error}")
+
+    async def aget(self, key: str) -> Optional[NDArray[np.float32]]:
+        """Get a cached vector, checking the local tier then Redis."""
+        return (await self.aget_many([key]))[0]
+
+    async def aset(self, key: str, vector: Any) -> None:
+        """Store a vector in both tiers."""
+        await self.aset_many([key], [vector])
+
+    async def aget_many(self, keys: Sequence[str]) -> List[Optional[NDArray[np.float32]]]:
+        """Get cached vectors for several keys, fetching local misses from Redis in one MGET."""
+        found: List[Optional[bytes]] = [self._get_local(key) for key in keys]
+        self._local_hits += sum(data is not None for data in found)
+
+        missing = [i for i, data in enumerate(found) if data is None]
+        if missing and self._redis is not None:
+            try:
+                fetched = await self._redis.mget([self._key_prefix + keys[i] for i in missing])
+            except Exception as e:
+                self._redis_error("read", e)
+                fetched = [None] * len(missing)
+            for i, data in zip(missing, fetched):
+                if data is not None:
+                    self._redis_hits += 1
+                    self._set_local(keys[i], data)
+                    found[i] = data
+
+        self._misses += sum(data is None for data in found)
+        return [self._decode(data) if data is not None else None for data in found]
+
+    async def aset_many(self, keys: Sequence[str], vectors: Sequence[Any]) -> None:
+        """Store several vectors in both tiers, writing Redis in one pipeline."""
+        encoded = [self._encode(vector) for vector in vectors]
+        for key, data in zip(keys, encoded):
+            self._set_local(key, data)
+        if not encoded or self._redis is None:
+            return
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for key, data in zip(keys, encoded):
+                pipe.set(self._key_prefix + key, data, ex=self._redis_ttl)
+            await pipe.execute()
+        except Exception as e:
+            self._redis_error("write", e)
+
+    def clear(self) -> None:
+        """Clear the local tier and reset statistics (Redis entries expire on their own)."""
+        with self._lock:
+            self._local.clear()
+        self._local_hits = 0
+        self._redis_hits = 0
+        self._misses = 0
+        self._redis_errors = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        hits = self._local_hits + self._redis_hits
+        total = hits + self._misses
+        hit_rate = (hits / total * 100) if total > 0 else 0
+        return {
+            "size": len(self._local),
+            "max_size": self._max_size,
+            "local_hits": self._local_hits,
+            "redis_hits": self._redis_hits,
+            "misses": self._misses,
+            "total_requests": total,
+            "hit_rate": f"{hit_rate:.1f}%",
+            "hit_rate_numeric": hit_rate,
+            "redis_enabled": self._redis is not None,
+            "redis_errors": self._redis_errors,
+        }
@@ -0,0 +1,170 @@
+"""
+Named, sized thread pools for blocking work.
+
+CPU-bound embedding, blocking ChromaDB client calls and blocking tool lookups
+each run on their own pool instead of the event loop (or the shared default
+executor), so a slow vector query can only back up the ``chroma`` pool and never
+stalls streaming responses. Every pool tracks queue depth and wait/run times for /debug/executors.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from config import EXECUTOR_CHROMA_WORKERS, EXECUTOR_EMBEDDING_WORKERS, EXECUTOR_TOOL_WORKERS
+from human_logging import log_service_status
+
+T = TypeVar("T")
+
+
+class InstrumentedExecutor:
+    """A ThreadPoolExecutor that records queue depth and timing."""
+
+    def __init__(self, name: str, max_workers: int):
+        """Initialize the pool.
+
+        Args:
+            name: Pool name used for thread names and metrics
+            max_workers: Number of worker threads
+        """
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"exec-{name}")
+        self._lock = threading.Lock()
+
+        self._queued = 0
+        self._active = 0
+        self._max_queue_depth = 0
+        self._completed = 0
+        self._failed = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._run_time = 0.0
+
+    def _call(self, submitted_at: float, fn: Callable[[], T]) -> T:
+        """Run one job on a worker thread, updating metrics around it."""
+        started = time.perf_counter()
+        waited = started - submitted_at
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._wait_time += waited
+            self._max_wait_time = max(self._max_wait_time, waited)
+        failed = False
+        try:
+            return fn()
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._run_time += time.perf_counter() - started
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+
+    def _on_done(self, future: Future) -> None:
+        """Account for jobs cancelled before a worker picked them up."""
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking callable on this pool and await its result.
+
+        The caller's context variables (e.g. the per-request Redis round-trip counter)
+        are visible to the job.
+        """
+        call = partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        with self._lock:
+            self._queued += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queued)
+        try:
+            future = self._executor.submit(self._call, time.perf_counter(), call)
+        except RuntimeError:
+            # Pool already shut down
+            with self._lock:
+                self._queued -= 1
+            raise
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics."""
+        with self._lock:
+            finished = self._completed + self._failed
+            started = finished + self._active
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self._queued,
+                "max_queue_depth": self._max_queue_depth,
+                "active": self._active,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_ms": round(self._wait_time / started * 1000, 3) if started else 0.0,
+                "max_wait_ms": round(self._max_wait_time * 1000, 3),
+                "avg_run_ms": round(self._run_time / finished * 1000, 3) if finished else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        """Stop accepting work and cancel anything still queued."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ExecutorRegistry:
+    """Registry of named executors, created on first use."""
+
+    def __init__(self, sizes: Dict[str, int]):
+        """Initialize the registry with the configured pool sizes."""
+        self._sizes = dict(sizes)
+        self._executors: Dict[str, InstrumentedExecutor] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, max_workers: Optional[int] = None) -> InstrumentedExecutor:
+        """Get (or create) the pool with the given name."""
+        executor = self._executors.get(name)
+        if executor is None:
+            with self._lock:
+                executor = self._executors.get(name)
+                if executor is None:
+                    size = max_workers or self._sizes.get(name, 4)
+                    executor = InstrumentedExecutor(name, size)
+                    self._executors[name] = executor
+                    log_service_status("EXECUTORS", "info", f"Created '{name}' executor with {size} workers")
+        return executor
+
+    async def run(self, name: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a blocking callable on the named pool."""
+        return await self.get(name).run(fn, *args, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get statistics for every pool."""
+        return {name: executor.get_stats() for name, executor in list(self._executors.items())}
+
+    def shutdown(self) -> None:
+        """Shut down every pool."""
+        with self._lock:
+            executors, self._executors = list(self._executors.values()), {}
+        for executor in executors:
+            executor.shutdown()
+
+
+# Global executor registry
+executors = ExecutorRegistry(
+    {
+        "embedding": EXECUTOR_EMBEDDING_WORKERS,
+        "chroma": EXECUTOR_CHROMA_WORKERS,
+        "tools": EXECUTOR_TOOL_WORKERS,
+    }
+)
+
+
+async def run_in_executor(name: str, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking callable on the named executor ("embedding", "chroma", ...)."""
+    return await executors.run(name, fn, *args, **kwargs)
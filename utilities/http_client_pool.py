@@ -0,0 +1,234 @@
+"""
+Long-lived HTTP clients for upstream LLM APIs.
+
+One ``httpx.AsyncClient`` is kept per upstream origin (scheme, host, port) for
+the lifetime of the application, so keep-alive connections, and HTTP/2 streams
+when enabled, are reused across calls instead of paying TCP/TLS setup on every
+request. Clients are created on first use, can be warmed up at startup, and are
+closed from the application lifespan.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict
+from urllib.parse import urlsplit
+
+import httpx
+
+from config import (
+    CONNECTION_POOL_SIZE,
+    CONNECTION_TIMEOUT,
+    HTTP2_ENABLED,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_WARMUP_CONNECTIONS,
+    LLM_TIMEOUT,
+    MAX_KEEPALIVE_CONNECTIONS,
+    READ_TIMEOUT,
+    WRITE_TIMEOUT,
+)
+from human_logging import log_service_status
+
+
+def _http2_available() -> bool:
+    """HTTP/2 support in httpx needs the optional ``h2`` package."""
+    try:
+        import h2  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+class _OriginStats:
+    """Request counters for one upstream origin."""
+
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.errors = 0
+        self.status_5xx = 0
+        self.header_time = 0.0
+        self.responses = 0
+
+
+class HTTPClientPool:
+    """Per-origin pool of shared ``httpx.AsyncClient`` instances."""
+
+    def __init__(
+        self,
+        max_connections: int = CONNECTION_POOL_SIZE,
+        max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP2_ENABLED,
+    ):
+        """Initialize the pool.
+
+        Args:
+            max_connections: Maximum open connections per origin
+            max_keepalive_connections: Idle connections kept open per origin
+            keepalive_expiry: Seconds an idle connection is kept
+            http2: Negotiate HTTP/2 where the upstream supports it (requires ``h2``)
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout=LLM_TIMEOUT, connect=CONNECTION_TIMEOUT, read=READ_TIMEOUT, write=WRITE_TIMEOUT)
+        self.http2 = http2 and _http2_available()
+        if http2 and not self.http2:
+            log_service_status("HTTP", "warning", "HTTP/2 requested but 'h2' is not installed; using HTTP/1.1")
+
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _OriginStats] = {}
+        self._created_at: Dict[str, float] = {}
+
+    @staticmethod
+    def origin(url: str) -> str:
+        """Reduce a URL to the origin its connections are pooled under."""
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def get_client(self, url: str) -> httpx.AsyncClient:
+        """Get the shared client for the origin of ``url``, creating it on first use."""
+        origin = self.origin(url)
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            stats = self._stats.setdefault(origin, _OriginStats())
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                event_hooks={"request": [self._on_request(stats)], "response": [self._on_response(stats)]},
+            )
+            self._clients[origin] = client
+            self._created_at[origin] = time.time()
+            log_service_status(
+                "HTTP", "info", f"Created pooled client for {origin} ({'HTTP/2' if self.http2 else 'HTTP/1.1'})"
+            )
+        return client
+
+    @staticmethod
+    def _on_request(stats: _OriginStats):
+        """Build a request hook that counts requests and stamps their start time."""
+
+        async def hook(request: httpx.Request) -> None:
+            stats.requests += 1
+            request.extensions["pool_started_at"] = time.perf_counter()
+
+        return hook
+
+    @staticmethod
+    def _on_response(stats: _OriginStats):
+        """Build a response hook that records time to headers and server errors."""
+
+        async def hook(response: httpx.Response) -> None:
+            started = response.request.extensions.get("pool_started_at")
+            if started is not None:
+                stats.header_time += time.perf_counter() - started
+                stats.responses += 1
+            if response.status_code >= 500:
+                stats.status_5xx += 1
+
+        return hook
+
+    def track(self, url: str) -> "_InFlight":
+        """Context manager counting a request (including a streamed body) as in flight."""
+        return _InFlight(self._stats.setdefault(self.origin(url), _OriginStats()))
+
+    async def warm_up(self, url: str, path: str = "/", connections: int = HTTP_WARMUP_CONNECTIONS) -> int:
+        """Open keep-alive connections to an upstream ahead of the first real request.
+
+        Returns the number of warm-up requests that got a response.
+        """
+        client = self.get_client(url)
+        target = f"{self.origin(url)}{path}"
+        count = max(1, min(connections, self.limits.max_keepalive_connections or connections))
+
+        async def ping() -> bool:
+            try:
+                await client.get(target, timeout=CONNECTION_TIMEOUT + READ_TIMEOUT)
+                return True
+            except httpx.HTTPError:
+                return False
+
+        results = await asyncio.gather(*(ping() for _ in range(count)))
+        warmed = sum(results)
+        log_service_status(
+            "HTTP",
+            "ready" if warmed else "warning",
+            f"Warmed {warmed}/{count} connections to {self.origin(url)}",
+        )
+        return warmed
+
+    @staticmethod
+    def _connection_stats(client: httpx.AsyncClient) -> Dict[str, int]:
+        """Summarize the underlying httpcore pool (best effort; relies on transport internals)."""
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is None:
+            return {}
+        idle = sum(1 for connection in connections if connection.is_idle())
+        http2 = sum(1 for connection in connections if "HTTP/2" in connection.info())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle, "http2": http2}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-origin pool utilization."""
+        origins = {}
+        for origin, stats in list(self._stats.items()):
+            client = self._clients.get(origin)
+            connections = self._connection_stats(client) if client is not None and not client.is_closed else {}
+            origins[origin] = {
+                "requests": stats.requests,
+                "in_flight": stats.in_flight,
+                "max_in_flight": stats.max_in_flight,
+                "errors": stats.errors,
+                "status_5xx": stats.status_5xx,
+                "avg_time_to_headers_ms": round(stats.header_time / stats.responses * 1000, 2) if stats.responses else 0.0,
+                "connections": connections,
+                "utilization": round(connections.get("active", 0) / self.limits.max_connections, 3)
+                if connections and self.limits.max_connections
+                else 0.0,
+                "client_age_seconds": round(time.time() - self._created_at[origin], 1) if origin in self._created_at else None,
+            }
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "origins": origins,
+        }
+
+    async def aclose(self) -> None:
+        """Close every client (application shutdown)."""
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+        log_service_status("HTTP", "info", f"Closed {len(clients)} pooled HTTP clients")
+
+
+class _InFlight:
+    """Counts one request as in flight until the (async) block exits; errors are tallied."""
+
+    def __init__(self, stats: _OriginStats):
+        self._stats = stats
+
+    def __enter__(self) -> "_InFlight":
+        self._stats.in_flight += 1
+        self._stats.max_in_flight = max(self._stats.max_in_flight, self._stats.in_flight)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._stats.in_flight -= 1
+        if exc_type is not None and issubclass(exc_type, httpx.HTTPError):
+            self._stats.errors += 1
+
+    async def __aenter__(self) -> "_InFlight":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.__exit__(exc_type, exc, tb)
+
+
+# Global HTTP client pool
+http_client_pool = HTTPClientPool()
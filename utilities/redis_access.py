@@ -0,0 +1,191 @@
+"""
+Redis access layer: asyncio clients with pooling, timeouts and round-trip accounting.
+
+``create_redis_client`` builds a ``redis.asyncio`` client on a bounded blocking
+connection pool, so concurrent coroutines each get their own connection (up to
+the pool size) instead of queueing behind one another, and every command is
+bounded by a socket timeout.
+
+Clients built this way count every packet sent to Redis: a single command, a
+whole pipeline or a ``MULTI``/``EXEC`` transaction, or a Lua script call each
+count as one network round trip. Counts are attributed to the request being
+served (see ``track_request``), so /debug/redis shows how many round trips each
+endpoint costs, and batching regressions are visible.
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+import redis.asyncio as aioredis
+
+from config import REDIS_COMMAND_TIMEOUT, REDIS_CONNECT_TIMEOUT, REDIS_MAX_CONNECTIONS, REDIS_POOL_TIMEOUT
+
+# Request histogram bucket upper bounds (round trips per request)
+_BUCKETS = (0, 1, 2, 5, 10, 20)
+
+
+class RoundTripCounter:
+    """Round trips made on behalf of one request."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, n: int = 1) -> None:
+        # Also incremented from executor threads that inherit the request context
+        with self._lock:
+            self.count += n
+
+
+_current_counter: ContextVar[Optional[RoundTripCounter]] = ContextVar("redis_round_trips", default=None)
+
+
+class RoundTripStats:
+    """Process-wide round-trip totals and per-request distribution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._total = 0
+        self._untracked = 0
+        self._requests = 0
+        self._request_round_trips = 0
+        self._max_per_request = 0
+        self._histogram = {bound: 0 for bound in _BUCKETS}
+        self._overflow = 0
+        self._by_route: Dict[str, Dict[str, int]] = {}
+
+    def record_round_trip(self, tracked: bool) -> None:
+        """Count one round trip, noting whether it happened inside a tracked request."""
+        with self._lock:
+            self._total += 1
+            if not tracked:
+                self._untracked += 1
+
+    def record_request(self, route: str, round_trips: int) -> None:
+        """Record the round trips made by one finished request."""
+        with self._lock:
+            self._requests += 1
+            self._request_round_trips += round_trips
+            self._max_per_request = max(self._max_per_request, round_trips)
+            for bound in _BUCKETS:
+                if round_trips <= bound:
+                    self._histogram[bound] += 1
+                    break
+            else:
+                self._overflow += 1
+            entry = self._by_route.setdefault(route, {"requests": 0, "round_trips": 0, "max": 0})
+            entry["requests"] += 1
+            entry["round_trips"] += round_trips
+            entry["max"] = max(entry["max"], round_trips)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get round-trip statistics."""
+        with self._lock:
+            histogram = {f"<={bound}": count for bound, count in self._histogram.items()}
+            histogram[f">{_BUCKETS[-1]}"] = self._overflow
+            return {
+                "total_round_trips": self._total,
+                "untracked_round_trips": self._untracked,
+                "requests": self._requests,
+                "avg_per_request": round(self._request_round_trips / self._requests, 3) if self._requests else 0.0,
+                "max_per_request": self._max_per_request,
+                "per_request_histogram": histogram,
+                "by_route": {
+                    route: {
+                        "requests": entry["requests"],
+                        "avg_round_trips": round(entry["round_trips"] / entry["requests"], 3),
+                        "max_round_trips": entry["max"],
+                    }
+                    for route, entry in self._by_route.items()
+                },
+            }
+
+
+# Global round-trip statistics
+redis_round_trips = RoundTripStats()
+
+
+def record_round_trip() -> None:
+    """Count one round trip against the current request (if any) and the totals."""
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.add()
+    redis_round_trips.record_round_trip(counter is not None)
+
+
+@contextmanager
+def track_request(route: str) -> Iterator[RoundTripCounter]:
+    """Attribute Redis round trips made inside the block (and tasks/executor jobs it starts) to one request.
+
+    The yielded counter's ``route`` can be replaced once the matched route template is known.
+    """
+    counter = RoundTripCounter(route)
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+        redis_round_trips.record_request(counter.route, counter.count)
+
+
+class CountingConnection(aioredis.Connection):
+    """Redis connection that counts each packet it sends as one round trip."""
+
+    async def send_packed_command(self, command: Any, check_health: bool = True) -> None:
+        record_round_trip()
+        await super().send_packed_command(command, check_health)
+
+
+def create_redis_client(
+    max_connections: int = REDIS_MAX_CONNECTIONS,
+    command_timeout: float = REDIS_COMMAND_TIMEOUT,
+    **connection_kwargs: Any,
+) -> aioredis.Redis:
+    """Create a pooled asyncio Redis client whose round trips are counted.
+
+    Args:
+        max_connections: Pool size; callers wait up to REDIS_POOL_TIMEOUT for a free connection
+        command_timeout: Seconds a single command (or pipeline) may take before it fails
+        **connection_kwargs: Usual connection arguments (host, port, db, decode_responses, ...)
+    """
+    connection_kwargs.setdefault("socket_connect_timeout", REDIS_CONNECT_TIMEOUT)
+    connection_kwargs.setdefault("health_check_interval", 30)
+    pool = aioredis.BlockingConnectionPool(
+        max_connections=max_connections,
+        timeout=REDIS_POOL_TIMEOUT,
+        connection_class=CountingConnection,
+        socket_timeout=command_timeout,
+        **connection_kwargs,
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+def create_listener_client(client: aioredis.Redis) -> aioredis.Redis:
+    """Create a single-connection client to the same server for a long-lived subscription.
+
+    The connection has no socket timeout, since a subscriber waits indefinitely for messages, and
+    it lives outside ``client``'s pool, so the subscription never holds one of its connections.
+    The caller closes it with ``aclose(close_connection_pool=True)``.
+    """
+    pool = client.connection_pool
+    connection_kwargs = {**pool.connection_kwargs, "socket_timeout": None}
+    return aioredis.Redis(
+        connection_pool=aioredis.ConnectionPool(
+            max_connections=1, connection_class=pool.connection_class, **connection_kwargs
+        )
+    )
+
+
+def get_pool_stats(client: aioredis.Redis) -> Dict[str, Any]:
+    """Summarize a client's connection pool (best effort; relies on pool internals)."""
+    pool = client.connection_pool
+    in_use = getattr(pool, "_in_use_connections", None)
+    available = getattr(pool, "_available_connections", None)
+    return {
+        "max_connections": pool.max_connections,
+        "in_use": len(in_use) if in_use is not None else None,
+        "idle": len(available) if available is not None else None,
+    }
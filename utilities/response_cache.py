@@ -0,0 +1,210 @@
+"""
+Two-tier chat response cache.
+
+Answers are keyed by a full SHA-256 over (user, model, system prompt, message),
+held in a bounded in-process LRU in front of an optional Redis tier shared by
+all workers and surviving restarts. Every entry carries an absolute expiry, so
+both tiers agree on when it goes stale. Tool failures are cached as negative
+entries with a much shorter TTL, so a broken upstream is not hammered by
+retries of the same question.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from human_logging import log_service_status
+
+
+class ResponseCache:
+    """Two-tier (local LRU + Redis) cache of chat responses with TTLs."""
+
+    def __init__(
+        self,
+        max_size: int = 5000,
+        ttl: int = 600,
+        negative_ttl: int = 30,
+        redis_client: Any = None,
+        key_prefix: str = "resp:",
+    ):
+        """Initialize the cache.
+
+        Args:
+            max_size: Maximum number of responses held in the local tier.
+            ttl: Lifetime in seconds of a cached answer.
+            negative_ttl: Lifetime in seconds of a cached tool error.
+            redis_client: Optional asyncio Redis client (``decode_responses=True``).
+            key_prefix: Namespace for Redis keys.
+        """
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._redis = redis_client
+        self._key_prefix = key_prefix
+
+        self._local_hits = 0
+        self._redis_hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._sets = 0
+        self._negative_sets = 0
+        self._redis_errors = 0
+
+    @staticmethod
+    def make_key(user_id: str, model: str, system_prompt: str, message: str) -> str:
+        """Build the cache key for a message answered by a model under a system prompt."""
+        digest = hashlib.sha256()
+        for part in (user_id, model, system_prompt, message):
+            digest.update(part.encode("utf-8", errors="surrogatepass"))
+            digest.update(b"\x00")
+        return f"chat:{user_id}:{digest.hexdigest()}"
+
+    def attach_redis(self, redis_client: Any) -> None:
+        """Enable (or replace) the Redis tier."""
+        self._redis = redis_client
+
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up the local tier, dropping expired entries and refreshing LRU order on hit."""
+        item = self._local.get(key)
+        if item is None:
+            return None
+        expires_at, entry = item
+        if expires_at <= time.time():
+            del self._local[key]
+            self._expired += 1
+            return None
+        self._local.move_to_end(key)
+        return entry
+
+    def _set_local(self, key: str, expires_at: float, entry: Dict[str, Any]) -> None:
+        """Insert into the local tier, evicting the least recently used entry if full."""
+        if key in self._local:
+            self._local.move_to_end(key)
+        elif len(self._local) >= self._max_size:
+            self._local.popitem(last=False)
+        self._local[key] = (expires_at, entry)
+
+    async def _get_redis(self, key: str) -> Optional[str]:
+        """Look up the Redis tier."""
+        try:
+            return await self._redis.get(self._key_prefix + key)
+        except Exception as e:
+            self._redis_errors += 1
+            log_service_status("cache", "warning", f"Response cache Redis read failed: {e}")
+            return None
+
+    async def _set_redis(self, key: str, payload: str, ttl: int) -> None:
+        """Write to the Redis tier."""
+        try:
+            await self._redis.set(self._key_prefix + key, payload, ex=ttl)
+        except Exception as e:
+            self._redis_errors += 1
+            log_service_status("cache", "warning", f"Response cache Redis write failed: {e}")
+
+    async def _delete_redis(self, key: str) -> None:
+        """Remove a key from the Redis tier."""
+        try:
+            await self._redis.delete(self._key_prefix + key)
+        except Exception as e:
+            self._redis_errors += 1
+            log_service_status("cache", "warning", f"Response cache Redis delete failed: {e}")
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached entry, checking the local tier then Redis.
+
+        Returns a dict with ``response`` and ``negative`` (True for a cached tool error).
+        """
+        entry = self._get_local(key)
+        if entry is not None:
+            self._local_hits += 1
+        elif self._redis is not None:
+            payload = await self._get_redis(key)
+            if payload is not None:
+                try:
+                    stored = json.loads(payload)
+                    expires_at = float(stored["expires_at"])
+                    entry = stored["entry"]
+                except (ValueError, KeyError, TypeError):
+                    expires_at, entry = 0.0, None
+                if entry is not None and expires_at > time.time():
+                    self._redis_hits += 1
+                    self._set_local(key, expires_at, entry)
+                else:
+                    entry = None
+
+        if entry is None:
+            self._misses += 1
+            return None
+        if entry.get("negative"):
+            self._negative_hits += 1
+        return entry
+
+    async def set(self, key: str, response: str) -> None:
+        """Cache an answer for the regular TTL."""
+        self._sets += 1
+        await self._store(key, {"response": response, "negative": False}, self._ttl)
+
+    async def set_negative(self, key: str, response: str) -> None:
+        """Cache a tool error message for the (short) negative TTL."""
+        self._negative_sets += 1
+        await self._store(key, {"response": response, "negative": True}, self._negative_ttl)
+
+    async def _store(self, key: str, entry: Dict[str, Any], ttl: int) -> None:
+        """Write an entry with an absolute expiry to both tiers."""
+        expires_at = time.time() + ttl
+        self._set_local(key, expires_at, entry)
+        if self._redis is not None:
+            payload = json.dumps({"expires_at": expires_at, "entry": entry})
+            await self._set_redis(key, payload, ttl)
+
+    async def delete(self, key: str) -> None:
+        """Remove an entry from both tiers."""
+        self._local.pop(key, None)
+        if self._redis is not None:
+            await self._delete_redis(key)
+
+    def clear(self) -> None:
+        """Clear the local tier and reset statistics (Redis entries expire on their own)."""
+        self._local.clear()
+        self._local_hits = 0
+        self._redis_hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._sets = 0
+        self._negative_sets = 0
+        self._redis_errors = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics.
+
+        ``redis_hits`` are answers this worker did not have locally, i.e. ones
+        written by another worker or before a restart.
+        """
+        hits = self._local_hits + self._redis_hits
+        total = hits + self._misses
+        hit_rate = (hits / total * 100) if total > 0 else 0
+        cross_worker_rate = (self._redis_hits / total * 100) if total > 0 else 0
+        return {
+            "size": len(self._local),
+            "max_size": self._max_size,
+            "ttl": self._ttl,
+            "negative_ttl": self._negative_ttl,
+            "local_hits": self._local_hits,
+            "redis_hits": self._redis_hits,
+            "negative_hits": self._negative_hits,
+            "misses": self._misses,
+            "expired": self._expired,
+            "sets": self._sets,
+            "negative_sets": self._negative_sets,
+            "total_requests": total,
+            "hit_rate": f"{hit_rate:.1f}%",
+            "hit_rate_numeric": hit_rate,
+            "cross_worker_hit_rate": f"{cross_worker_rate:.1f}%",
+            "redis_enabled": self._redis is not None,
+            "redis_errors": self._redis_errors,
+        }
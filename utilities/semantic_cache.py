@@ -0,0 +1,208 @@
+"""
+Semantic (embedding-similarity) chat response cache.
+
+Prior answers are kept with the normalized embedding of the question that
+produced them. A new question whose embedding is within a cosine threshold of
+a cached one, asked under the same model and system prompt, is answered from
+the cache without calling the LLM. Entries live in per-user scopes (plus an
+optional global scope for answers that used no personal context), expire after
+a TTL, and a user's scope is dropped whenever their memories change.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+
+GLOBAL_SCOPE = "__global__"
+
+
+class _Scope:
+    """Cached questions and answers for one user (or the global scope)."""
+
+    def __init__(self):
+        self.vectors: List[NDArray[np.float32]] = []
+        self.expires_at: List[float] = []
+        self.fingerprints: List[str] = []
+        self.responses: List[str] = []
+        self._matrix: Optional[NDArray[np.float32]] = None
+
+    def __len__(self) -> int:
+        return len(self.responses)
+
+    def matrix(self) -> NDArray[np.float32]:
+        """Stacked question vectors, rebuilt lazily after writes."""
+        if self._matrix is None:
+            self._matrix = np.vstack(self.vectors)
+        return self._matrix
+
+    def add(self, vector: NDArray[np.float32], expires_at: float, fingerprint: str, response: str) -> None:
+        """Append one answer."""
+        self.vectors.append(vector)
+        self.expires_at.append(expires_at)
+        self.fingerprints.append(fingerprint)
+        self.responses.append(response)
+        self._matrix = None
+
+    def remove(self, positions: Sequence[int]) -> None:
+        """Remove the answers at the given positions."""
+        drop = set(positions)
+        keep = [i for i in range(len(self)) if i not in drop]
+        self.vectors = [self.vectors[i] for i in keep]
+        self.expires_at = [self.expires_at[i] for i in keep]
+        self.fingerprints = [self.fingerprints[i] for i in keep]
+        self.responses = [self.responses[i] for i in keep]
+        self._matrix = None
+
+
+class SemanticCache:
+    """Per-user nearest-question cache of chat responses."""
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl: int = 600,
+        max_entries: int = 500,
+        max_scopes: int = 1000,
+    ):
+        """Initialize the cache.
+
+        Args:
+            threshold: Minimum cosine similarity between questions for a hit.
+            ttl: Lifetime in seconds of a cached answer.
+            max_entries: Maximum answers kept per scope (oldest dropped first).
+            max_scopes: Maximum scopes (users) kept; least recently used are dropped.
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_scopes = max_scopes
+        self._scopes: "OrderedDict[str, _Scope]" = OrderedDict()
+
+        self._lookups = 0
+        self._hits = 0
+        self._below_threshold = 0
+        self._hit_similarity = 0.0
+        self._stores = 0
+        self._invalidations = 0
+        self._expired = 0
+
+    @staticmethod
+    def fingerprint(model: str, system_prompt: str) -> str:
+        """Identify the generation context an answer is only valid for."""
+        return hashlib.sha256(f"{model}\x00{system_prompt}".encode("utf-8", errors="surrogatepass")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding: Any) -> Optional[NDArray[np.float32]]:
+        """Unit-normalize an embedding so dot products are cosine similarities."""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        if not norm:
+            return None
+        return vector / norm
+
+    def lookup(self, scopes: Sequence[str], embedding: Any, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Find the closest cached question across the given scopes.
+
+        Returns a dict with ``response``, ``similarity`` and ``scope`` for a hit,
+        otherwise None.
+        """
+        self._lookups += 1
+        query = self._normalize(embedding)
+        best: Optional[Dict[str, Any]] = None
+        nearest: Optional[float] = None
+        if query is not None:
+            now = time.time()
+            for scope_id in scopes:
+                scope = self._scopes.get(scope_id)
+                if scope is None:
+                    continue
+                self._scopes.move_to_end(scope_id)
+                self._drop_expired(scope, now)
+                if not len(scope):
+                    continue
+                matrix = scope.matrix()
+                if matrix.shape[1] != query.shape[0]:
+                    continue
+                similarities = matrix @ query
+                for i in np.argsort(-similarities):
+                    if scope.fingerprints[i] != fingerprint:
+                        continue
+                    similarity = float(similarities[i])
+                    nearest = similarity if nearest is None else max(nearest, similarity)
+                    if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                        best = {"response": scope.responses[i], "similarity": similarity, "scope": scope_id}
+                    break
+
+        if best is None:
+            if nearest is not None:
+                self._below_threshold += 1
+            return None
+        self._hits += 1
+        self._hit_similarity += best["similarity"]
+        return best
+
+    def store(self, scope_id: str, embedding: Any, fingerprint: str, response: str) -> None:
+        """Cache an answer for a question embedding in a scope."""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+        scope = self._scopes.get(scope_id)
+        if scope is None:
+            if len(self._scopes) >= self.max_scopes:
+                self._scopes.popitem(last=False)
+            scope = self._scopes[scope_id] = _Scope()
+        else:
+            self._scopes.move_to_end(scope_id)
+
+        self._drop_expired(scope, time.time())
+        if len(scope) >= self.max_entries:
+            scope.remove(range(len(scope) - self.max_entries + 1))
+        scope.add(vector, time.time() + self.ttl, fingerprint, response)
+        self._stores += 1
+
+    def _drop_expired(self, scope: _Scope, now: float) -> None:
+        """Remove expired answers from a scope."""
+        expired = [i for i, expires_at in enumerate(scope.expires_at) if expires_at <= now]
+        if expired:
+            scope.remove(expired)
+            self._expired += len(expired)
+
+    def invalidate(self, scope_id: str) -> None:
+        """Drop every cached answer in a scope (e.g. after the user's memories changed)."""
+        if self._scopes.pop(scope_id, None) is not None:
+            self._invalidations += 1
+
+    def clear(self) -> None:
+        """Clear all scopes and reset statistics."""
+        self._scopes.clear()
+        self._lookups = 0
+        self._hits = 0
+        self._below_threshold = 0
+        self._hit_similarity = 0.0
+        self._stores = 0
+        self._invalidations = 0
+        self._expired = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        hit_rate = (self._hits / self._lookups * 100) if self._lookups > 0 else 0
+        return {
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "scopes": len(self._scopes),
+            "entries": sum(len(scope) for scope in self._scopes.values()),
+            "lookups": self._lookups,
+            "hits": self._hits,
+            "misses": self._lookups - self._hits,
+            "below_threshold": self._below_threshold,
+            "avg_hit_similarity": round(self._hit_similarity / self._hits, 4) if self._hits else 0.0,
+            "stores": self._stores,
+            "invalidations": self._invalidations,
+            "expired": self._expired,
+            "hit_rate": f"{hit_rate:.1f}%",
+            "hit_rate_numeric": hit_rate,
+        }
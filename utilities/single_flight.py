@@ -0,0 +1,181 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+When several requests need the same result at the same time (OpenWebUI tabs or
+client retries sending the same prompt), only the first one - the leader - runs
+the call; the others attach to it and share its outcome:
+
+- ``do`` shares the result (or exception) of an awaitable;
+- ``stream`` fans a token stream out to every subscriber. Tokens are kept for the
+  lifetime of the flight, so a subscriber that joins late first replays what was
+  already generated and then follows live.
+
+Calls run in their own task: a subscriber that disconnects does not cancel the
+call for the others, and the call is only cancelled once nobody is waiting for it.
+A flight ends with its call, so a later identical request starts a new one (reusing
+finished answers is the response cache's job).
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+
+def _normalize(content: Any) -> Any:
+    """Collapse whitespace of text content (multimodal parts are compared as they are)."""
+    return " ".join(content.split()) if isinstance(content, str) else content
+
+
+def make_key(kind: str, model: str, messages: Sequence[Dict[str, Any]], **options: Any) -> str:
+    """Key of a call by its model, messages (roles and whitespace-normalized text) and options."""
+    normalized = [
+        (str(message.get("role", "user")).lower(), _normalize(message.get("content", ""))) for message in messages
+    ]
+    payload = json.dumps([kind, model, normalized, options], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def _wait_any(*events: asyncio.Event) -> None:
+    """Wait until one of the events is set."""
+    waiters = [asyncio.ensure_future(event.wait()) for event in events]
+    try:
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+
+
+class _Call:
+    """An awaitable shared by its waiters."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Stream:
+    """A token stream shared by its subscribers."""
+
+    def __init__(self):
+        self.tokens: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        """Wake every subscriber waiting for the next token."""
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class SingleFlight:
+    """Runs each distinct call once while identical calls are in flight."""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Stream] = {}
+        self._stats = {"calls": 0, "calls_joined": 0, "streams": 0, "streams_joined": 0, "cancelled": 0}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Await ``factory()`` once for every concurrent caller with the same key."""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self._stats["calls"] += 1
+        else:
+            self._stats["calls_joined"] += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Nobody is left to share it: later requests must not attach to a cancelled call
+                self._forget(self._calls, key, call)
+                call.task.cancel()
+                self._stats["cancelled"] += 1
+
+    async def stream(
+        self, key: str, factory: Callable[[], AsyncIterator[str]], stop_event: Optional[asyncio.Event] = None
+    ) -> AsyncIterator[str]:
+        """Iterate ``factory()`` once for every concurrent subscriber with the same key.
+
+        ``stop_event`` detaches only this subscriber, even while it waits for the next token;
+        the generation is stopped when its last subscriber leaves.
+        """
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _Stream()
+            self._streams[key] = flight
+            flight.task = asyncio.create_task(self._pump(key, flight, factory()))
+            self._stats["streams"] += 1
+        else:
+            self._stats["streams_joined"] += 1
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(flight.tokens):
+                    if stop_event is not None and stop_event.is_set():
+                        return
+                    yield flight.tokens[index]
+                    index += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                if stop_event is None:
+                    await flight.changed.wait()
+                    continue
+                if stop_event.is_set():
+                    return
+                # A stop during a long prefill or a stall must not wait for the next token
+                await _wait_any(flight.changed, stop_event)
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.task.done():
+                self._forget(self._streams, key, flight)
+                flight.task.cancel()
+                self._stats["cancelled"] += 1
+
+    async def _pump(self, key: str, flight: _Stream, tokens: AsyncIterator[str]) -> None:
+        """Read the upstream stream into the flight's token buffer."""
+        try:
+            async for token in tokens:
+                flight.tokens.append(token)
+                flight.notify()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            flight.notify()
+            self._forget(self._streams, key, flight)
+
+    @staticmethod
+    def _forget(flights: Dict[str, Any], key: str, flight: Any) -> None:
+        if flights.get(key) is flight:
+            del flights[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get flight counts (joined = requests served by another request's call)."""
+        calls = self._stats["calls"] + self._stats["calls_joined"]
+        streams = self._stats["streams"] + self._stats["streams_joined"]
+        return {
+            **self._stats,
+            "in_flight_calls": len(self._calls),
+            "in_flight_streams": len(self._streams),
+            "stream_subscribers": sum(flight.subscribers for flight in self._streams.values()),
+            "calls_saved_pct": round(self._stats["calls_joined"] / calls * 100, 1) if calls else 0.0,
+            "streams_saved_pct": round(self._stats["streams_joined"] / streams * 100, 1) if streams else 0.0,
+        }
+
+
+# Global single-flight instance for LLM calls
+llm_single_flight = SingleFlight()
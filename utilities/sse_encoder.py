@@ -0,0 +1,137 @@
+"""
+Server-sent event encoding for token streams.
+
+Every token event of a stream is the same JSON document except for the token text
+(the id, model and creation time are fixed for the whole stream). ``SSETemplate``
+serializes that document once, with a ``TOKEN`` placeholder, and keeps the bytes
+before and after it; encoding a token then only escapes the token text and splices
+it between the two.
+
+``coalesce_tokens`` merges tokens that arrive in quick succession into one event,
+so a fast model does not cost one event (and one socket write) per token. The first
+token is always sent at once, so coalescing never delays time to first byte.
+"""
+
+import asyncio
+import json
+from json.encoder import encode_basestring_ascii
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+try:
+    from config import SSE_COALESCE_MAX_CHARS, SSE_COALESCE_MS
+except ImportError:  # pragma: no cover - allows use without the app config (benchmarks)
+    import os
+
+    SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "15"))
+    SSE_COALESCE_MAX_CHARS = int(os.getenv("SSE_COALESCE_MAX_CHARS", "256"))
+
+# Placeholder for the token text in a template payload
+TOKEN = "\x00token\x00"
+
+SSE_DONE = b"data: [DONE]\n\n"
+
+
+def sse_event(payload: Any) -> bytes:
+    """Encode a one-off event (first/last chunks, errors)."""
+    return b"data: " + json.dumps(payload).encode() + b"\n\n"
+
+
+class SSETemplate:
+    """A pre-serialized event whose JSON payload varies only in the ``TOKEN`` string."""
+
+    def __init__(self, payload: Dict[str, Any]):
+        prefix, marker, suffix = json.dumps(payload).partition(json.dumps(TOKEN))
+        if not marker:
+            raise ValueError("SSE template payload has no TOKEN placeholder")
+        self._prefix = f"data: {prefix}"
+        self._suffix = f"{suffix}\n\n"
+
+    def encode(self, text: str) -> bytes:
+        """Encode one event carrying ``text`` (byte-identical to ``sse_event`` of the full payload)."""
+        return (self._prefix + encode_basestring_ascii(text) + self._suffix).encode("ascii")
+
+
+def openai_chunk_template(completion_id: str, model: str, created: int) -> SSETemplate:
+    """Template of the ``chat.completion.chunk`` events of one OpenAI-compatible stream."""
+    return SSETemplate(
+        {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": TOKEN}, "finish_reason": None}],
+        }
+    )
+
+
+_END = object()
+
+
+async def coalesce_tokens(
+    tokens: AsyncIterator[str],
+    interval_ms: float = SSE_COALESCE_MS,
+    max_chars: int = SSE_COALESCE_MAX_CHARS,
+) -> AsyncIterator[str]:
+    """Merge tokens arriving within ``interval_ms`` of the first buffered one into a single piece.
+
+    The upstream is read by its own task, so a flush happens when the interval ends even
+    if the model stalls; ``interval_ms <= 0`` passes tokens through unchanged.
+    """
+    if interval_ms <= 0:
+        async for token in tokens:
+            yield token
+        return
+
+    interval = interval_ms / 1000
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async for token in tokens:
+                queue.put_nowait(token)
+            queue.put_nowait(_END)
+        except Exception as e:
+            queue.put_nowait(e)
+
+    loop = asyncio.get_running_loop()
+    producer = asyncio.create_task(pump())
+    buffered: List[str] = []
+    size = 0
+    deadline: Optional[float] = None
+    first = True
+    try:
+        while True:
+            if not queue.empty():
+                item = queue.get_nowait()
+            elif buffered:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    yield "".join(buffered)
+                    buffered, size = [], 0
+                    continue
+            else:
+                item = await queue.get()
+
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                if buffered:
+                    yield "".join(buffered)
+                raise item
+            if first:
+                first = False
+                yield item
+                continue
+            if not buffered:
+                deadline = loop.time() + interval
+            buffered.append(item)
+            size += len(item)
+            if size >= max_chars:
+                yield "".join(buffered)
+                buffered, size = [], 0
+
+        if buffered:
+            yield "".join(buffered)
+    finally:
+        producer.cancel()
@@ -0,0 +1,104 @@
+"""
+Per-stage timing of the chat turn pipeline.
+
+A turn's independent stages (history fetch, query embedding, memory retrieval,
+tool detection, ...) run concurrently, so the time before generation starts is
+bounded by the slowest chain rather than the sum of all stages. ``StageTimer``
+records each stage of one request along with the wall time of the whole
+fan-out; ``PipelineStats`` aggregates them for /debug/chat-pipeline.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Dict, Iterator, Sequence, TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    """Durations of the stages of one request."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block as the named stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = time.perf_counter() - start
+
+    async def run(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Await ``awaitable`` and record its duration as the named stage."""
+        with self.stage(name):
+            return await awaitable
+
+    def summary(self) -> str:
+        """Stage durations in milliseconds, for log lines."""
+        return ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.stages.items())
+
+
+class PipelineStats:
+    """Process-wide per-stage timing statistics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._stages: Dict[str, Dict[str, float]] = {}
+        self._fan_out_total = 0.0
+        self._stage_sum_total = 0.0
+
+    def record(self, timer: StageTimer, fan_out_seconds: float, concurrent: Sequence[str] = ()) -> None:
+        """Record one request's stages and the wall time of its concurrent fan-out.
+
+        Args:
+            timer: The request's stage timer.
+            fan_out_seconds: Wall time of the concurrent section.
+            concurrent: Names of the stages that ran inside the concurrent section.
+        """
+        with self._lock:
+            self._requests += 1
+            self._fan_out_total += fan_out_seconds
+            self._stage_sum_total += sum(timer.stages.get(name, 0.0) for name in concurrent)
+            for name, seconds in timer.stages.items():
+                entry = self._stages.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+                entry["count"] += 1
+                entry["total"] += seconds
+                entry["max"] = max(entry["max"], seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-stage statistics.
+
+        ``avg_sequential_ms`` is what the concurrent stages would take back to back;
+        comparing it with ``avg_fan_out_ms`` shows the time saved by running them together.
+        """
+        with self._lock:
+            requests = self._requests
+            return {
+                "requests": requests,
+                "avg_fan_out_ms": round(self._fan_out_total / requests * 1000, 2) if requests else 0.0,
+                "avg_sequential_ms": round(self._stage_sum_total / requests * 1000, 2) if requests else 0.0,
+                "stages": {
+                    name: {
+                        "count": entry["count"],
+                        "avg_ms": round(entry["total"] / entry["count"] * 1000, 2),
+                        "max_ms": round(entry["max"] * 1000, 2),
+                    }
+                    for name, entry in self._stages.items()
+                },
+            }
+
+    def clear(self) -> None:
+        """Reset statistics."""
+        with self._lock:
+            self._requests = 0
+            self._stages.clear()
+            self._fan_out_total = 0.0
+            self._stage_sum_total = 0.0
+
+
+# Global chat pipeline statistics
+chat_pipeline_stats = PipelineStats()
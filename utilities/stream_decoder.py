@@ -0,0 +1,267 @@
+"""
+Incremental decoders for streamed LLM responses.
+
+Ollama's ``/api/chat`` streams NDJSON, one object per line with the token in
+``message.content``. OpenAI-compatible APIs stream server-sent events: ``data: {...}``
+lines with the token in ``choices[0].delta.content``, ended by ``data: [DONE]``.
+
+Both decoders work on the raw byte chunks of ``response.aiter_bytes()``:
+
+- complete lines are found with ``bytes.find`` and parsed from a ``memoryview`` slice
+  of the chunk, so chunks are never decoded to text or re-joined;
+- only the unfinished last line of a chunk is copied, into a small carry-over buffer
+  that is completed by the next chunk;
+- lines are parsed with orjson when it is installed (it reads memoryviews directly)
+  and with the standard json module otherwise.
+
+Every decoder also times its stream (time to first token, tokens/sec, inter-token
+latency); ``stream_metrics`` aggregates finished streams for /debug/streams.
+"""
+
+import json
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+from human_logging import log_service_status
+
+try:
+    import orjson
+
+    JSON_BACKEND = "orjson"
+
+    def _loads(data: Union[bytes, bytearray, memoryview]) -> Any:
+        return orjson.loads(data)
+
+except ImportError:
+    JSON_BACKEND = "json"
+
+    def _loads(data: Union[bytes, bytearray, memoryview]) -> Any:
+        return json.loads(bytes(data) if isinstance(data, memoryview) else data)
+
+
+class StreamError(Exception):
+    """The upstream reported an error inside the stream."""
+
+
+class StreamStats:
+    """Timing of one stream."""
+
+    def __init__(self, source: str, model: str = ""):
+        self.source = source
+        self.model = model
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+        self.tokens = 0
+        self.bytes = 0
+        self.malformed = 0
+        self.max_gap = 0.0
+
+    def observe(self, tokens: int) -> None:
+        """Record tokens decoded from one chunk."""
+        now = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = now
+        elif self.last_token_at is not None:
+            self.max_gap = max(self.max_gap, now - self.last_token_at)
+        self.last_token_at = now
+        self.tokens += tokens
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        return self.first_token_at - self.started if self.first_token_at is not None else None
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Generation rate after the first token."""
+        if self.tokens < 2 or self.first_token_at is None or self.last_token_at <= self.first_token_at:
+            return 0.0
+        return (self.tokens - 1) / (self.last_token_at - self.first_token_at)
+
+    @property
+    def inter_token_latency(self) -> float:
+        """Average seconds between tokens."""
+        if self.tokens < 2 or self.first_token_at is None:
+            return 0.0
+        return (self.last_token_at - self.first_token_at) / (self.tokens - 1)
+
+
+class StreamDecoder:
+    """Splits a byte stream into lines and extracts tokens from them."""
+
+    def __init__(self, source: str, model: str = ""):
+        self._tail = bytearray()
+        self.done = False
+        self.stats = StreamStats(source, model)
+
+    def feed(self, chunk: bytes) -> List[str]:
+        """Decode one chunk, returning the tokens of the lines it completes."""
+        tokens: List[str] = []
+        if not chunk or self.done:
+            return tokens
+        self.stats.bytes += len(chunk)
+        view = memoryview(chunk)
+        start = 0
+
+        if self._tail:
+            newline = chunk.find(b"\n")
+            if newline < 0:
+                self._tail += chunk
+                return tokens
+            self._tail += view[:newline]
+            self._decode_line(self._tail, tokens)
+            self._tail.clear()
+            start = newline + 1
+
+        while not self.done:
+            newline = chunk.find(b"\n", start)
+            if newline < 0:
+                if start < len(chunk):
+                    self._tail += view[start:]
+                break
+            if newline > start:
+                self._decode_line(view[start:newline], tokens)
+            start = newline + 1
+
+        if tokens:
+            self.stats.observe(len(tokens))
+        return tokens
+
+    def flush(self) -> List[str]:
+        """Decode a last line that was not newline-terminated."""
+        tokens: List[str] = []
+        if self._tail and not self.done:
+            self._decode_line(self._tail, tokens)
+            if tokens:
+                self.stats.observe(len(tokens))
+        self._tail.clear()
+        return tokens
+
+    def _decode_line(self, line: Union[bytearray, memoryview], tokens: List[str]) -> None:
+        if line[-1] == 13:  # "\r" of a CRLF line ending
+            line = line[:-1]
+        if not line:
+            return
+        try:
+            self._parse(line, tokens)
+        except (ValueError, AttributeError):
+            # Invalid JSON (json/orjson decode errors are ValueErrors) or JSON that is not an object
+            self.stats.malformed += 1
+
+    def _parse(self, line: Union[bytearray, memoryview], tokens: List[str]) -> None:
+        raise NotImplementedError
+
+
+class OllamaChatDecoder(StreamDecoder):
+    """Decoder for Ollama ``/api/chat`` NDJSON streams."""
+
+    def __init__(self, model: str = ""):
+        super().__init__("ollama", model)
+
+    def _parse(self, line: Union[bytearray, memoryview], tokens: List[str]) -> None:
+        data = _loads(line)
+        if error := data.get("error"):
+            raise StreamError(error)
+        if (message := data.get("message")) and (content := message.get("content")):
+            tokens.append(content)
+        if data.get("done"):
+            self.done = True
+
+
+class OpenAISSEDecoder(StreamDecoder):
+    """Decoder for OpenAI-compatible server-sent event streams."""
+
+    def __init__(self, model: str = ""):
+        super().__init__("openai", model)
+
+    def _parse(self, line: Union[bytearray, memoryview], tokens: List[str]) -> None:
+        # Only "data:" fields carry payloads; comments, event names and ids are skipped
+        if line[:5] != b"data:":
+            return
+        payload = line[6:] if line[5:6] == b" " else line[5:]
+        if payload == b"[DONE]":
+            self.done = True
+            return
+        data = _loads(payload)
+        if error := data.get("error"):
+            raise StreamError(error.get("message", error) if isinstance(error, dict) else error)
+        if (
+            (choices := data.get("choices"))
+            and (delta := choices[0].get("delta"))
+            and (content := delta.get("content"))
+        ):
+            tokens.append(content)
+
+
+class StreamMetrics:
+    """Process-wide statistics of finished streams."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources: Dict[str, Dict[str, float]] = {}
+
+    def record(self, stats: StreamStats) -> None:
+        """Record a finished stream and log its rate."""
+        ttft = stats.time_to_first_token
+        with self._lock:
+            entry = self._sources.setdefault(
+                stats.source,
+                {
+                    "streams": 0,
+                    "empty_streams": 0,
+                    "tokens": 0,
+                    "bytes": 0,
+                    "malformed_lines": 0,
+                    "ttft_total": 0.0,
+                    "generation_seconds": 0.0,
+                    "max_gap": 0.0,
+                },
+            )
+            entry["streams"] += 1
+            entry["tokens"] += stats.tokens
+            entry["bytes"] += stats.bytes
+            entry["malformed_lines"] += stats.malformed
+            entry["max_gap"] = max(entry["max_gap"], stats.max_gap)
+            if ttft is None:
+                entry["empty_streams"] += 1
+            else:
+                entry["ttft_total"] += ttft
+                entry["generation_seconds"] += stats.last_token_at - stats.first_token_at
+
+        if ttft is not None:
+            log_service_status(
+                stats.source.upper(),
+                "info",
+                f"Stream {stats.model or 'completed'}: {stats.tokens} tokens, first token {ttft * 1000:.0f}ms, "
+                f"{stats.tokens_per_second:.1f} tokens/s, inter-token {stats.inter_token_latency * 1000:.1f}ms",
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-source token rates and latencies."""
+        with self._lock:
+            sources = {}
+            for source, entry in self._sources.items():
+                timed = entry["streams"] - entry["empty_streams"]
+                # Every timed stream has one token before its generation window starts
+                intervals = entry["tokens"] - timed
+                sources[source] = {
+                    "streams": entry["streams"],
+                    "empty_streams": entry["empty_streams"],
+                    "tokens": entry["tokens"],
+                    "bytes": entry["bytes"],
+                    "malformed_lines": entry["malformed_lines"],
+                    "avg_time_to_first_token_ms": round(entry["ttft_total"] / timed * 1000, 2) if timed else 0.0,
+                    "tokens_per_second": round(intervals / entry["generation_seconds"], 2)
+                    if entry["generation_seconds"] > 0
+                    else 0.0,
+                    "avg_inter_token_ms": round(entry["generation_seconds"] / intervals * 1000, 2)
+                    if intervals > 0
+                    else 0.0,
+                    "max_inter_token_ms": round(entry["max_gap"] * 1000, 2),
+                }
+            return {"json_backend": JSON_BACKEND, "sources": sources}
+
+
+# Global stream metrics instance
+stream_metrics = StreamMetrics()
@@ -0,0 +1,134 @@
+"""
+Incremental text chunking for large documents.
+
+``StreamingChunker`` splits with the same RecursiveCharacterTextSplitter settings
+(size, overlap, separators) while only holding a bounded window of text: input is
+split a window at a time and the last (possibly incomplete) chunk of each window
+is carried over as the start of the next one. Chunks never exceed ``chunk_size``
+and consecutive chunks overlap by at most ``chunk_overlap``, as with a
+whole-document split; only the exact chunk boundaries near a window edge may
+differ.
+"""
+
+import asyncio
+import codecs
+import hashlib
+import io
+from functools import lru_cache
+from typing import Any, AsyncIterator, BinaryIO, List, Optional
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+DEFAULT_BLOCK_SIZE = 64 * 1024  # Bytes read from the upload per step
+DEFAULT_WINDOW_CHUNKS = 32  # Window size, in chunks, split per step
+
+
+@lru_cache(maxsize=16)
+def get_text_splitter(chunk_size: int = 1000, chunk_overlap: int = 200) -> RecursiveCharacterTextSplitter:
+    """Get a shared splitter for the given size/overlap instead of building one per call."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""],
+    )
+
+
+class StreamingChunker:
+    """Split text fed in arbitrary pieces into overlapping chunks."""
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, window_chunks: int = DEFAULT_WINDOW_CHUNKS):
+        """Initialize the chunker.
+
+        Args:
+            chunk_size: Maximum size of each chunk
+            chunk_overlap: Number of characters to overlap between chunks
+            window_chunks: How many chunks' worth of text to accumulate before splitting
+        """
+        self.chunk_size = chunk_size
+        self._splitter = get_text_splitter(chunk_size, chunk_overlap)
+        self._window = chunk_size * max(2, window_chunks)
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add text and return any chunks that can no longer change."""
+        self._buffer += text
+        if len(self._buffer) < self._window:
+            return []
+
+        chunks = self._splitter.split_text(self._buffer)
+        if len(chunks) < 2:
+            return []
+
+        # Everything before the last chunk is final; restart the window where the last chunk begins
+        # so the next split keeps the overlap with the chunks already emitted.
+        tail = chunks[-1]
+        start = self._buffer.rfind(tail)
+        self._buffer = self._buffer[start:] if start >= 0 else self._buffer[-self.chunk_size :]
+        return chunks[:-1]
+
+    def finish(self) -> List[str]:
+        """Flush the remaining window."""
+        chunks = self._splitter.split_text(self._buffer) if self._buffer else []
+        self._buffer = ""
+        return chunks
+
+
+def detach_upload(file: Any) -> BinaryIO:
+    """Take ownership of an upload's underlying file so it outlives the request.
+
+    The framework closes ``UploadFile.file`` once the response is sent; swapping in an
+    empty buffer lets a background job keep reading the spooled upload instead.
+    """
+    raw = file.file
+    file.file = io.BytesIO()
+    raw.seek(0)
+    return raw
+
+
+def hash_file(raw: BinaryIO, block_size: int = DEFAULT_BLOCK_SIZE) -> str:
+    """MD5 a file in blocks (blocking) and rewind it."""
+    digest = hashlib.md5()
+    while block := raw.read(block_size):
+        digest.update(block)
+    raw.seek(0)
+    return digest.hexdigest()
+
+
+async def iter_file_chunks(
+    raw: BinaryIO,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    encoding: str = "utf-8",
+    close: bool = True,
+) -> AsyncIterator[str]:
+    """Read a binary file in fixed-size blocks, decode incrementally and yield chunks.
+
+    Blocking reads and splits run in worker threads, and only one block plus one
+    window of text is held at a time.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="strict")
+    chunker = StreamingChunker(chunk_size, chunk_overlap)
+
+    def step() -> Optional[List[str]]:
+        """Read and chunk one block; None at end of file."""
+        block = raw.read(block_size)
+        if not block:
+            return None
+        return chunker.feed(decoder.decode(block))
+
+    try:
+        while (chunks := await asyncio.to_thread(step)) is not None:
+            for chunk in chunks:
+                yield chunk
+
+        def flush() -> List[str]:
+            """Decode any trailing bytes and split the last window."""
+            return chunker.feed(decoder.decode(b"", final=True)) + chunker.finish()
+
+        for chunk in await asyncio.to_thread(flush):
+            yield chunk
+    finally:
+        if close:
+            raw.close()
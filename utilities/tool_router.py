@@ -0,0 +1,184 @@
+"""
+Single-pass intent router for ToolService.
+
+Every tool trigger is an intent phrase ("what time is it", "time in <place>",
+"exchange rate") with a weight, and hangs off one literal anchor keyword
+("time", "weather", ...). All of it is compiled once, at import:
+
+- one regex over every anchor keyword - the keyword automaton - finds in a single
+  scan which tools a message can possibly be about (most chat messages contain no
+  anchor at all and are done after this scan);
+- one combined regex per anchor then confirms its triggers, and every match
+  credits its tool with the trigger's weight.
+
+The tool with the highest weight (ties broken by tool priority) is returned with
+that weight as its confidence. Messages below ``TOOL_ROUTER_MIN_CONFIDENCE`` are
+left to the LLM, so a message that merely mentions time, a search or a conversion
+no longer short-circuits the LLM with a tool answer.
+"""
+
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from config import TOOL_ROUTER_MIN_CONFIDENCE
+except ImportError:  # pragma: no cover - allows use without the app config (benchmarks)
+    import os
+
+    TOOL_ROUTER_MIN_CONFIDENCE = float(os.getenv("TOOL_ROUTER_MIN_CONFIDENCE", "0.5"))
+
+
+@dataclass(frozen=True)
+class Trigger:
+    """One phrase that signals a tool, with how strongly it does."""
+
+    tool: str
+    anchor: str
+    pattern: str
+    weight: float
+
+
+@dataclass(frozen=True)
+class Route:
+    """The tool chosen for a message."""
+
+    tool: str
+    confidence: float
+    matched: Tuple[str, ...]
+
+
+# "time" followed by these is a topic, not a clock lookup ("time complexity", "time zone of ...")
+_NOT_CLOCK = r"(?!\s+(?:complexity|limit|limits|frame|span|signature|step|series|zone|management))"
+
+# Listed in priority order: on equal confidence the earlier tool wins. Patterns see the lowercased
+# message and must contain their anchor.
+TRIGGERS: Sequence[Trigger] = (
+    Trigger("time", "time", r"\btimeanddate\.com\b", 1.0),
+    Trigger("time", "time", r"\bwhat time is it\b", 1.0),
+    Trigger("time", "time", rf"\bwhat(?:'s| is) the (?:current |local )?time\b{_NOT_CLOCK}", 1.0),
+    Trigger("time", "time", rf"\b(?:current|local) time\b{_NOT_CLOCK}", 0.9),
+    Trigger("time", "time", r"\b(?:tell|give|show) me the time\b", 0.9),
+    Trigger("time", "time", r"^(?:the )?time (?:in|at|for) [a-z]", 0.9),
+    Trigger("time", "time", r"\b(?:and|&) (?:the )?(?:current |local )?time in [a-z]", 0.8),
+    Trigger("time", "time", r"\btime (?:is it )?(?:right )?now\b", 0.8),
+    Trigger("weather", "weather", r"\bweather\b", 0.9),
+    Trigger("unit_conversion", "convert", r"\bconvert [\d.]+ [a-z]+ to [a-z]+", 1.0),
+    Trigger("news", "news", r"\b(?:latest|today's|top|breaking) news\b", 1.0),
+    Trigger("news", "news", r"\bnews\b", 0.8),
+    Trigger("news", "headlines", r"\b(?:latest|today's|top|breaking) headlines\b", 1.0),
+    Trigger("news", "headlines", r"\bheadlines\b", 0.7),
+    Trigger("web_search", "search", r"\bsearch (?:the web|online|the internet|google)\b", 1.0),
+    Trigger("web_search", "search", r"^search\b", 0.9),
+    Trigger("web_search", "search", r"\bsearch for\b", 0.8),
+    Trigger("exchange_rate", "exchange", r"\bexchange rates?\b", 1.0),
+    Trigger("system_info", "system", r"\bsystem info(?:rmation)?\b", 1.0),
+    Trigger("python_code_execution", "python", r"```python", 1.0),
+    Trigger("python_code_execution", "python", r"\b(?:run|execute) (?:this |the following )?python\b", 1.0),
+    Trigger("python_code_execution", "python", r"^python\s+\S*[(=]", 0.9),
+    Trigger("wikipedia", "wiki", r"\bwiki(?:pedia)?\b", 1.0),
+)
+
+
+class ToolRouter:
+    """Routes a message to its tools with one keyword scan."""
+
+    def __init__(self, triggers: Sequence[Trigger] = TRIGGERS, min_confidence: float = TOOL_ROUTER_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self._triggers = list(triggers)
+        self._priority: Dict[str, int] = {}
+        for trigger in self._triggers:
+            self._priority.setdefault(trigger.tool, len(self._priority))
+
+        # Keyword automaton over the anchors (longest first, so overlapping keywords prefer the specific one)
+        anchors = sorted({trigger.anchor for trigger in self._triggers}, key=len, reverse=True)
+        self._anchors = re.compile("|".join(re.escape(anchor) for anchor in anchors))
+
+        # Per anchor, stronger triggers first, so at a shared start position the alternation prefers them
+        by_anchor: Dict[str, List[int]] = defaultdict(list)
+        for i in sorted(range(len(self._triggers)), key=lambda i: -self._triggers[i].weight):
+            by_anchor[self._triggers[i].anchor].append(i)
+        self._confirm = {anchor: self._compile_group(indexes) for anchor, indexes in by_anchor.items()}
+
+        self._lock = threading.Lock()
+        self._routed: Dict[str, int] = {}
+        self._unrouted = 0
+        self._calls = 0
+        self._total_seconds = 0.0
+
+    def _compile_group(self, indexes: List[int]) -> "re.Pattern[str]":
+        """Compile one anchor's triggers into a single alternation with a named group per trigger.
+
+        Triggers starting at a word boundary share one leading ``\\b``, so the engine tests it
+        once per position instead of once per trigger.
+        """
+        bounded = [i for i in indexes if self._triggers[i].pattern.startswith(r"\b")]
+        branches = [f"(?P<t{i}>{self._triggers[i].pattern})" for i in indexes if i not in bounded]
+        if bounded:
+            branches.insert(0, r"\b(?:" + "|".join(f"(?P<t{i}>{self._triggers[i].pattern[2:]})" for i in bounded) + ")")
+        return re.compile("|".join(branches))
+
+    @property
+    def tools(self) -> List[str]:
+        """Tool names in priority order."""
+        return list(self._priority)
+
+    def score(self, message: str) -> Dict[str, Tuple[float, Tuple[str, ...]]]:
+        """Confidence and matched phrases of every tool triggered by ``message``."""
+        text = message.lower()
+        scores: Dict[str, Tuple[float, Tuple[str, ...]]] = {}
+        for anchor in set(self._anchors.findall(text)):
+            for match in self._confirm[anchor].finditer(text):
+                trigger = self._triggers[int(match.lastgroup[1:])]
+                confidence, matched = scores.get(trigger.tool, (0.0, ()))
+                scores[trigger.tool] = (max(confidence, trigger.weight), matched + (match.group(),))
+        return scores
+
+    def route_all(self, message: str) -> List[Route]:
+        """Every tool triggered above the threshold, best first (several for multi-part questions)."""
+        start = time.perf_counter()
+        scores = self.score(message)
+        routes: List[Route] = []
+        if scores:
+            ranked = sorted(scores.items(), key=lambda item: (-item[1][0], self._priority[item[0]]))
+            routes = [
+                Route(tool, confidence, matched)
+                for tool, (confidence, matched) in ranked
+                if confidence >= self.min_confidence
+            ]
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._calls += 1
+            self._total_seconds += elapsed
+            if not routes:
+                self._unrouted += 1
+            for route in routes:
+                self._routed[route.tool] = self._routed.get(route.tool, 0) + 1
+        return routes
+
+    def route(self, message: str) -> Optional[Route]:
+        """Pick the tool for ``message``, or None when the LLM should answer it."""
+        routes = self.route_all(message)
+        return routes[0] if routes else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get routing statistics."""
+        with self._lock:
+            calls = self._calls
+            return {
+                "triggers": len(self._triggers),
+                "anchors": len(self._confirm),
+                "min_confidence": self.min_confidence,
+                "calls": calls,
+                "routed": dict(self._routed),
+                "unrouted": self._unrouted,
+                "avg_route_us": round(self._total_seconds / calls * 1_000_000, 2) if calls else 0.0,
+            }
+
+
+# Global tool router instance
+tool_router = ToolRouter()
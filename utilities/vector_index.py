@@ -0,0 +1,429 @@
+"""
+In-process vector index used as a hot tier in front of ChromaDB.
+
+Each active user's vectors are loaded lazily from ChromaDB into a float32 matrix
+and searched with a single matrix-vector product; users with many vectors get an
+HNSW graph instead when ``hnswlib`` is installed. Writes to ChromaDB are mirrored
+into the indexes of loaded users, so ChromaDB stays the durable tier that an index
+is rebuilt from after eviction or restart. Distances use the collection's space
+(``hnsw:space``, L2 by default) so results rank and score exactly like a query.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from numpy.typing import NDArray
+
+from human_logging import log_service_status
+from utilities.executors import run_in_executor
+
+try:
+    import hnswlib
+except ImportError:  # Optional: every user is searched by brute force without it
+    hnswlib = None
+
+LOAD_PAGE_SIZE = 5000  # Vectors fetched from ChromaDB per page when loading a user
+MIN_COMPACT_SLOTS = 1024  # Don't bother compacting tiny indexes
+
+
+class UserVectorIndex:
+    """One user's vectors, documents and metadata.
+
+    Rows live in slots of a growable matrix. Deleted or replaced rows are
+    tombstoned and compacted once they outnumber live rows; slot numbers double
+    as HNSW labels so the graph can be updated in place.
+    """
+
+    def __init__(self, space: str = "l2", hnsw_threshold: int = 20000):
+        """Initialize an empty index.
+
+        Args:
+            space: Distance space of the collection ("l2", "ip" or "cosine")
+            hnsw_threshold: Live vectors above which an HNSW graph is used (if available)
+        """
+        self.space = space
+        self.hnsw_threshold = hnsw_threshold
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.dim: Optional[int] = None
+
+        self._vectors: NDArray[np.float32] = np.empty((0, 0), dtype=np.float32)
+        self._sq_norms: NDArray[np.float32] = np.empty(0, dtype=np.float32)
+        self._alive: NDArray[np.bool_] = np.empty(0, dtype=bool)
+        self._used = 0
+        self._ids: List[Optional[str]] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._slots: Dict[str, int] = {}
+        self._hnsw: Any = None
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _ensure_capacity(self, extra: int) -> None:
+        """Grow the slot arrays (doubling) to fit ``extra`` more rows."""
+        needed = self._used + extra
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 64)
+        vectors = np.empty((new_capacity, self.dim), dtype=np.float32)
+        vectors[: self._used] = self._vectors[: self._used]
+        sq_norms = np.empty(new_capacity, dtype=np.float32)
+        sq_norms[: self._used] = self._sq_norms[: self._used]
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[: self._used] = self._alive[: self._used]
+        self._vectors, self._sq_norms, self._alive = vectors, sq_norms, alive
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Any,
+        documents: Sequence[Optional[str]],
+        metadatas: Sequence[Optional[Dict[str, Any]]],
+    ) -> None:
+        """Add rows, replacing any existing rows with the same ids."""
+        if len(ids) == 0:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._vectors = np.empty((0, self.dim), dtype=np.float32)
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+
+        if self.space == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+
+        self.delete([chunk_id for chunk_id in ids if chunk_id in self._slots])
+        self._ensure_capacity(len(ids))
+        start = self._used
+        end = start + len(ids)
+        self._vectors[start:end] = vectors
+        self._sq_norms[start:end] = np.einsum("ij,ij->i", vectors, vectors)
+        self._alive[start:end] = True
+        for offset, chunk_id in enumerate(ids):
+            self._slots[chunk_id] = start + offset
+        self._ids.extend(ids)
+        self._documents.extend(documents)
+        self._metadatas.extend(metadatas)
+        self._used = end
+
+        if self._hnsw is not None:
+            if self._hnsw.get_max_elements() < end:
+                self._hnsw.resize_index(max(end, self._hnsw.get_max_elements() * 2))
+            self._hnsw.add_items(vectors, np.arange(start, end))
+
+    def delete(self, ids: Sequence[str]) -> None:
+        """Tombstone rows by id (unknown ids are ignored)."""
+        for chunk_id in ids:
+            slot = self._slots.pop(chunk_id, None)
+            if slot is None:
+                continue
+            self._alive[slot] = False
+            self._ids[slot] = self._documents[slot] = self._metadatas[slot] = None
+            if self._hnsw is not None:
+                self._hnsw.mark_deleted(slot)
+
+        if self._used > MIN_COMPACT_SLOTS and self._used - len(self._slots) > len(self._slots):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop tombstoned rows and renumber slots (the HNSW graph is rebuilt on next search)."""
+        keep = np.flatnonzero(self._alive[: self._used])
+        self._vectors = np.ascontiguousarray(self._vectors[keep])
+        self._sq_norms = self._sq_norms[keep]
+        self._alive = np.ones(len(keep), dtype=bool)
+        self._ids = [self._ids[slot] for slot in keep]
+        self._documents = [self._documents[slot] for slot in keep]
+        self._metadatas = [self._metadatas[slot] for slot in keep]
+        self._slots = {chunk_id: slot for slot, chunk_id in enumerate(self._ids)}
+        self._used = len(keep)
+        self._hnsw = None
+
+    def _build_hnsw(self) -> None:
+        """Build an HNSW graph over the live rows."""
+        live = np.flatnonzero(self._alive[: self._used])
+        index = hnswlib.Index(space=self.space, dim=self.dim)
+        index.init_index(max_elements=max(self._used * 2, 1024), ef_construction=200, M=16)
+        index.add_items(self._vectors[live], live)
+        self._hnsw = index
+
+    def _distances(self, queries: NDArray[np.float32]) -> NDArray[np.float32]:
+        """Brute-force distances from each query to every slot (tombstones get +inf)."""
+        vectors = self._vectors[: self._used]
+        dots = queries @ vectors.T
+        if self.space == "l2":
+            distances = self._sq_norms[: self._used] - 2 * dots + np.einsum("ij,ij->i", queries, queries)[:, None]
+            np.maximum(distances, 0, out=distances)
+        else:
+            distances = 1 - dots
+        distances[:, ~self._alive[: self._used]] = np.inf
+        return distances
+
+    def search(self, query_embeddings: Any, n_results: int) -> Dict[str, List[List[Any]]]:
+        """Find the nearest rows for each query, returned in the shape of a ChromaDB query result."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries.reshape(1, -1) if queries.ndim == 1 else queries
+        k = min(n_results, len(self._slots))
+        if k <= 0:
+            empty: List[List[Any]] = [[] for _ in range(len(queries))]
+            return {"ids": empty, "documents": list(empty), "metadatas": list(empty), "distances": list(empty)}
+
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match index dimension {self.dim}")
+        if self.space == "cosine":
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            queries = queries / np.where(norms == 0, 1, norms)
+
+        if hnswlib is not None and len(self._slots) >= self.hnsw_threshold:
+            if self._hnsw is None:
+                self._build_hnsw()
+            self._hnsw.set_ef(max(128, 4 * k))
+            labels, found = self._hnsw.knn_query(queries, k=k)
+            rows = list(zip(labels.tolist(), found.tolist()))
+        else:
+            all_distances = self._distances(queries)
+            if k < self._used:
+                candidates = np.argpartition(all_distances, k - 1, axis=1)[:, :k]
+            else:
+                candidates = np.broadcast_to(np.arange(self._used), (len(queries), self._used))
+            candidate_distances = np.take_along_axis(all_distances, candidates, axis=1)
+            order = np.argsort(candidate_distances, axis=1, kind="stable")
+            slots = np.take_along_axis(candidates, order, axis=1)
+            rows = list(zip(slots.tolist(), np.take_along_axis(candidate_distances, order, axis=1).tolist()))
+
+        return {
+            "ids": [[self._ids[slot] for slot in slots] for slots, _ in rows],
+            "documents": [[self._documents[slot] for slot in slots] for slots, _ in rows],
+            "metadatas": [[self._metadatas[slot] for slot in slots] for slots, _ in rows],
+            "distances": [distances for _, distances in rows],
+        }
+
+
+class VectorIndex:
+    """Per-user hot tier of ChromaDB vectors with LRU eviction of inactive users."""
+
+    def __init__(self, max_users: int = 1000, max_vectors: int = 200000, hnsw_threshold: int = 20000, enabled: bool = True):
+        """Initialize the index.
+
+        Args:
+            max_users: Maximum number of users kept in memory
+            max_vectors: Maximum number of vectors kept in memory across users
+            hnsw_threshold: Per-user vector count above which HNSW is used (requires hnswlib)
+            enabled: When False every search falls through to ChromaDB
+        """
+        self.max_users = max_users
+        self.max_vectors = max_vectors
+        self.hnsw_threshold = hnsw_threshold
+        self.enabled = enabled
+        self._collection: Any = None
+        self._space = "l2"
+        self._users: "OrderedDict[str, UserVectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._searches = 0
+        self._search_seconds = 0.0
+        self._fallbacks = 0
+        self._loads = 0
+        self._load_seconds = 0.0
+        self._evictions = 0
+
+    def attach(self, collection: Any) -> None:
+        """Use a (new) ChromaDB collection as the durable tier, dropping loaded users."""
+        metadata = getattr(collection, "metadata", None) or {}
+        space = metadata.get("hnsw:space", "l2")
+        with self._lock:
+            self._collection = collection
+            self._space = space if space in ("l2", "ip", "cosine") else "l2"
+            self._users.clear()
+
+    def is_loaded(self, user_id: str) -> bool:
+        """Whether a user's vectors are already in memory (searches won't touch ChromaDB)."""
+        index = self._users.get(user_id)
+        return index is not None and index.loaded
+
+    def _get_or_load(self, user_id: str) -> Optional[UserVectorIndex]:
+        """Get a user's index, loading it from ChromaDB on first use."""
+        with self._lock:
+            index = self._users.get(user_id)
+            created = index is None
+            if created:
+                if self._collection is None:
+                    return None
+                index = UserVectorIndex(self._space, self.hnsw_threshold)
+                index.lock.acquire()  # Held until loaded so concurrent searches and writes wait for it
+                self._users[user_id] = index
+                collection = self._collection
+            else:
+                self._users.move_to_end(user_id)
+
+        if not created:
+            if index.loaded:
+                return index
+            with index.lock:  # Another thread is loading this user
+                return index if index.loaded else None
+
+        try:
+            self._load(user_id, index, collection)
+            return index
+        except Exception as e:
+            with self._lock:
+                if self._users.get(user_id) is index:
+                    del self._users[user_id]
+            log_service_status("VECTOR_INDEX", "warning", f"Could not load vectors for user {user_id}: {e}")
+            return None
+        finally:
+            index.lock.release()
+
+    def _load(self, user_id: str, index: UserVectorIndex, collection: Any) -> None:
+        """Page a user's vectors out of ChromaDB into the index."""
+        started = time.perf_counter()
+        offset = 0
+        while True:
+            page = collection.get(
+                where={"user_id": user_id},
+                include=["embeddings", "documents", "metadatas"],
+                limit=LOAD_PAGE_SIZE,
+                offset=offset,
+            )
+            ids = page.get("ids") or []
+            if not ids:
+                break
+            embeddings = page.get("embeddings")
+            index.upsert(ids, embeddings, page.get("documents") or [None] * len(ids), page.get("metadatas") or [None] * len(ids))
+            offset += len(ids)
+            if len(ids) < LOAD_PAGE_SIZE:
+                break
+        index.loaded = True
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._loads += 1
+            self._load_seconds += elapsed
+            self._evict()
+        log_service_status(
+            "VECTOR_INDEX", "info", f"Loaded {len(index)} vectors for user {user_id} in {elapsed * 1000:.1f}ms"
+        )
+
+    def _evict(self) -> None:
+        """Drop least recently used users beyond the user/vector budgets (caller holds the lock)."""
+        total = sum(len(index) for index in self._users.values())
+        while len(self._users) > 1 and (len(self._users) > self.max_users or total > self.max_vectors):
+            _, index = self._users.popitem(last=False)
+            total -= len(index)
+            self._evictions += 1
+
+    def search(self, user_id: str, query_embeddings: Any, n_results: int) -> Optional[Dict[str, List[List[Any]]]]:
+        """Search a user's vectors for one or more queries, loading them if needed.
+
+        Returns a ChromaDB-shaped query result, or None when the caller should
+        query ChromaDB instead (index disabled, not attached, or load failed).
+        """
+        if not self.enabled:
+            return None
+        index = self._get_or_load(user_id)
+        if index is None:
+            self._fallbacks += 1
+            return None
+
+        started = time.perf_counter()
+        try:
+            with index.lock:
+                if not index.loaded:
+                    self._fallbacks += 1
+                    return None
+                results = index.search(query_embeddings, n_results)
+        except ValueError as e:
+            self._fallbacks += 1
+            log_service_status("VECTOR_INDEX", "warning", f"Falling back to ChromaDB for user {user_id}: {e}")
+            return None
+        self._searches += 1
+        self._search_seconds += time.perf_counter() - started
+        return results
+
+    async def asearch(self, user_id: str, query_embeddings: Any, n_results: int) -> Optional[Dict[str, List[List[Any]]]]:
+        """Search from async code, always off the event loop.
+
+        Even a loaded index can block: the search waits for the index lock while an
+        upsert holds it, and rebuilds the HNSW graph after a compaction.
+        """
+        return await run_in_executor("chroma", self.search, user_id, query_embeddings, n_results)
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        embeddings: Any,
+        documents: Sequence[Optional[str]],
+        metadatas: Sequence[Optional[Dict[str, Any]]],
+    ) -> None:
+        """Mirror rows just written to ChromaDB into the indexes of loaded users."""
+        by_user: Dict[str, List[int]] = {}
+        for position, metadata in enumerate(metadatas):
+            user_id = (metadata or {}).get("user_id")
+            if user_id is not None:
+                by_user.setdefault(user_id, []).append(position)
+
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1) if len(ids) else None
+        grown = False
+        for user_id, positions in by_user.items():
+            index = self._users.get(user_id)
+            if index is None:
+                continue  # Not loaded: ChromaDB already has the rows for the next load
+            grown = True
+            try:
+                with index.lock:
+                    index.upsert(
+                        [ids[p] for p in positions],
+                        vectors[positions],
+                        [documents[p] for p in positions],
+                        [metadatas[p] for p in positions],
+                    )
+            except ValueError as e:
+                self.invalidate(user_id)
+                log_service_status("VECTOR_INDEX", "warning", f"Dropped index for user {user_id}: {e}")
+
+        if grown:
+            # Mirrored rows count against the vector budget like loaded ones
+            with self._lock:
+                self._evict()
+
+    def delete(self, ids: Sequence[str], user_id: Optional[str] = None) -> None:
+        """Mirror deletions from ChromaDB (all loaded users are checked when user_id is unknown)."""
+        if user_id is not None:
+            indexes = [index for index in [self._users.get(user_id)] if index is not None]
+        else:
+            indexes = list(self._users.values())
+        for index in indexes:
+            with index.lock:
+                index.delete(ids)
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """Forget one user's (or every user's) loaded vectors."""
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics."""
+        users = list(self._users.values())
+        return {
+            "enabled": self.enabled,
+            "space": self._space,
+            "hnsw_available": hnswlib is not None,
+            "users_loaded": len(users),
+            "vectors_loaded": sum(len(index) for index in users),
+            "hnsw_users": sum(1 for index in users if index._hnsw is not None),
+            "searches": self._searches,
+            "avg_search_us": round(self._search_seconds / self._searches * 1e6, 1) if self._searches else 0.0,
+            "fallbacks": self._fallbacks,
+            "loads": self._loads,
+            "avg_load_ms": round(self._load_seconds / self._loads * 1000, 2) if self._loads else 0.0,
+            "evictions": self._evictions,
+        }